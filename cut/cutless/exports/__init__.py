@@ -1,4 +1,11 @@
-"""Exportaciones PDF y Excel."""
+"""Exportaciones PDF, Excel y datos en columnas (CSV / Parquet)."""
+
+from .datos import (
+    COLUMNAS_EXPORTACION,
+    generar_csv,
+    generar_parquet,
+    parquet_disponible,
+)
 
 from .excel import (
     generar_excel,
@@ -9,13 +16,19 @@ from .pdf import (
     generar_pdf,
     generar_pdf_presupuesto,
     generar_pdf_resumen_desperdicio,
+    obtener_pdf_presupuesto,
 )
 
 __all__ = [
+    'COLUMNAS_EXPORTACION',
+    'generar_csv',
     'generar_excel',
     'generar_excel_historial_costos',
     'generar_excel_resumen_desperdicio',
     'generar_pdf',
     'generar_pdf_presupuesto',
     'generar_pdf_resumen_desperdicio',
+    'generar_parquet',
+    'obtener_pdf_presupuesto',
+    'parquet_disponible',
 ]
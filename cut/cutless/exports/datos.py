@@ -0,0 +1,145 @@
+"""Exportación de datos en columnas (CSV en streaming y, si está pyarrow, Parquet)."""
+import csv
+
+from ..models import PiezaOptimizacion, TableroOptimizacion
+
+# Filas leídas por consulta y por lote de Parquet
+TAM_BLOQUE_EXPORTACION = 5000
+
+# Columnas de cada tabla: (nombre de la columna, campo en values_list, tipo)
+COLUMNAS_EXPORTACION = {
+    'optimizaciones': [
+        ('id', 'pk', 'entero'),
+        ('usuario_id', 'usuario_id', 'entero'),
+        ('usuario', 'usuario__username', 'texto'),
+        ('fecha', 'fecha', 'fecha_hora'),
+        ('proyecto_id', 'proyecto_id', 'entero'),
+        ('cliente_id', 'cliente_id', 'entero'),
+        ('material_id', 'material_id', 'entero'),
+        ('material', 'material__nombre', 'texto'),
+        ('ancho_tablero_cm', 'ancho_tablero', 'real'),
+        ('alto_tablero_cm', 'alto_tablero', 'real'),
+        ('unidad_medida', 'unidad_medida', 'texto'),
+        ('margen_corte_cm', 'margen_corte', 'real'),
+        ('permitir_rotacion', 'permitir_rotacion', 'booleano'),
+        ('aprovechamiento_total', 'aprovechamiento_total', 'real'),
+        ('num_tableros', 'num_tableros', 'entero'),
+        ('area_usada_total_cm2', 'area_usada_total', 'real'),
+        ('desperdicio_total_cm2', 'desperdicio_total', 'real'),
+        ('precio_tablero', 'precio_tablero', 'decimal'),
+        ('mano_obra', 'mano_obra', 'decimal'),
+        ('favorito', 'favorito', 'booleano'),
+    ],
+    'tableros': [
+        ('id', 'pk', 'entero'),
+        ('optimizacion_id', 'optimizacion_id', 'entero'),
+        ('usuario_id', 'optimizacion__usuario_id', 'entero'),
+        ('fecha', 'optimizacion__fecha', 'fecha_hora'),
+        ('numero', 'numero', 'entero'),
+        ('area_usada_cm2', 'area_usada', 'real'),
+        ('desperdicio_cm2', 'desperdicio', 'real'),
+        ('porcentaje_uso', 'porcentaje_uso', 'real'),
+        ('num_piezas', 'num_piezas', 'entero'),
+    ],
+    'piezas': [
+        ('id', 'pk', 'entero'),
+        ('optimizacion_id', 'optimizacion_id', 'entero'),
+        ('usuario_id', 'optimizacion__usuario_id', 'entero'),
+        ('fecha', 'optimizacion__fecha', 'fecha_hora'),
+        ('orden', 'orden', 'entero'),
+        ('nombre', 'nombre', 'texto'),
+        ('ancho_cm', 'ancho_cm', 'real'),
+        ('alto_cm', 'alto_cm', 'real'),
+        ('cantidad', 'cantidad', 'entero'),
+    ],
+}
+
+
+def _queryset_tabla(tabla, optimizaciones):
+    """Filas de la tabla pedida restringidas a las optimizaciones indicadas, en orden estable."""
+    if tabla == 'optimizaciones':
+        return optimizaciones.order_by('pk')
+    modelo = TableroOptimizacion if tabla == 'tableros' else PiezaOptimizacion
+    orden = 'numero' if tabla == 'tableros' else 'orden'
+    return modelo.objects.filter(
+        optimizacion__in=optimizaciones.order_by().values('pk'),
+    ).order_by('optimizacion_id', orden)
+
+
+def filas_exportacion(tabla, optimizaciones):
+    """Recorre las filas (tuplas) de ``tabla`` por bloques, sin instanciar modelos."""
+    campos = [campo for _, campo, _ in COLUMNAS_EXPORTACION[tabla]]
+    return _queryset_tabla(tabla, optimizaciones).values_list(*campos).iterator(chunk_size=TAM_BLOQUE_EXPORTACION)
+
+
+class _Eco:
+    """Archivo mínimo para csv.writer: devuelve la línea en lugar de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ''
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return valor
+
+
+def generar_csv(tabla, optimizaciones):
+    """Genera el CSV línea a línea (para StreamingHttpResponse), con encabezado."""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([nombre for nombre, _, _ in COLUMNAS_EXPORTACION[tabla]])
+    for fila in filas_exportacion(tabla, optimizaciones):
+        yield escritor.writerow([_valor_csv(valor) for valor in fila])
+
+
+def parquet_disponible():
+    """Parquet es opcional: solo si pyarrow está instalado."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def generar_parquet(tabla, optimizaciones, destino):
+    """
+    Escribe la tabla en formato Parquet en ``destino`` (archivo binario), un grupo de
+    filas por bloque leído, de modo que la memoria no depende del total de filas.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tipos = {
+        'entero': pa.int64(),
+        'real': pa.float64(),
+        'texto': pa.string(),
+        'booleano': pa.bool_(),
+        'decimal': pa.decimal128(12, 2),
+        'fecha_hora': pa.timestamp('us', tz='UTC'),
+    }
+    columnas = COLUMNAS_EXPORTACION[tabla]
+    esquema = pa.schema([(nombre, tipos[tipo]) for nombre, _, tipo in columnas])
+
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        bloque = []
+        for fila in filas_exportacion(tabla, optimizaciones):
+            bloque.append(fila)
+            if len(bloque) == TAM_BLOQUE_EXPORTACION:
+                escritor.write_table(pa.Table.from_arrays(_columnas(bloque, esquema), schema=esquema))
+                bloque = []
+        if bloque:
+            escritor.write_table(pa.Table.from_arrays(_columnas(bloque, esquema), schema=esquema))
+    destino.seek(0)
+    return destino
+
+
+def _columnas(bloque, esquema):
+    import pyarrow as pa
+
+    return [
+        pa.array([fila[indice] for fila in bloque], type=campo.type)
+        for indice, campo in enumerate(esquema)
+    ]
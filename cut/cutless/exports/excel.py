@@ -303,51 +303,120 @@ def generar_excel(optimizacion, info_desperdicio, piezas_con_nombre, numero_list
     
     return buffer
 
-def generar_excel_historial_costos(optimizaciones_con_costo, estadisticas, fecha_desde=None, fecha_hasta=None):
+# Estilos con nombre de los reportes en lote: se registran una vez por libro y cada
+# celda solo referencia el nombre (en modo write-only no hay estilos por celda en memoria)
+BORDE_FINO = {'left': 'thin', 'right': 'thin', 'top': 'thin', 'bottom': 'thin'}
+COLOR_TOTALES = "D3D3D3"
+
+
+def _registrar_estilos_reporte(wb, color_encabezado):
+    """Registra en ``wb`` los estilos con nombre que usan los reportes en lote."""
+    from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+    borde = Border(**{lado: Side(style=estilo) for lado, estilo in BORDE_FINO.items()})
+
+    def relleno(color):
+        return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+    estilos = {
+        'titulo': dict(font=Font(bold=True, size=16)),
+        'periodo': dict(font=Font(bold=True, italic=True)),
+        'etiqueta': dict(font=Font(bold=True)),
+        'valor': dict(),
+        'encabezado': dict(
+            font=Font(bold=True, color="FFFFFF", size=12), fill=relleno(color_encabezado),
+            alignment=Alignment(horizontal='center', vertical='center'), border=borde,
+        ),
+        'celda': dict(border=borde),
+        'centro': dict(border=borde, alignment=Alignment(horizontal='center', vertical='center')),
+        'derecha': dict(border=borde, alignment=Alignment(horizontal='right')),
+        'derecha_negrita': dict(border=borde, alignment=Alignment(horizontal='right'), font=Font(bold=True)),
+        'total_etiqueta': dict(font=Font(bold=True, size=12), fill=relleno(COLOR_TOTALES)),
+        'total': dict(
+            font=Font(bold=True), border=borde, alignment=Alignment(horizontal='right'), fill=relleno(COLOR_TOTALES),
+        ),
+        'total_destacado': dict(
+            font=Font(bold=True, size=12, color="006100"), border=borde,
+            alignment=Alignment(horizontal='right'), fill=relleno("90EE90"),
+        ),
+        'destacado_verde': dict(font=Font(bold=True, size=12, color="006100")),
+        'destacado_rojo': dict(font=Font(bold=True, size=12, color="DC3545")),
+        'desperdicio_alto': dict(
+            border=borde, alignment=Alignment(horizontal='center', vertical='center'), fill=relleno("F8D7DA"),
+        ),
+        'desperdicio_medio': dict(
+            border=borde, alignment=Alignment(horizontal='center', vertical='center'), fill=relleno("FFF3CD"),
+        ),
+        'desperdicio_bajo': dict(
+            border=borde, alignment=Alignment(horizontal='center', vertical='center'), fill=relleno("D4EDDA"),
+        ),
+    }
+    for nombre, atributos in estilos.items():
+        wb.add_named_style(NamedStyle(name=nombre, **atributos))
+
+
+def _fila(ws, *celdas):
+    """Agrega una fila a una hoja write-only; cada celda es (valor, estilo) o un valor sin estilo."""
+    from openpyxl.cell import WriteOnlyCell
+
+    fila = []
+    for celda in celdas:
+        if isinstance(celda, tuple):
+            valor, estilo = celda
+            celda_escrita = WriteOnlyCell(ws, value=valor)
+            celda_escrita.style = estilo
+            fila.append(celda_escrita)
+        else:
+            fila.append(celda)
+    ws.append(fila)
+
+
+def _anchos_columnas(ws, anchos):
+    from openpyxl.utils import get_column_letter
+
+    for col, ancho in enumerate(anchos, start=1):
+        ws.column_dimensions[get_column_letter(col)].width = ancho
+
+
+def _guardar_libro(wb, destino):
+    """Guarda en ``destino`` (archivo temporal, para responder en streaming) o en un BytesIO."""
+    if destino is None:
+        destino = io.BytesIO()
+    wb.save(destino)
+    destino.seek(0)
+    return destino
+
+
+def generar_excel_historial_costos(optimizaciones_con_costo, estadisticas, fecha_desde=None, fecha_hasta=None, destino=None):
     """
     Genera un archivo Excel con el resumen completo del historial de costos.
+    Usa un libro write-only: las filas se vuelcan a disco a medida que se recorren,
+    por lo que la memoria no crece con la cantidad de optimizaciones.
     
     Args:
-        optimizaciones_con_costo: Lista de diccionarios con optimizaciones y costos
+        optimizaciones_con_costo: Iterable de diccionarios con optimizaciones y costos
+            (se recorre una sola vez, puede ser un generador sobre el queryset)
         estadisticas: Diccionario con estadísticas calculadas
         fecha_desde: Fecha desde (opcional)
         fecha_hasta: Fecha hasta (opcional)
+        destino: Archivo binario donde escribir (p. ej. un temporal); por defecto un BytesIO
     
     Returns:
-        BytesIO: Buffer con el archivo Excel
+        El archivo de destino, posicionado al inicio
     """
-    import io
     from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.utils import get_column_letter
-    from datetime import datetime
     
-    wb = Workbook()
-    
-    # Estilos
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    title_font = Font(bold=True, size=16)
-    subtitle_font = Font(bold=True, size=12)
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    center_alignment = Alignment(horizontal='center', vertical='center')
+    wb = Workbook(write_only=True)
+    _registrar_estilos_reporte(wb, "366092")
     
     # === HOJA 1: RESUMEN DE ESTADÍSTICAS ===
-    ws1 = wb.active
-    ws1.title = "Resumen"
+    ws1 = wb.create_sheet("Resumen")
+    _anchos_columnas(ws1, [25, 20])
     
-    # Título
-    ws1['A1'] = "💰 HISTORIAL DE COSTOS - RESUMEN"
-    ws1['A1'].font = title_font
-    ws1.merge_cells('A1:B1')
+    _fila(ws1, ("💰 HISTORIAL DE COSTOS - RESUMEN", 'titulo'))
+    _fila(ws1)
     
     # Período
-    row = 3
     if fecha_desde or fecha_hasta:
         periodo_texto = "Período: "
         if fecha_desde:
@@ -356,15 +425,10 @@ def generar_excel_historial_costos(optimizaciones_con_costo, estadisticas, fecha
             periodo_texto += " hasta "
         if fecha_hasta:
             periodo_texto += f"{fecha_hasta}"
-        ws1[f'A{row}'] = periodo_texto
-        ws1[f'A{row}'].font = Font(bold=True, italic=True)
-        ws1.merge_cells(f'A{row}:B{row}')
-        row += 2
     else:
-        ws1[f'A{row}'] = "Período: Todos los registros"
-        ws1[f'A{row}'].font = Font(bold=True, italic=True)
-        ws1.merge_cells(f'A{row}:B{row}')
-        row += 2
+        periodo_texto = "Período: Todos los registros"
+    _fila(ws1, (periodo_texto, 'periodo'))
+    _fila(ws1)
     
     # Estadísticas principales
     stats_data = [
@@ -379,165 +443,86 @@ def generar_excel_historial_costos(optimizaciones_con_costo, estadisticas, fecha
         ['% Mano de Obra:', f"{estadisticas.get('porcentaje_mano_obra', 0):.1f}%"],
         ['Aprovechamiento Promedio:', f"{estadisticas.get('aprovechamiento_promedio', 0):.1f}%"],
     ]
-    
     for label, valor in stats_data:
-        ws1[f'A{row}'] = label
-        ws1[f'A{row}'].font = Font(bold=True)
-        ws1[f'B{row}'] = valor
-        if 'Costo Total' in label:
-            ws1[f'B{row}'].font = Font(bold=True, size=12, color="006100")
-        row += 1
-    
-    # Ajustar ancho de columnas
-    ws1.column_dimensions['A'].width = 25
-    ws1.column_dimensions['B'].width = 20
+        _fila(ws1, (label, 'etiqueta'), (valor, 'destacado_verde' if 'Costo Total' in label else 'valor'))
     
     # === HOJA 2: DETALLE DE OPTIMIZACIONES ===
     ws2 = wb.create_sheet("Detalle de Costos")
+    _anchos_columnas(ws2, [12, 8, 18, 20, 10, 15, 15, 15, 15])
     
     # Encabezados
     headers = ['Fecha', 'Hora', 'Dimensiones', 'Material', 'Tableros', 'Aprovechamiento', 
                'Costo Material', 'Mano de Obra', 'Costo Total']
-    for col, header in enumerate(headers, start=1):
-        cell = ws2.cell(row=1, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = center_alignment
-        cell.border = border
+    _fila(ws2, *[(header, 'encabezado') for header in headers])
     
     # Datos de optimizaciones
-    for idx, item in enumerate(optimizaciones_con_costo, start=2):
+    for item in optimizaciones_con_costo:
         opt = item['optimizacion']
         
-        # Fecha y hora
-        fecha_str = opt.fecha.strftime('%d/%m/%Y')
-        hora_str = opt.fecha.strftime('%H:%M')
-        
         # Dimensiones
         dim_str = f"{opt.ancho_tablero} × {opt.alto_tablero} cm"
         if opt.unidad_medida != 'cm':
             dim_str += f" ({opt.get_unidad_medida_display()})"
         
-        # Material
-        material_str = opt.material.nombre if opt.material else "-"
-        
-        # Tableros
-        num_tableros = opt.num_tableros or 0
-        
-        # Aprovechamiento
-        aprovechamiento = opt.aprovechamiento_total or 0
-        
-        # Costos
-        costo_material = item['costo_material']
-        costo_mano_obra = item['costo_mano_obra']
-        costo_total = item['costo_total']
-        
-        # Escribir datos
-        ws2.cell(row=idx, column=1, value=fecha_str).border = border
-        ws2.cell(row=idx, column=2, value=hora_str).border = border
-        ws2.cell(row=idx, column=3, value=dim_str).border = border
-        ws2.cell(row=idx, column=4, value=material_str).border = border
-        ws2.cell(row=idx, column=5, value=num_tableros).border = border
-        ws2.cell(row=idx, column=6, value=f"{aprovechamiento:.1f}%").border = border
-        ws2.cell(row=idx, column=7, value=f"${costo_material:,.0f}").border = border
-        ws2.cell(row=idx, column=8, value=f"${costo_mano_obra:,.0f}").border = border
-        ws2.cell(row=idx, column=9, value=f"${costo_total:,.0f}").border = border
-        
-        # Formato de números
-        ws2.cell(row=idx, column=5).alignment = center_alignment
-        ws2.cell(row=idx, column=6).alignment = center_alignment
-        ws2.cell(row=idx, column=7).alignment = Alignment(horizontal='right')
-        ws2.cell(row=idx, column=8).alignment = Alignment(horizontal='right')
-        ws2.cell(row=idx, column=9).alignment = Alignment(horizontal='right')
-        ws2.cell(row=idx, column=9).font = Font(bold=True)
+        _fila(
+            ws2,
+            (opt.fecha.strftime('%d/%m/%Y'), 'celda'),
+            (opt.fecha.strftime('%H:%M'), 'celda'),
+            (dim_str, 'celda'),
+            (opt.material.nombre if opt.material else "-", 'celda'),
+            (opt.num_tableros or 0, 'centro'),
+            (f"{opt.aprovechamiento_total or 0:.1f}%", 'centro'),
+            (f"${item['costo_material']:,.0f}", 'derecha'),
+            (f"${item['costo_mano_obra']:,.0f}", 'derecha'),
+            (f"${item['costo_total']:,.0f}", 'derecha_negrita'),
+        )
     
     # Fila de totales
-    row_total = len(optimizaciones_con_costo) + 2
-    ws2.cell(row=row_total, column=1, value="TOTALES:").font = Font(bold=True, size=12)
-    ws2.cell(row=row_total, column=1).fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
-    ws2.merge_cells(f'A{row_total}:F{row_total}')
-    
-    ws2.cell(row=row_total, column=7, value=f"${estadisticas.get('costo_material_total', 0):,.0f}").font = Font(bold=True)
-    ws2.cell(row=row_total, column=7).border = border
-    ws2.cell(row=row_total, column=7).alignment = Alignment(horizontal='right')
-    ws2.cell(row=row_total, column=7).fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
-    
-    ws2.cell(row=row_total, column=8, value=f"${estadisticas.get('costo_mano_obra_total', 0):,.0f}").font = Font(bold=True)
-    ws2.cell(row=row_total, column=8).border = border
-    ws2.cell(row=row_total, column=8).alignment = Alignment(horizontal='right')
-    ws2.cell(row=row_total, column=8).fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
-    
-    ws2.cell(row=row_total, column=9, value=f"${estadisticas.get('costo_total', 0):,.0f}").font = Font(bold=True, size=12, color="006100")
-    ws2.cell(row=row_total, column=9).border = border
-    ws2.cell(row=row_total, column=9).alignment = Alignment(horizontal='right')
-    ws2.cell(row=row_total, column=9).fill = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
-    
-    # Ajustar ancho de columnas
-    column_widths = [12, 8, 18, 20, 10, 15, 15, 15, 15]
-    for col, width in enumerate(column_widths, start=1):
-        ws2.column_dimensions[get_column_letter(col)].width = width
-    
-    # Guardar en buffer
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
+    _fila(
+        ws2,
+        ("TOTALES:", 'total_etiqueta'), *[None] * 5,
+        (f"${estadisticas.get('costo_material_total', 0):,.0f}", 'total'),
+        (f"${estadisticas.get('costo_mano_obra_total', 0):,.0f}", 'total'),
+        (f"${estadisticas.get('costo_total', 0):,.0f}", 'total_destacado'),
+    )
     
-    return buffer
+    return _guardar_libro(wb, destino)
 
-def generar_excel_resumen_desperdicio(optimizaciones, estadisticas, periodo='todos'):
+def generar_excel_resumen_desperdicio(optimizaciones, estadisticas, periodo='todos', destino=None):
     """
     Genera un archivo Excel con el resumen de desperdicio desde estadísticas.
+    Las optimizaciones se leen por bloques y se escriben en un libro write-only.
     
     Args:
         optimizaciones: QuerySet de optimizaciones filtradas
         estadisticas: Diccionario con estadísticas calculadas
         periodo: Período seleccionado (todos, semanal, mensual, anual)
+        destino: Archivo binario donde escribir (p. ej. un temporal); por defecto un BytesIO
     
     Returns:
-        BytesIO: Buffer con el archivo Excel
+        El archivo de destino, posicionado al inicio
     """
-    import io
     from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.utils import get_column_letter
-    from datetime import datetime
-    
-    wb = Workbook()
     
-    # Estilos
-    header_fill = PatternFill(start_color="DC3545", end_color="DC3545", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    title_font = Font(bold=True, size=16)
-    subtitle_font = Font(bold=True, size=12)
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    center_alignment = Alignment(horizontal='center', vertical='center')
+    wb = Workbook(write_only=True)
+    _registrar_estilos_reporte(wb, "DC3545")
     
     # === HOJA 1: RESUMEN DE DESPERDICIO ===
-    ws1 = wb.active
-    ws1.title = "Resumen Desperdicio"
+    ws1 = wb.create_sheet("Resumen Desperdicio")
+    _anchos_columnas(ws1, [30, 20])
     
-    # Título
-    ws1['A1'] = "📊 RESUMEN DE DESPERDICIO - REPORTE DE EFICIENCIA"
-    ws1['A1'].font = title_font
-    ws1.merge_cells('A1:C1')
+    _fila(ws1, ("📊 RESUMEN DE DESPERDICIO - REPORTE DE EFICIENCIA", 'titulo'))
+    _fila(ws1)
     
     # Período
-    row = 3
     periodo_texto = {
         'todos': 'Todos los tiempos',
         'semanal': 'Última semana',
         'mensual': 'Último mes',
         'anual': 'Último año'
     }.get(periodo, 'Todos los tiempos')
-    ws1[f'A{row}'] = f"Período: {periodo_texto}"
-    ws1[f'A{row}'].font = Font(bold=True, italic=True)
-    ws1.merge_cells(f'A{row}:C{row}')
-    row += 2
+    _fila(ws1, (f"Período: {periodo_texto}", 'periodo'))
+    _fila(ws1)
     
     # Estadísticas principales
     stats_data = [
@@ -547,100 +532,62 @@ def generar_excel_resumen_desperdicio(optimizaciones, estadisticas, periodo='tod
         ['Mejor Aprovechamiento:', f"{estadisticas.get('max_aprovechamiento', 0):.2f}%"],
         ['Peor Aprovechamiento:', f"{estadisticas.get('min_aprovechamiento', 0):.2f}%"],
     ]
-    
     for label, valor in stats_data:
-        ws1[f'A{row}'] = label
-        ws1[f'A{row}'].font = Font(bold=True)
-        ws1[f'B{row}'] = valor
-        if 'Desperdicio' in label:
-            ws1[f'B{row}'].font = Font(bold=True, size=12, color="DC3545")
-        row += 1
-    
-    # Ajustar ancho de columnas
-    ws1.column_dimensions['A'].width = 30
-    ws1.column_dimensions['B'].width = 20
+        _fila(ws1, (label, 'etiqueta'), (valor, 'destacado_rojo' if 'Desperdicio' in label else 'valor'))
     
     # === HOJA 2: DETALLE DE OPTIMIZACIONES ===
     ws2 = wb.create_sheet("Detalle Optimizaciones")
+    _anchos_columnas(ws2, [12, 8, 18, 15, 15, 10, 15, 15, 18])
     
     # Encabezados
     headers = ['Fecha', 'Hora', 'Dimensiones', 'Aprovechamiento', 'Desperdicio', 
                'Tableros', 'Área Total', 'Área Usada', 'Área Desperdiciada']
-    for col, header in enumerate(headers, start=1):
-        cell = ws2.cell(row=1, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = center_alignment
-        cell.border = border
+    _fila(ws2, *[(header, 'encabezado') for header in headers])
     
-    # Datos de optimizaciones
-    for idx, opt in enumerate(optimizaciones.order_by('fecha'), start=2):
-        # Fecha y hora
-        fecha_str = opt.fecha.strftime('%d/%m/%Y')
-        hora_str = opt.fecha.strftime('%H:%M')
-        
+    # Datos de optimizaciones (solo las columnas necesarias, por bloques)
+    filas = optimizaciones.order_by('fecha', 'pk').only(
+        'fecha', 'ancho_tablero', 'alto_tablero', 'unidad_medida', 'aprovechamiento_total', 'num_tableros',
+    ).iterator(chunk_size=2000)
+    for opt in filas:
         # Dimensiones
         unidad_opt = getattr(opt, 'unidad_medida', 'cm') or 'cm'
         ancho_mostrar = round(convertir_desde_cm(opt.ancho_tablero, unidad_opt), 2)
         alto_mostrar = round(convertir_desde_cm(opt.alto_tablero, unidad_opt), 2)
         simbolo = obtener_simbolo_unidad(unidad_opt)
-        dim_str = f"{ancho_mostrar} × {alto_mostrar} {simbolo}"
         
         # Aprovechamiento y desperdicio
         aprovechamiento = opt.aprovechamiento_total or 0
         desperdicio = 100 - aprovechamiento
-        
-        # Tableros
         num_tableros = opt.num_tableros or 1
         
-        # Calcular áreas (necesitamos regenerar el gráfico para obtener info_desperdicio)
-        # Por ahora usamos valores aproximados basados en aprovechamiento
-        area_tablero = opt.ancho_tablero * opt.alto_tablero  # en cm²
-        area_total = area_tablero * num_tableros
+        # Áreas aproximadas a partir del aprovechamiento (en cm²)
+        area_total = opt.ancho_tablero * opt.alto_tablero * num_tableros
         area_usada = area_total * (aprovechamiento / 100)
         area_desperdiciada = area_total - area_usada
-        
         simbolo_area = obtener_simbolo_area(unidad_opt)
         
-        # Escribir datos
-        ws2.cell(row=idx, column=1, value=fecha_str).border = border
-        ws2.cell(row=idx, column=2, value=hora_str).border = border
-        ws2.cell(row=idx, column=3, value=dim_str).border = border
-        ws2.cell(row=idx, column=4, value=f"{aprovechamiento:.2f}%").border = border
-        ws2.cell(row=idx, column=5, value=f"{desperdicio:.2f}%").border = border
-        ws2.cell(row=idx, column=6, value=num_tableros).border = border
-        ws2.cell(row=idx, column=7, value=f"{area_total:.2f} {simbolo_area}").border = border
-        ws2.cell(row=idx, column=8, value=f"{area_usada:.2f} {simbolo_area}").border = border
-        ws2.cell(row=idx, column=9, value=f"{area_desperdiciada:.2f} {simbolo_area}").border = border
-        
-        # Formato de números
-        ws2.cell(row=idx, column=4).alignment = center_alignment
-        ws2.cell(row=idx, column=5).alignment = center_alignment
-        ws2.cell(row=idx, column=6).alignment = center_alignment
-        
         # Colorear según desperdicio
         if desperdicio > 30:
-            fill = PatternFill(start_color="F8D7DA", end_color="F8D7DA", fill_type="solid")
+            estilo_desperdicio = 'desperdicio_alto'
         elif desperdicio > 15:
-            fill = PatternFill(start_color="FFF3CD", end_color="FFF3CD", fill_type="solid")
+            estilo_desperdicio = 'desperdicio_medio'
         else:
-            fill = PatternFill(start_color="D4EDDA", end_color="D4EDDA", fill_type="solid")
-        ws2.cell(row=idx, column=5).fill = fill
+            estilo_desperdicio = 'desperdicio_bajo'
+        
+        _fila(
+            ws2,
+            (opt.fecha.strftime('%d/%m/%Y'), 'celda'),
+            (opt.fecha.strftime('%H:%M'), 'celda'),
+            (f"{ancho_mostrar} × {alto_mostrar} {simbolo}", 'celda'),
+            (f"{aprovechamiento:.2f}%", 'centro'),
+            (f"{desperdicio:.2f}%", estilo_desperdicio),
+            (num_tableros, 'centro'),
+            (f"{area_total:.2f} {simbolo_area}", 'celda'),
+            (f"{area_usada:.2f} {simbolo_area}", 'celda'),
+            (f"{area_desperdiciada:.2f} {simbolo_area}", 'celda'),
+        )
     
     # Fila de totales
-    row_total = len(optimizaciones) + 2
-    ws2.cell(row=row_total, column=1, value="TOTALES:").font = Font(bold=True, size=12)
-    ws2.cell(row=row_total, column=1).fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
-    ws2.merge_cells(f'A{row_total}:C{row_total}')
-    
-    # Ajustar ancho de columnas
-    column_widths = [12, 8, 18, 15, 15, 10, 15, 15, 18]
-    for col, width in enumerate(column_widths, start=1):
-        ws2.column_dimensions[get_column_letter(col)].width = width
+    _fila(ws2, ("TOTALES:", 'total_etiqueta'))
     
-    # Guardar en buffer
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
-    return buffer
+    return _guardar_libro(wb, destino)
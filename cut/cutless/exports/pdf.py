@@ -1,43 +1,64 @@
 """Generacion de reportes PDF."""
-import base64
+import hashlib
 import io
 import os
+import tempfile
+from decimal import Decimal
 
-from PIL import Image
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 
 from django.conf import settings
 
+from ..numbering import anotar_numero_lista
 from ..packing import normalizar_info_desperdicio
+from ..profiling import medir_etapa
 from ..render import _info_desperdicio_desde_optimizacion
-from ..units import convertir_a_cm, convertir_desde_cm, obtener_simbolo_area, obtener_simbolo_unidad
+from ..units import convertir_desde_cm, obtener_simbolo_area, obtener_simbolo_unidad
 
-def generar_pdf(optimizacion, imagenes_base64, numero_lista=None, info_desperdicio=None):
+def _leer_imagen_png(imagen):
+    """Bytes PNG desde bytes o un archivo (FieldFile / file-like)."""
+    if isinstance(imagen, (bytes, bytearray)):
+        return bytes(imagen)
+    if hasattr(imagen, 'open'):
+        with imagen.open('rb') as archivo:
+            return archivo.read()
+    return imagen.read()
+
+@medir_etapa('generar_pdf')
+def generar_pdf(optimizacion, imagenes, numero_lista=None, info_desperdicio=None, destino=None):
     """
     Genera UN SOLO PDF con todos los tableros, cada uno en su propia página.
+    Las imágenes se pasan al canvas en memoria: no se escriben archivos temporales.
     
     Args:
         optimizacion: Objeto Optimizacion
-        imagenes_base64: Lista de imágenes en base64
+        imagenes: Lista de imágenes PNG (bytes o archivos, p. ej. TableroOptimizacion.imagen)
         numero_lista: Número de la lista en el historial (opcional). Si se proporciona,
-                     se usará en el nombre del archivo en lugar del ID.
+                     se usará en el título del documento en lugar del ID.
         info_desperdicio: Dict igual al tercer retorno de generar_grafico (areas en cm²).
                          Si es None, se regenera desde la optimización guardada (más costoso).
+        destino: Archivo binario donde escribir el PDF (p. ej. un HttpResponse).
+                 Si es None se usa un BytesIO nuevo.
+
+    Returns:
+        El destino con el PDF escrito y posicionado al inicio si es un buffer, o None si no hay imágenes.
     """
-    if isinstance(imagenes_base64, str):
-        imagenes_base64 = [imagenes_base64] if imagenes_base64 else []
+    if isinstance(imagenes, (bytes, bytearray)):
+        imagenes = [imagenes] if imagenes else []
+    imagenes = list(imagenes or [])
     
-    if not imagenes_base64:
+    if not imagenes:
         return None
     
     numero = numero_lista if numero_lista is not None else optimizacion.id
-    filename = f"optimizacion_{numero}.pdf"
-    filepath = os.path.join(settings.MEDIA_ROOT, "pdfs", filename)
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    if destino is None:
+        destino = io.BytesIO()
 
-    c = canvas.Canvas(filepath, pagesize=A4)
+    c = canvas.Canvas(destino, pagesize=A4)
+    c.setTitle(f"Optimización #{numero} - CutLess")
     width, height = A4
 
     # === PÁGINA 1: Información general ===
@@ -58,7 +79,7 @@ def generar_pdf(optimizacion, imagenes_base64, numero_lista=None, info_desperdic
     simbolo = obtener_simbolo_unidad(unidad)
     
     c.drawString(2.5*cm, height - 160, f"• Dimensiones del tablero: {ancho_mostrar} × {alto_mostrar} {simbolo}")
-    c.drawString(2.5*cm, height - 175, f"• Tableros generados: {len(imagenes_base64)}")
+    c.drawString(2.5*cm, height - 175, f"• Tableros generados: {len(imagenes)}")
     
     c.setFont("Helvetica-Bold", 12)
     c.setFillColorRGB(0, 0.5, 0)
@@ -127,7 +148,11 @@ def generar_pdf(optimizacion, imagenes_base64, numero_lista=None, info_desperdic
     total_area_piezas = 0
     total_cantidad_piezas = 0
     
-    for linea in optimizacion.piezas.splitlines():
+    simbolo_area = obtener_simbolo_area(optimizacion.unidad_medida)
+    factor_lineal = convertir_desde_cm(1, optimizacion.unidad_medida)
+    factor_area = factor_lineal ** 2
+    
+    for pieza in optimizacion.piezas_detalle.all():
         if y_pos < 120:  # Más espacio para tabla
             c.showPage()
             y_pos = height - 50
@@ -143,52 +168,26 @@ def generar_pdf(optimizacion, imagenes_base64, numero_lista=None, info_desperdic
             y_pos -= 15
             c.setFont("Helvetica", 9)
         
-        try:
-            partes = linea.split(',')
-            if len(partes) == 4:
-                nombre, ancho_str, alto_str, cantidad_str = partes
-                nombre = nombre.strip()
-                ancho = float(ancho_str.strip())
-                alto = float(alto_str.strip())
-                cantidad = int(cantidad_str.strip())
-            else:
-                ancho_str, alto_str, cantidad_str = partes
-                nombre = "Pieza"
-                ancho = float(ancho_str.strip())
-                alto = float(alto_str.strip())
-                cantidad = int(cantidad_str.strip())
-            
-            # Convertir a cm si es necesario
-            ancho_cm = convertir_a_cm(ancho, optimizacion.unidad_medida)
-            alto_cm = convertir_a_cm(alto, optimizacion.unidad_medida)
-            
-            # Calcular áreas
-            area_unit_cm2 = ancho_cm * alto_cm
-            area_total_cm2 = area_unit_cm2 * cantidad
-            
-            # Convertir para mostrar
-            simbolo_area = obtener_simbolo_area(optimizacion.unidad_medida)
-            factor_lineal = convertir_desde_cm(1, optimizacion.unidad_medida)
-            factor_area = factor_lineal ** 2
-            
-            area_unit_mostrar = round(area_unit_cm2 * factor_area, 2)
-            area_total_mostrar = round(area_total_cm2 * factor_area, 2)
-            
-            ancho_mostrar = round(convertir_desde_cm(ancho_cm, optimizacion.unidad_medida), 1)
-            alto_mostrar = round(convertir_desde_cm(alto_cm, optimizacion.unidad_medida), 1)
-            
-            # Dibujar fila
-            c.drawString(2.5*cm, y_pos, str(cantidad))
-            c.drawString(4*cm, y_pos, nombre[:20])  # Limitar longitud
-            c.drawString(9*cm, y_pos, f"{ancho_mostrar} × {alto_mostrar} {obtener_simbolo_unidad(optimizacion.unidad_medida)}")
-            c.drawString(14*cm, y_pos, f"{area_unit_mostrar} {simbolo_area}")
-            c.drawString(17.5*cm, y_pos, f"{area_total_mostrar} {simbolo_area}")
-            
-            total_area_piezas += area_total_cm2
-            total_cantidad_piezas += cantidad
-            
-        except Exception as e:
-            c.drawString(2.5*cm, y_pos, f"Error: {linea}")
+        # Calcular áreas (las dimensiones se guardan en cm)
+        area_unit_cm2 = pieza.ancho_cm * pieza.alto_cm
+        area_total_cm2 = area_unit_cm2 * pieza.cantidad
+        
+        # Convertir para mostrar
+        area_unit_mostrar = round(area_unit_cm2 * factor_area, 2)
+        area_total_mostrar = round(area_total_cm2 * factor_area, 2)
+        
+        ancho_mostrar = round(convertir_desde_cm(pieza.ancho_cm, optimizacion.unidad_medida), 1)
+        alto_mostrar = round(convertir_desde_cm(pieza.alto_cm, optimizacion.unidad_medida), 1)
+        
+        # Dibujar fila
+        c.drawString(2.5*cm, y_pos, str(pieza.cantidad))
+        c.drawString(4*cm, y_pos, pieza.nombre[:20])  # Limitar longitud
+        c.drawString(9*cm, y_pos, f"{ancho_mostrar} × {alto_mostrar} {obtener_simbolo_unidad(optimizacion.unidad_medida)}")
+        c.drawString(14*cm, y_pos, f"{area_unit_mostrar} {simbolo_area}")
+        c.drawString(17.5*cm, y_pos, f"{area_total_mostrar} {simbolo_area}")
+        
+        total_area_piezas += area_total_cm2
+        total_cantidad_piezas += pieza.cantidad
         
         y_pos -= 15
     
@@ -197,9 +196,6 @@ def generar_pdf(optimizacion, imagenes_base64, numero_lista=None, info_desperdic
     c.line(2*cm, y_pos, width - 2*cm, y_pos)
     y_pos -= 15
     c.setFont("Helvetica-Bold", 10)
-    simbolo_area = obtener_simbolo_area(optimizacion.unidad_medida)
-    factor_lineal = convertir_desde_cm(1, optimizacion.unidad_medida)
-    factor_area = factor_lineal ** 2
     total_area_mostrar = round(total_area_piezas * factor_area, 2)
     c.drawString(17.5*cm, y_pos, f"Total: {total_area_mostrar} {simbolo_area}")
     c.drawString(2.5*cm, y_pos, f"Total piezas: {total_cantidad_piezas}")
@@ -239,7 +235,7 @@ def generar_pdf(optimizacion, imagenes_base64, numero_lista=None, info_desperdic
         info_desperdicio = normalizar_info_desperdicio(info_desperdicio)
     info_tableros = info_desperdicio.get('info_tableros') or []
 
-    for i in range(len(imagenes_base64)):
+    for i in range(len(imagenes)):
         if y_pos < 100:
             c.showPage()
             y_pos = height - 50
@@ -263,42 +259,32 @@ def generar_pdf(optimizacion, imagenes_base64, numero_lista=None, info_desperdic
         y_pos -= 12
 
     # === PÁGINAS SIGUIENTES: Un tablero por página ===
-    for i, img_base64 in enumerate(imagenes_base64, start=1):
-        if not img_base64 or img_base64.isspace():
+    for i, imagen in enumerate(imagenes, start=1):
+        if not imagen:
             continue
 
         try:
             c.showPage()
             
             c.setFont("Helvetica-Bold", 16)
-            c.drawCentredString(width / 2, height - 40, f"Tablero {i} de {len(imagenes_base64)}")
-
-            image_data = base64.b64decode(img_base64)
-            img_temp = os.path.join(settings.MEDIA_ROOT, f"temp_img_{optimizacion.id}_{i}.png")
-            with open(img_temp, "wb") as f:
-                f.write(image_data)
+            c.drawCentredString(width / 2, height - 40, f"Tablero {i} de {len(imagenes)}")
 
-            with Image.open(img_temp) as im:
-                img_width, img_height = im.size
-                max_width = 18 * cm
-                max_height = 23 * cm
-                ratio = min(max_width / img_width, max_height / img_height)
-                final_width = img_width * ratio
-                final_height = img_height * ratio
+            imagen_reader = ImageReader(io.BytesIO(_leer_imagen_png(imagen)))
+            img_width, img_height = imagen_reader.getSize()
+            max_width = 18 * cm
+            max_height = 23 * cm
+            ratio = min(max_width / img_width, max_height / img_height)
+            final_width = img_width * ratio
+            final_height = img_height * ratio
 
             x_pos = (width - final_width) / 2
             y_pos = (height - final_height - 3*cm) / 2
             
-            c.drawImage(img_temp, x_pos, y_pos, width=final_width, height=final_height, 
+            c.drawImage(imagen_reader, x_pos, y_pos, width=final_width, height=final_height, 
                        preserveAspectRatio=True, mask='auto')
 
             c.setFont("Helvetica-Oblique", 9)
-            c.drawCentredString(width / 2, 1.5*cm, f"Página {i+1} de {len(imagenes_base64)+1}")
-
-            try:
-                os.remove(img_temp)
-            except Exception:
-                pass
+            c.drawCentredString(width / 2, 1.5*cm, f"Página {i+1} de {len(imagenes)+1}")
 
         except Exception as e:
             c.setFont("Helvetica-Oblique", 10)
@@ -311,33 +297,116 @@ def generar_pdf(optimizacion, imagenes_base64, numero_lista=None, info_desperdic
     c.drawCentredString(width / 2, 0.7*cm, "CutLess - Optimización de Recursos en Carpintería | Algoritmo FFD")
     
     c.save()
-    
-    return os.path.join("pdfs", filename)
+    if hasattr(destino, 'seek'):
+        destino.seek(0)
+    return destino
 
-def generar_pdf_presupuesto(presupuesto):
+# El PDF de un presupuesto se reutiliza mientras no cambien el presupuesto, su cliente ni
+# lo que se imprime de sus optimizaciones: la firma de ese contenido va en el nombre
+DIRECTORIO_PDF_PRESUPUESTOS = 'presupuestos'
+
+
+def optimizaciones_presupuesto(presupuesto):
+    """
+    Optimizaciones del presupuesto con todo lo que imprime el PDF en tres consultas:
+    número de lista y material en la principal, y las piezas normalizadas aparte.
+    """
+    return list(
+        anotar_numero_lista(presupuesto.optimizaciones.all())
+        .select_related('material')
+        .prefetch_related('piezas_detalle')
+    )
+
+
+def _firma_pdf_presupuesto(presupuesto, optimizaciones):
+    """Huella del contenido impreso: presupuesto, datos del cliente y de cada optimización."""
+    partes = [str(presupuesto.pk), presupuesto.fecha_actualizacion.isoformat()]
+    cliente = presupuesto.cliente
+    if cliente is not None:
+        partes.append(repr((
+            cliente.pk, cliente.nombre, cliente.rut, cliente.email, cliente.telefono, cliente.direccion,
+        )))
+    for opt in optimizaciones:
+        partes.append(repr((
+            opt.pk, opt.numero_lista, opt.num_tableros, opt.aprovechamiento_total,
+            opt.ancho_tablero, opt.alto_tablero, opt.unidad_medida,
+            opt.material.nombre if opt.material else None,
+            [(p.nombre, p.ancho_cm, p.alto_cm, p.cantidad) for p in opt.piezas_detalle.all()],
+        )))
+    return hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()
+
+
+def _prefijo_pdf_presupuesto(presupuesto):
+    # El número solo es único por usuario: el usuario va en el nombre del archivo
+    return f"presupuesto_{presupuesto.usuario_id}_{presupuesto.numero.replace('-', '_')}_"
+
+
+def ruta_pdf_presupuesto(presupuesto, firma):
+    """Ruta del PDF del presupuesto para el contenido con esa firma."""
+    nombre = f"{_prefijo_pdf_presupuesto(presupuesto)}{firma[:16]}.pdf"
+    return os.path.join(settings.MEDIA_ROOT, DIRECTORIO_PDF_PRESUPUESTOS, nombre)
+
+
+def obtener_pdf_presupuesto(presupuesto):
+    """
+    Ruta del PDF del presupuesto, regenerándolo solo si cambió lo que imprime desde la
+    última vez. Al regenerar se borran las versiones anteriores del mismo presupuesto.
+    """
+    optimizaciones = optimizaciones_presupuesto(presupuesto)
+    ruta = ruta_pdf_presupuesto(presupuesto, _firma_pdf_presupuesto(presupuesto, optimizaciones))
+    if os.path.exists(ruta):
+        return ruta
+    generar_pdf_presupuesto(presupuesto, optimizaciones, ruta=ruta)
+    directorio = os.path.dirname(ruta)
+    prefijo = _prefijo_pdf_presupuesto(presupuesto)
+    for nombre in os.listdir(directorio):
+        anterior = os.path.join(directorio, nombre)
+        if nombre.startswith(prefijo) and anterior != ruta:
+            try:
+                os.remove(anterior)
+            except OSError:
+                pass
+    return ruta
+
+def generar_pdf_presupuesto(presupuesto, optimizaciones=None, ruta=None):
     """
     Genera un PDF profesional del presupuesto.
     
     Args:
         presupuesto: Objeto Presupuesto
+        optimizaciones: Resultado de optimizaciones_presupuesto (se consulta si es None)
+        ruta: Destino del PDF (por defecto ruta_pdf_presupuesto según su contenido)
         
     Returns:
         str: Ruta del archivo PDF generado
     """
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.units import cm
-    from reportlab.pdfgen import canvas
+    if optimizaciones is None:
+        optimizaciones = optimizaciones_presupuesto(presupuesto)
+    filepath = ruta or ruta_pdf_presupuesto(presupuesto, _firma_pdf_presupuesto(presupuesto, optimizaciones))
+    directorio = os.path.dirname(filepath)
+    os.makedirs(directorio, exist_ok=True)
+
+    # Se escribe aparte y se renombra: quien encuentre el archivo en su ruta lo ve completo
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as destino:
+            c = canvas.Canvas(destino, pagesize=A4)
+            _dibujar_pdf_presupuesto(c, presupuesto, optimizaciones)
+            c.save()
+        os.replace(temporal, filepath)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return filepath
+
+
+def _dibujar_pdf_presupuesto(c, presupuesto, optimizaciones):
+    """Dibuja el presupuesto en el canvas ``c``."""
     from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+    from reportlab.platypus import Table, TableStyle
     from django.utils import timezone
     
-    filename = f"presupuesto_{presupuesto.numero.replace('-', '_')}.pdf"
-    filepath = os.path.join(settings.MEDIA_ROOT, "presupuestos", filename)
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    
-    c = canvas.Canvas(filepath, pagesize=A4)
     width, height = A4
     
     # === ENCABEZADO ===
@@ -392,10 +461,10 @@ def generar_pdf_presupuesto(presupuesto):
     y_pos -= 15
     
     # === DETALLES DE LAS OPTIMIZACIONES ===
-    optimizaciones = presupuesto.optimizaciones.all()
+    # Número de lista de cada optimización (calculado en la BD, igual que en historial)
     y_pos -= 20
     c.setFont("Helvetica-Bold", 12)
-    c.drawString(2*cm, y_pos, f"Detalles de las Optimizaciones ({optimizaciones.count()}):")
+    c.drawString(2*cm, y_pos, f"Detalles de las Optimizaciones ({len(optimizaciones)}):")
     c.setFont("Helvetica", 11)
     y_pos -= 20
     
@@ -418,50 +487,19 @@ def generar_pdf_presupuesto(presupuesto):
             c.drawString(3*cm, y_pos, f"• Material: {optimizacion.material.nombre}")
             y_pos -= 15
         
-        # Agregar lista de piezas con nombres
-        if optimizacion.piezas:
+        # Agregar lista de piezas con nombres (filas normalizadas, ya en la unidad de la optimización)
+        piezas_list = list(optimizacion.piezas_detalle.all())
+        if piezas_list:
             c.setFont("Helvetica-Bold", 10)
             c.drawString(3*cm, y_pos, "• Piezas:")
             y_pos -= 12
             c.setFont("Helvetica", 9)
             
-            # Parsear piezas
-            piezas_list = []
-            for linea in optimizacion.piezas.splitlines():
-                if linea.strip():
-                    partes = linea.split(',')
-                    if len(partes) == 4:  # Formato con nombre: nombre,ancho,alto,cantidad
-                        nombre = partes[0].strip()
-                        ancho_pieza = float(partes[1].strip())
-                        alto_pieza = float(partes[2].strip())
-                        cantidad = int(partes[3].strip())
-                        # Convertir dimensiones a la unidad de la optimización
-                        ancho_mostrar_pieza = round(convertir_desde_cm(ancho_pieza, unidad), 2)
-                        alto_mostrar_pieza = round(convertir_desde_cm(alto_pieza, unidad), 2)
-                        piezas_list.append({
-                            'nombre': nombre,
-                            'ancho': ancho_mostrar_pieza,
-                            'alto': alto_mostrar_pieza,
-                            'cantidad': cantidad
-                        })
-                    elif len(partes) == 3:  # Formato sin nombre: ancho,alto,cantidad
-                        ancho_pieza = float(partes[0].strip())
-                        alto_pieza = float(partes[1].strip())
-                        cantidad = int(partes[2].strip())
-                        ancho_mostrar_pieza = round(convertir_desde_cm(ancho_pieza, unidad), 2)
-                        alto_mostrar_pieza = round(convertir_desde_cm(alto_pieza, unidad), 2)
-                        piezas_list.append({
-                            'nombre': f"Pieza {len(piezas_list) + 1}",
-                            'ancho': ancho_mostrar_pieza,
-                            'alto': alto_mostrar_pieza,
-                            'cantidad': cantidad
-                        })
-            
             # Mostrar piezas (máximo 5 para no ocupar mucho espacio)
             for pieza in piezas_list[:5]:
                 if y_pos < 150:  # Si se acerca al final de la página, salir
                     break
-                texto_pieza = f"  - {pieza['nombre']}: {pieza['ancho']:.2f} × {pieza['alto']:.2f} {simbolo} (x{pieza['cantidad']})"
+                texto_pieza = f"  - {pieza.nombre}: {pieza.ancho:.2f} × {pieza.alto:.2f} {simbolo} (x{pieza.cantidad})"
                 # Truncar si es muy largo
                 if len(texto_pieza) > 70:
                     texto_pieza = texto_pieza[:67] + "..."
@@ -489,10 +527,6 @@ def generar_pdf_presupuesto(presupuesto):
     # Tabla de costos - considerar todas las optimizaciones
     data = [['Concepto', 'Cantidad', 'Precio Unitario', 'Subtotal']]
     
-    # Calcular número de lista para cada optimización (basado en orden por fecha descendente)
-    todas_optimizaciones_usuario = Optimizacion.objects.filter(usuario=presupuesto.optimizaciones.first().usuario).order_by('-fecha')
-    total_optimizaciones_usuario = todas_optimizaciones_usuario.count()
-    
     # Agregar fila por cada optimización
     total_tableros = 0
     for optimizacion in optimizaciones:
@@ -500,13 +534,7 @@ def generar_pdf_presupuesto(presupuesto):
         total_tableros += num_tableros
         costo_tableros = presupuesto.precio_tablero * Decimal(str(num_tableros))
         
-        # Calcular el número de lista (basado en orden por fecha descendente)
-        numero_lista = optimizacion.pk  # Por defecto usar el ID
-        for idx, opt in enumerate(todas_optimizaciones_usuario, start=1):
-            if opt.id == optimizacion.id:
-                # Para orden descendente: numero = total - idx + 1
-                numero_lista = total_optimizaciones_usuario - idx + 1
-                break
+        numero_lista = optimizacion.numero_lista
         
         data.append([
             f'Tableros (Optimización #{numero_lista})',
@@ -516,7 +544,7 @@ def generar_pdf_presupuesto(presupuesto):
         ])
     
     # Agregar mano de obra (una sola vez, no por optimización)
-    if optimizaciones.count() > 0:
+    if optimizaciones:
         data.append([
             'Mano de Obra',
             '1',
@@ -566,9 +594,6 @@ def generar_pdf_presupuesto(presupuesto):
     c.setFont("Helvetica", 8)
     c.setFillColorRGB(0.5, 0.5, 0.5)
     c.drawCentredString(width / 2, 30, f"Generado el {timezone.now().strftime('%d/%m/%Y %H:%M')} - CutLess")
-    
-    c.save()
-    return filepath
 
 def generar_pdf_resumen_desperdicio(optimizaciones, estadisticas, periodo='todos'):
     """
@@ -0,0 +1,18 @@
+"""Fechas de los filtros: parámetros AAAA-MM-DD y límites de días en la zona horaria local."""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def limites_dia(dia):
+    """Inicio y fin (exclusivo) del día en la zona horaria local."""
+    inicio = timezone.make_aware(datetime.combine(dia, time.min))
+    return inicio, timezone.make_aware(datetime.combine(dia + timedelta(days=1), time.min))
+
+
+def fecha_parametro(valor):
+    """Fecha AAAA-MM-DD de la query string, o None si falta o no es válida."""
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+    except ValueError:
+        return None
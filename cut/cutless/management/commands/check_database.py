@@ -20,18 +20,27 @@ class Command(BaseCommand):
 
     def check_tables(self):
         """Verifica si existen las tablas necesarias."""
-        cursor = connection.cursor()
-        cursor.execute(
-            "SELECT name FROM sqlite_master WHERE type='table';"
-        )
-        tables = cursor.fetchall()
-        table_names = [t[0] for t in tables]
+        # Introspección de Django: válida para cualquier motor de base de datos
+        with connection.cursor() as cursor:
+            table_names = connection.introspection.table_names(cursor)
         
         required_tables = ['auth_user', 'cutless_material', 'usuarios_perfilusuario']
         missing = [t for t in required_tables if t not in table_names]
         
         return missing
 
+    def ajustes_sqlite(self):
+        """Valores efectivos de los PRAGMA configurados en cutless_project/database.py."""
+        valores = []
+        with connection.cursor() as cursor:
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size'):
+                cursor.execute(f"PRAGMA {pragma}")
+                fila = cursor.fetchone()
+                # mmap_size no devuelve fila en bases de datos en memoria
+                if fila is not None:
+                    valores.append(f"{pragma}={fila[0]}")
+        return ', '.join(valores)
+
     def handle(self, *args, **options):
         self.stdout.write("🔍 Verificando base de datos...\n")
         
@@ -41,6 +50,8 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.SUCCESS('✅ La base de datos está correctamente configurada')
             )
+            if connection.vendor == 'sqlite':
+                self.stdout.write(f"   Ajustes SQLite: {self.ajustes_sqlite()}")
             return
         
         self.stdout.write(
@@ -0,0 +1,69 @@
+"""
+Comando Django para enviar los emails de notificación en cola (outbox), por lotes y con
+una sola conexión SMTP por lote. Los fallos se reintentan con espera creciente.
+Uso: python manage.py enviar_notificaciones [--lote N] [--max-intentos N] [--continuo [--intervalo S]]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cutless.models import NotificacionEmail
+from cutless.services.notifications import MAX_INTENTOS_EMAIL, enviar_notificaciones_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Envía los emails de notificación pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=50,
+            help='Emails enviados por conexión SMTP'
+        )
+        parser.add_argument(
+            '--max-intentos',
+            dest='max_intentos',
+            type=int,
+            default=MAX_INTENTOS_EMAIL,
+            help='Intentos antes de marcar un email como fallido'
+        )
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='No termina: revisa la cola cada --intervalo segundos'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=30,
+            help='Segundos entre revisiones de la cola en modo continuo'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        if lote < 1 or options['max_intentos'] < 1:
+            raise CommandError('--lote y --max-intentos deben ser mayores que 0')
+
+        while True:
+            total_enviadas = total_fallidas = 0
+            # Lotes seguidos mientras quede trabajo listo para enviar
+            while True:
+                enviadas, fallidas = enviar_notificaciones_pendientes(lote, options['max_intentos'])
+                total_enviadas += enviadas
+                total_fallidas += fallidas
+                if enviadas + fallidas < lote:
+                    break
+
+            if total_enviadas or total_fallidas:
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ {total_enviadas} email(s) enviado(s), {total_fallidas} con error "
+                    f"({NotificacionEmail.objects.filter(estado='pendiente').count()} en cola)."
+                ))
+            elif not options['continuo']:
+                self.stdout.write(self.style.SUCCESS('✅ No hay emails pendientes.'))
+
+            if not options['continuo']:
+                return
+            time.sleep(options['intervalo'])
@@ -0,0 +1,111 @@
+"""
+Comando Django para borrar de MEDIA_ROOT los archivos que ya no referencia ninguna fila
+(resultados de optimizaciones borradas, versiones reemplazadas, duplicados antiguos).
+Uso: python manage.py limpiar_media [--simular] [--edad-minima HORAS]
+"""
+
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cutless.storage import DIRECTORIO_CONTENIDO, EDAD_MINIMA_BORRADO, campos_archivo, referencias
+
+
+def archivos_referenciados():
+    """Nombres (relativos a MEDIA_ROOT) que referencia algún FileField del proyecto."""
+    raiz = os.path.abspath(settings.MEDIA_ROOT)
+    referenciados = set()
+    for modelo, campo in campos_archivo():
+        nombres = (
+            modelo._base_manager
+            .exclude(**{campo.attname: ''})
+            .exclude(**{f'{campo.attname}__isnull': True})
+            .values_list(campo.attname, flat=True)
+            .distinct()
+            .iterator(chunk_size=2000)
+        )
+        for nombre in nombres:
+            # Algunos registros antiguos guardan la ruta absoluta del archivo
+            if os.path.isabs(nombre):
+                nombre = os.path.relpath(nombre, raiz)
+            referenciados.add(os.path.normpath(nombre))
+    return referenciados
+
+
+def _referenciado(nombre):
+    """Comprobación puntual (con los datos actuales) de si alguna fila usa ``nombre``."""
+    return bool(referencias([nombre], solo_por_contenido=False)[nombre])
+
+
+def directorios_gestionados():
+    """Directorios de MEDIA_ROOT cuyos archivos pertenecen a algún FileField (sin anidar)."""
+    directorios = {DIRECTORIO_CONTENIDO}
+    for _, campo in campos_archivo():
+        if isinstance(campo.upload_to, str) and campo.upload_to.strip('/'):
+            directorios.add(os.path.normpath(campo.upload_to.strip('/')))
+    return sorted(
+        d for d in directorios
+        if not any(d != otro and d.startswith(otro + os.sep) for otro in directorios)
+    )
+
+
+class Command(BaseCommand):
+    help = 'Borra de MEDIA_ROOT los archivos que ninguna fila referencia'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Solo informa qué se borraría'
+        )
+        parser.add_argument(
+            '--edad-minima',
+            dest='edad_minima',
+            type=float,
+            default=EDAD_MINIMA_BORRADO / 3600,
+            help='Horas de antigüedad mínima para borrar un archivo (protege escrituras en curso)'
+        )
+
+    def handle(self, *args, **options):
+        if options['edad_minima'] < 0:
+            raise CommandError('--edad-minima no puede ser negativa')
+        limite = time.time() - options['edad_minima'] * 3600
+        raiz = os.path.abspath(settings.MEDIA_ROOT)
+
+        self.stdout.write("🔍 Buscando archivos sin referencias...")
+        referenciados = archivos_referenciados()
+        borrados = 0
+        liberados = 0
+        for directorio in directorios_gestionados():
+            for base, _, nombres in os.walk(os.path.join(raiz, directorio), topdown=False):
+                for nombre in nombres:
+                    ruta = os.path.join(base, nombre)
+                    relativo = os.path.relpath(ruta, raiz)
+                    if relativo in referenciados:
+                        continue
+                    try:
+                        estado = os.stat(ruta)
+                        if estado.st_mtime > limite:
+                            continue
+                        if not options['simular']:
+                            # Justo antes de borrar se vuelve a comprobar: un trabajo en curso
+                            # puede haberlo reutilizado (renueva la fecha) o referenciado
+                            if os.stat(ruta).st_mtime > limite or _referenciado(relativo):
+                                continue
+                            os.remove(ruta)
+                    except OSError:
+                        continue
+                    borrados += 1
+                    liberados += estado.st_size
+                if not options['simular'] and base != os.path.join(raiz, directorio):
+                    try:
+                        os.rmdir(base)  # solo si quedó vacío
+                    except OSError:
+                        pass
+
+        accion = 'se borrarían' if options['simular'] else 'borrados'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {borrados} archivo(s) sin referencias {accion} ({liberados / (1024 * 1024):.1f} MB)."
+        ))
@@ -0,0 +1,57 @@
+"""
+Comando Django para borrar definitivamente las optimizaciones marcadas desde el historial:
+filas por lotes (cada lote en su transacción) y luego los archivos sin referencias.
+Uso: python manage.py purgar_optimizaciones [--lote N] [--continuo [--intervalo S]]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cutless.services.deletion import TAM_LOTE_PURGA, purgar_optimizaciones_eliminadas
+
+
+class Command(BaseCommand):
+    help = 'Purga las optimizaciones marcadas para borrar y sus archivos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAM_LOTE_PURGA,
+            help='Optimizaciones borradas por transacción'
+        )
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='No termina: revisa la cola cada --intervalo segundos'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=30,
+            help='Segundos entre revisiones de la cola en modo continuo'
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        if lote < 1:
+            raise CommandError('--lote debe ser mayor que 0')
+
+        while True:
+            total = 0
+            # Lotes seguidos mientras queden optimizaciones marcadas
+            while True:
+                borradas = purgar_optimizaciones_eliminadas(lote)
+                total += borradas
+                if borradas < lote:
+                    break
+
+            if total:
+                self.stdout.write(self.style.SUCCESS(f"✅ {total} optimización(es) purgada(s)."))
+            elif not options['continuo']:
+                self.stdout.write(self.style.SUCCESS('✅ No hay optimizaciones por purgar.'))
+
+            if not options['continuo']:
+                return
+            time.sleep(options['intervalo'])
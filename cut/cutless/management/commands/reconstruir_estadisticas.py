@@ -0,0 +1,33 @@
+"""
+Comando Django para regenerar los resúmenes diarios de estadísticas.
+Uso: python manage.py reconstruir_estadisticas [--usuario NOMBRE ...]
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from cutless.models import EstadisticaDiaria
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la tabla EstadisticaDiaria a partir de las optimizaciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            action='append',
+            dest='usuarios',
+            help='Nombre de usuario a reconstruir (se puede repetir). Por defecto, todos.'
+        )
+
+    def handle(self, *args, **options):
+        usuarios = None
+        if options['usuarios']:
+            usuarios = list(User.objects.filter(username__in=options['usuarios']))
+            faltantes = set(options['usuarios']) - {u.username for u in usuarios}
+            if faltantes:
+                raise CommandError(f"Usuarios no encontrados: {', '.join(sorted(faltantes))}")
+
+        self.stdout.write("🔄 Reconstruyendo estadísticas diarias...")
+        dias = EstadisticaDiaria.reconstruir(usuarios)
+        self.stdout.write(self.style.SUCCESS(f"✅ {dias} día(s) resumido(s)."))
@@ -0,0 +1,267 @@
+"""
+Comando Django para generar por adelantado los resultados (tableros, imágenes y PDF)
+de optimizaciones antiguas o incompletas, en paralelo y con posibilidad de reanudar.
+Uso: python manage.py reprocesar_resultados [--procesos N] [--lote N] [--antes-de AAAA-MM-DD] [--desde-cero]
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, time as hora
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+CHECKPOINT_POR_DEFECTO = settings.BASE_DIR / '.reprocesar_resultados.json'
+# Reintentos cuando otro proceso tiene la base de datos bloqueada (SQLite admite un escritor)
+INTENTOS_POR_OPTIMIZACION = 3
+
+
+def optimizaciones_pendientes(antes_de=None):
+    """
+    Optimizaciones sin resultado persistido o con resultado incompleto (sin tableros o
+    sin PDF) y, si se indica ``antes_de``, las generadas antes de esa fecha.
+    """
+    from cutless.models import Optimizacion, TableroOptimizacion
+
+    con_tableros = TableroOptimizacion.objects.filter(optimizacion=OuterRef('pk'))
+    condicion = Q(resultado_generado=False) | ~Exists(con_tableros) | Q(pdf='') | Q(pdf__isnull=True)
+    if antes_de:
+        condicion |= Q(resultado_generado_en__lt=antes_de)
+    return Optimizacion.objects.filter(condicion)
+
+
+# Los modelos se importan dentro de las funciones: los procesos del pool (contexto spawn)
+# importan este módulo antes de que _inicializar_proceso configure Django.
+def _inicializar_proceso():
+    """Cada proceso del pool arranca su propio Django."""
+    import django
+    django.setup()
+
+
+def _procesar_optimizacion(optimizacion, antes_de=None):
+    """
+    Dibuja fuera de la transacción (lo costoso) y persiste dentro de una transacción
+    corta, reintentando si otro proceso tiene la base de datos bloqueada.
+    """
+    from cutless.services import (
+        calcular_numero_lista,
+        obtener_resultado_optimizacion,
+        persistir_resultado_optimizacion,
+        renderizar_resultado_optimizacion,
+    )
+
+    numero_lista = calcular_numero_lista(optimizacion.usuario_id, optimizacion.pk)
+    generado_en = optimizacion.resultado_generado_en
+    forzar = bool(antes_de and generado_en and generado_en < antes_de)
+    resultado = None
+    if forzar or not (optimizacion.resultado_generado and optimizacion.tableros.exists()):
+        resultado = renderizar_resultado_optimizacion(optimizacion)
+        if not resultado[0]:
+            # Sin tableros no hay nada que persistir: seguiría pendiente en cada pasada
+            raise ValueError('El cálculo no produjo ningún tablero')
+
+    for intento in range(1, INTENTOS_POR_OPTIMIZACION + 1):
+        if intento > 1:
+            # El intento fallido ya cambió la instancia (nombres de archivos, marcas)
+            optimizacion.refresh_from_db()
+        try:
+            # Todo o nada: un fallo a medias no deja un resultado incompleto marcado como hecho
+            with transaction.atomic():
+                if resultado is None:
+                    # Solo falta el PDF: se genera a partir de los tableros guardados
+                    obtener_resultado_optimizacion(optimizacion, numero_lista=numero_lista, persistir_si_falta=True)
+                else:
+                    imagenes, aprovechamiento, info = resultado
+                    persistir_resultado_optimizacion(
+                        optimizacion, imagenes, info, aprovechamiento, numero_lista=numero_lista,
+                    )
+            return
+        except OperationalError:
+            if intento == INTENTOS_POR_OPTIMIZACION:
+                raise
+            time.sleep(0.5 * intento)
+
+
+def procesar_lote(ids, antes_de=None):
+    """
+    Genera y persiste el resultado de cada optimización del lote. Los errores se
+    devuelven en lugar de propagarse para que un registro dañado no detenga el resto.
+    """
+    from cutless.models import Optimizacion
+
+    procesadas = 0
+    errores = []
+    for optimizacion in Optimizacion.objects.filter(pk__in=ids).order_by('pk'):
+        try:
+            _procesar_optimizacion(optimizacion, antes_de)
+            procesadas += 1
+        except Exception as e:
+            errores.append((optimizacion.pk, str(e)))
+    return procesadas, errores
+
+
+class Command(BaseCommand):
+    help = 'Genera en lote los resultados de optimizaciones antiguas o incompletas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=max(1, (os.cpu_count() or 2) - 1),
+            help='Procesos en paralelo (1 = en este mismo proceso)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=25,
+            help='Optimizaciones por tarea enviada a cada proceso'
+        )
+        parser.add_argument(
+            '--antes-de',
+            dest='antes_de',
+            help='Regenerar también los resultados generados antes de esta fecha (AAAA-MM-DD)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=str(CHECKPOINT_POR_DEFECTO),
+            help='Archivo donde se guarda el avance para poder reanudar'
+        )
+        parser.add_argument(
+            '--desde-cero',
+            action='store_true',
+            help='Ignora el checkpoint existente y empieza desde el principio'
+        )
+
+    def handle(self, *args, **options):
+        procesos = options['procesos']
+        tam_lote = options['lote']
+        if procesos < 1 or tam_lote < 1:
+            raise CommandError('--procesos y --lote deben ser mayores que 0')
+
+        antes_de = None
+        if options['antes_de']:
+            try:
+                dia = datetime.strptime(options['antes_de'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--antes-de debe tener el formato AAAA-MM-DD')
+            antes_de = timezone.make_aware(datetime.combine(dia, hora.min))
+
+        ruta_checkpoint = options['checkpoint']
+        checkpoint = {} if options['desde_cero'] else self._leer_checkpoint(ruta_checkpoint)
+        if checkpoint.get('antes_de') != options['antes_de']:
+            checkpoint = {}
+        ultimo_pk = checkpoint.get('ultimo_pk', 0)
+
+        pendientes = optimizaciones_pendientes(antes_de).filter(pk__gt=ultimo_pk).order_by('pk')
+        total = pendientes.count()
+        if ultimo_pk:
+            self.stdout.write(f"↩️  Reanudando después de la optimización #{ultimo_pk}")
+        if not total:
+            self.stdout.write(self.style.SUCCESS('✅ No hay optimizaciones pendientes.'))
+            return
+        self.stdout.write(f"🔄 Procesando {total} optimización(es) con {procesos} proceso(s)...")
+
+        procesadas = checkpoint.get('procesadas', 0)
+        errores = checkpoint.get('errores', 0)
+        hechas = 0
+        inicio = time.monotonic()
+        # Lotes en orden de envío: el checkpoint avanza solo sobre lotes consecutivos
+        # terminados, así reanudar nunca salta uno que quedó a medias
+        en_orden = deque()
+        terminados = {}
+
+        for indice, (lote, (ok, fallidas)) in self._ejecutar(pendientes, tam_lote, procesos, antes_de, en_orden):
+            terminados[indice] = lote
+            procesadas += ok
+            hechas += len(lote)
+            errores += len(fallidas)
+            for pk, mensaje in fallidas:
+                self.stderr.write(f"❌ Optimización #{pk}: {mensaje}")
+
+            while en_orden and en_orden[0] in terminados:
+                ultimo_pk = terminados.pop(en_orden.popleft())[-1]
+            self._guardar_checkpoint(ruta_checkpoint, {
+                'ultimo_pk': ultimo_pk,
+                'procesadas': procesadas,
+                'errores': errores,
+                'antes_de': options['antes_de'],
+            })
+
+            transcurrido = time.monotonic() - inicio
+            self.stdout.write(
+                f"   {hechas}/{total} · {hechas / transcurrido if transcurrido else 0:.1f} opt/s · "
+                f"{errores} error(es)"
+            )
+
+        transcurrido = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {hechas} optimización(es) en {transcurrido:.1f}s "
+            f"({hechas / transcurrido if transcurrido else 0:.1f} opt/s), {errores} error(es)."
+        ))
+        # Pasada completa: las que fallaron siguen pendientes y se reintentan en la próxima
+        if os.path.exists(ruta_checkpoint):
+            os.remove(ruta_checkpoint)
+
+    def _lotes(self, queryset, tam_lote):
+        """
+        Recorre solo los ids en bloques (paginación por pk), sin cargar filas completas
+        ni mantener un cursor abierto que bloquee las escrituras de los procesos en SQLite.
+        """
+        ultimo = 0
+        while True:
+            lote = list(queryset.filter(pk__gt=ultimo).values_list('pk', flat=True)[:tam_lote])
+            if not lote:
+                return
+            yield lote
+            ultimo = lote[-1]
+
+    def _ejecutar(self, queryset, tam_lote, procesos, antes_de, en_orden):
+        """
+        Produce (índice, (lote, resultado)) a medida que terminan los lotes. Con varios
+        procesos mantiene a lo sumo ``2 × procesos`` lotes en curso (memoria acotada).
+        """
+        lotes = enumerate(self._lotes(queryset, tam_lote))
+        if procesos == 1:
+            for indice, lote in lotes:
+                en_orden.append(indice)
+                yield indice, (lote, procesar_lote(lote, antes_de))
+            return
+
+        # Los procesos hijos abren sus propias conexiones
+        connections.close_all()
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto, initializer=_inicializar_proceso) as pool:
+            en_curso = {}
+            for indice, lote in lotes:
+                en_orden.append(indice)
+                en_curso[pool.submit(procesar_lote, lote, antes_de)] = (indice, lote)
+                if len(en_curso) >= 2 * procesos:
+                    listos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                    for futuro in listos:
+                        indice_listo, lote_listo = en_curso.pop(futuro)
+                        yield indice_listo, (lote_listo, futuro.result())
+            while en_curso:
+                listos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    indice_listo, lote_listo = en_curso.pop(futuro)
+                    yield indice_listo, (lote_listo, futuro.result())
+
+    def _leer_checkpoint(self, ruta):
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                return json.load(archivo)
+        except (OSError, ValueError):
+            return {}
+
+    def _guardar_checkpoint(self, ruta, datos):
+        temporal = f"{ruta}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(datos, archivo)
+        os.replace(temporal, ruta)
@@ -1,12 +1,25 @@
 """
 Middleware para verificar la integridad de la base de datos.
 Alerta al usuario si las migraciones no han sido ejecutadas.
+
+También el middleware opcional de perfilado (tiempos por etapa y cProfile por muestreo).
 """
 
+import cProfile
 import logging
+import os
+import random
+import re
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.db import connection, OperationalError
 
+from .profiling import medir_peticion
+
 logger = logging.getLogger(__name__)
+logger_perfilado = logging.getLogger('cutless.profiling')
 
 
 class DatabaseHealthCheckMiddleware:
@@ -32,12 +45,10 @@ class DatabaseHealthCheckMiddleware:
     def _check_database(self):
         """Verifica si existen las tablas necesarias."""
         try:
-            cursor = connection.cursor()
-            # Verificar tabla de usuarios (django.contrib.auth)
-            cursor.execute(
-                "SELECT name FROM sqlite_master WHERE type='table' AND name='auth_user';"
-            )
-            self._has_tables = cursor.fetchone() is not None
+            # Verificar tabla de usuarios (django.contrib.auth); la introspección de
+            # Django funciona con cualquier motor, no solo SQLite
+            with connection.cursor() as cursor:
+                self._has_tables = 'auth_user' in connection.introspection.table_names(cursor)
             
             if not self._has_tables:
                 logger.warning(
@@ -51,3 +62,61 @@ class DatabaseHealthCheckMiddleware:
             )
         except Exception as e:
             logger.error(f"Error verificando BD: {e}")
+
+
+class ProfilingMiddleware:
+    """
+    Mide cada petición cuando CUTLESS_PROFILING está activo: añade la cabecera
+    ``Server-Timing`` (total y etapas de ``medir_etapa``) y escribe una línea de log por
+    petición. Una fracción de las peticiones (CUTLESS_PROFILING_MUESTREO) se ejecuta con
+    cProfile y, si supera CUTLESS_PROFILING_UMBRAL_MS, guarda el .prof en
+    CUTLESS_PROFILING_DIRECTORIO. Desactivado, Django lo descarta al arrancar.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'CUTLESS_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.muestreo = getattr(settings, 'CUTLESS_PROFILING_MUESTREO', 0)
+        self.umbral_ms = getattr(settings, 'CUTLESS_PROFILING_UMBRAL_MS', 500)
+        self.directorio = getattr(settings, 'CUTLESS_PROFILING_DIRECTORIO', None)
+
+    def __call__(self, request):
+        perfil = self._iniciar_perfil() if self.muestreo and random.random() < self.muestreo else None
+        with medir_peticion() as medicion:
+            try:
+                response = self.get_response(request)
+            finally:
+                if perfil is not None:
+                    perfil.disable()
+            total_ms = medicion.duracion_ms()
+
+        response['Server-Timing'] = medicion.server_timing(total_ms)
+        logger_perfilado.info(
+            "%s %s %s %.1fms %d SQL %s",
+            request.method, request.path, response.status_code, total_ms, medicion.consultas, medicion.resumen(),
+        )
+        if perfil is not None and total_ms >= self.umbral_ms:
+            self._guardar_perfil(perfil, request, total_ms)
+        return response
+
+    @staticmethod
+    def _iniciar_perfil():
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Otro hilo ya está perfilando (solo un perfilador activo por proceso)
+            return None
+        return perfil
+
+    def _guardar_perfil(self, perfil, request, total_ms):
+        if not self.directorio:
+            return
+        ruta = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'raiz'
+        nombre = f"{time.strftime('%Y%m%d-%H%M%S')}_{request.method}_{ruta[:80]}_{total_ms:.0f}ms.prof"
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            perfil.dump_stats(os.path.join(self.directorio, nombre))
+        except OSError as e:
+            logger_perfilado.warning(f"No se pudo guardar el perfil {nombre}: {e}")
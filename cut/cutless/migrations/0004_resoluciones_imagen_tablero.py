@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cutless', '0003_persistir_resultado_optimizacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='optimizacion',
+            name='imagen_miniatura',
+            field=models.ImageField(blank=True, help_text='Miniatura del primer tablero para listados', null=True, upload_to='optimizaciones/miniaturas/'),
+        ),
+        migrations.AddField(
+            model_name='tablerooptimizacion',
+            name='imagen_impresion',
+            field=models.ImageField(blank=True, help_text='Resolución de impresión para plan de corte y PDF', upload_to='optimizaciones/tableros/impresion/'),
+        ),
+        migrations.AddField(
+            model_name='tablerooptimizacion',
+            name='imagen_miniatura',
+            field=models.ImageField(blank=True, help_text='Resolución pequeña para listados y vistas previas', upload_to='optimizaciones/tableros/miniaturas/'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cutless', '0004_resoluciones_imagen_tablero'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='optimizacion',
+            index=models.Index(fields=['usuario', 'fecha'], name='opt_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='optimizacion',
+            index=models.Index(fields=['usuario', 'aprovechamiento_total'], name='opt_usuario_aprov_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='optimizacion',
+            index=models.Index(condition=models.Q(('favorito', True)), fields=['usuario', 'fecha'], name='opt_usuario_fav_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='optimizacion',
+            index=models.Index(condition=models.Q(('precio_tablero__isnull', False)), fields=['usuario', 'fecha'], name='opt_usuario_costo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presupuesto',
+            index=models.Index(fields=['usuario', 'fecha_creacion'], name='pres_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presupuesto',
+            index=models.Index(fields=['usuario', 'estado', 'fecha_creacion'], name='pres_usuario_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyecto',
+            index=models.Index(fields=['usuario', 'fecha_creacion'], name='proy_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyecto',
+            index=models.Index(fields=['usuario', 'estado', 'fecha_creacion'], name='proy_usuario_estado_idx'),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:59
+
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copia congelada de cutless.pieces (parsear_piezas_desde_texto, normalizar_nombre_pieza)
+# y de la conversión a cm tal como eran en esta migración: no depende del código actual
+CONVERSIONES_CM = {'cm': 1.0, 'm': 100.0, 'mm': 0.1, 'in': 2.54, 'ft': 30.48}
+
+
+def convertir_a_cm(valor, unidad):
+    if unidad == 'pulgadas':
+        unidad = 'in'
+    return round(valor * CONVERSIONES_CM.get(unidad, 1.0), 2)
+
+
+def parsear_piezas_desde_texto(texto_piezas, unidad_medida='cm'):
+    piezas = []
+    for linea in (texto_piezas or '').splitlines():
+        partes = [p.strip() for p in linea.strip().split(',')]
+        if len(partes) == 4:
+            nombre, ancho_s, alto_s, cant_s = partes
+        elif len(partes) == 3:
+            nombre = ''
+            ancho_s, alto_s, cant_s = partes
+        else:
+            continue
+        try:
+            ancho, alto, cantidad = float(ancho_s), float(alto_s), int(cant_s)
+        except (ValueError, TypeError):
+            continue
+        piezas.append({
+            'nombre': (nombre or f'Pieza {len(piezas) + 1}').strip(),
+            'ancho_cm': convertir_a_cm(ancho, unidad_medida),
+            'alto_cm': convertir_a_cm(alto, unidad_medida),
+            'cantidad': cantidad,
+        })
+    return piezas
+
+
+def normalizar_nombre_pieza(nombre):
+    descompuesto = unicodedata.normalize('NFKD', nombre or '')
+    sin_acentos = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_acentos.casefold().split())
+
+
+def poblar_piezas(apps, schema_editor):
+    """Crea las filas PiezaOptimizacion de las optimizaciones existentes."""
+    Optimizacion = apps.get_model('cutless', 'Optimizacion')
+    PiezaOptimizacion = apps.get_model('cutless', 'PiezaOptimizacion')
+    filas = []
+    for opt in Optimizacion.objects.only('pk', 'piezas', 'unidad_medida').iterator(chunk_size=500):
+        for orden, p in enumerate(parsear_piezas_desde_texto(opt.piezas, opt.unidad_medida or 'cm')):
+            filas.append(PiezaOptimizacion(
+                optimizacion_id=opt.pk,
+                orden=orden,
+                nombre=p['nombre'][:200],
+                nombre_normalizado=normalizar_nombre_pieza(p['nombre'])[:200],
+                ancho_cm=p['ancho_cm'],
+                alto_cm=p['alto_cm'],
+                cantidad=p['cantidad'],
+            ))
+        if len(filas) >= 1000:
+            PiezaOptimizacion.objects.bulk_create(filas)
+            filas = []
+    if filas:
+        PiezaOptimizacion.objects.bulk_create(filas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cutless', '0005_indices_consultas_por_usuario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PiezaOptimizacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orden', models.PositiveSmallIntegerField()),
+                ('nombre', models.CharField(max_length=200)),
+                ('nombre_normalizado', models.CharField(help_text='Nombre en minúsculas y sin acentos, para búsquedas', max_length=200)),
+                ('ancho_cm', models.FloatField(help_text='Ancho en cm')),
+                ('alto_cm', models.FloatField(help_text='Alto en cm')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('optimizacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='piezas_detalle', to='cutless.optimizacion')),
+            ],
+            options={
+                'verbose_name': 'Pieza de optimización',
+                'verbose_name_plural': 'Piezas de optimización',
+                'ordering': ['orden'],
+                'indexes': [models.Index(fields=['optimizacion', 'nombre_normalizado'], name='pieza_opt_nombre_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_piezas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:01
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from itertools import groupby
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Copia congelada de EstadisticaDiaria.CAMPOS_ORIGEN / valores_desde_filas tal como
+# eran en esta migración: no depende del modelo actual
+CAMPOS_ORIGEN = (
+    'aprovechamiento_total', 'num_tableros', 'area_usada_total',
+    'desperdicio_total', 'precio_tablero', 'mano_obra',
+)
+
+
+def valores_desde_filas(filas):
+    aprovechamientos = [f['aprovechamiento_total'] or 0 for f in filas]
+    con_costo = [f for f in filas if f['precio_tablero'] is not None]
+    costo_material = sum(
+        (Decimal(f['num_tableros'] or 0) * f['precio_tablero'] for f in con_costo),
+        Decimal('0.00'),
+    )
+    costo_mano_obra = sum((f['mano_obra'] or Decimal('0.00') for f in con_costo), Decimal('0.00'))
+    return {
+        'num_optimizaciones': len(filas),
+        'suma_aprovechamiento': sum(aprovechamientos),
+        'min_aprovechamiento': min(aprovechamientos),
+        'max_aprovechamiento': max(aprovechamientos),
+        'num_tableros': sum(f['num_tableros'] or 0 for f in filas),
+        'area_usada': sum(f['area_usada_total'] or 0 for f in filas),
+        'desperdicio': sum(f['desperdicio_total'] or 0 for f in filas),
+        'num_con_costo': len(con_costo),
+        'num_tableros_con_costo': sum(f['num_tableros'] or 0 for f in con_costo),
+        'suma_aprovechamiento_con_costo': sum(f['aprovechamiento_total'] or 0 for f in con_costo),
+        'costo_material': costo_material,
+        'costo_mano_obra': costo_mano_obra,
+        'costo_total': costo_material + costo_mano_obra,
+    }
+
+
+def poblar_estadisticas(apps, schema_editor):
+    """Resume por usuario y día las optimizaciones existentes."""
+    Optimizacion = apps.get_model('cutless', 'Optimizacion')
+    EstadisticaDiaria = apps.get_model('cutless', 'EstadisticaDiaria')
+    filas = (
+        Optimizacion.objects
+        .order_by('usuario_id', 'fecha')
+        .values('usuario_id', 'fecha', *CAMPOS_ORIGEN)
+        .iterator(chunk_size=1000)
+    )
+    nuevas = []
+    for (usuario_id, dia), grupo in groupby(filas, key=lambda f: (f['usuario_id'], timezone.localdate(f['fecha']))):
+        nuevas.append(EstadisticaDiaria(
+            usuario_id=usuario_id,
+            fecha=dia,
+            **valores_desde_filas(list(grupo)),
+        ))
+    EstadisticaDiaria.objects.bulk_create(nuevas, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cutless', '0006_piezas_optimizacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(help_text='Día (zona horaria local) de las optimizaciones')),
+                ('num_optimizaciones', models.PositiveIntegerField(default=0)),
+                ('suma_aprovechamiento', models.FloatField(default=0)),
+                ('min_aprovechamiento', models.FloatField(default=0)),
+                ('max_aprovechamiento', models.FloatField(default=0)),
+                ('num_tableros', models.PositiveIntegerField(default=0)),
+                ('area_usada', models.FloatField(default=0, help_text='Área usada en cm²')),
+                ('desperdicio', models.FloatField(default=0, help_text='Desperdicio en cm²')),
+                ('num_con_costo', models.PositiveIntegerField(default=0)),
+                ('num_tableros_con_costo', models.PositiveIntegerField(default=0)),
+                ('suma_aprovechamiento_con_costo', models.FloatField(default=0)),
+                ('costo_material', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('costo_mano_obra', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('costo_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estadisticas_diarias', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Estadística diaria',
+                'verbose_name_plural': 'Estadísticas diarias',
+                'ordering': ['usuario', 'fecha'],
+                'unique_together': {('usuario', 'fecha')},
+            },
+        ),
+        migrations.RunPython(poblar_estadisticas, migrations.RunPython.noop),
+    ]
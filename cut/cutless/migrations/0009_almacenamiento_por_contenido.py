@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:42
+
+import cutless.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cutless', '0008_notificaciones_email'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='optimizacion',
+            name='imagen',
+            field=models.ImageField(blank=True, null=True, storage=cutless.storage.almacenamiento_por_contenido, upload_to='optimizaciones/'),
+        ),
+        migrations.AlterField(
+            model_name='optimizacion',
+            name='imagen_miniatura',
+            field=models.ImageField(blank=True, help_text='Miniatura del primer tablero para listados', null=True, storage=cutless.storage.almacenamiento_por_contenido, upload_to='optimizaciones/miniaturas/'),
+        ),
+        migrations.AlterField(
+            model_name='optimizacion',
+            name='pdf',
+            field=models.FileField(blank=True, null=True, storage=cutless.storage.almacenamiento_por_contenido, upload_to='pdfs/'),
+        ),
+        migrations.AlterField(
+            model_name='tablerooptimizacion',
+            name='imagen',
+            field=models.ImageField(storage=cutless.storage.almacenamiento_por_contenido, upload_to='optimizaciones/tableros/'),
+        ),
+        migrations.AlterField(
+            model_name='tablerooptimizacion',
+            name='imagen_impresion',
+            field=models.ImageField(blank=True, help_text='Resolución de impresión para plan de corte y PDF', storage=cutless.storage.almacenamiento_por_contenido, upload_to='optimizaciones/tableros/impresion/'),
+        ),
+        migrations.AlterField(
+            model_name='tablerooptimizacion',
+            name='imagen_miniatura',
+            field=models.ImageField(blank=True, help_text='Resolución pequeña para listados y vistas previas', storage=cutless.storage.almacenamiento_por_contenido, upload_to='optimizaciones/tableros/miniaturas/'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cutless', '0009_almacenamiento_por_contenido'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='optimizacion',
+            name='eliminada_en',
+            field=models.DateTimeField(blank=True, help_text='Marcada para borrar: oculta hasta que se purgue en segundo plano', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='optimizacion',
+            index=models.Index(condition=models.Q(('eliminada_en__isnull', False)), fields=['eliminada_en'], name='opt_eliminada_idx'),
+        ),
+    ]
@@ -1,6 +1,16 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Max, Min, Sum
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.utils import timezone
 from decimal import Decimal
+from itertools import groupby
+
+from .fechas import limites_dia
+from .pieces import normalizar_nombre_pieza, parsear_piezas_desde_texto
+from .storage import almacenamiento_por_contenido
+from .units import convertir_desde_cm
 
 class Material(models.Model):
     """
@@ -57,6 +67,36 @@ class Material(models.Model):
         """Retorna el área del tablero en cm²"""
         return self.ancho * self.alto
 
+class OptimizacionQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Borra las optimizaciones y ajusta una sola vez cada (usuario, día) afectado. Sin
+        receptores de borrado en Optimizacion, Django conserva el borrado rápido: un DELETE
+        por tabla relacionada en lugar de una señal (y sus consultas) por fila.
+        """
+        filas = list(self.values_list('pk', 'usuario_id', 'fecha', 'eliminada_en'))
+        with transaction.atomic():
+            borradas = super().delete()
+            _ajustar_tras_borrar(filas)
+        return borradas
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class OptimizacionManager(models.Manager.from_queryset(OptimizacionQuerySet)):
+    """
+    Excluye las optimizaciones marcadas para borrar hasta que ``purgar_optimizaciones``
+    las elimina: ``Optimizacion.objects`` y los managers de relación que parten de otro
+    modelo (``presupuesto.optimizaciones``, ``proyecto.optimizacion_set``) no las ven.
+    El acceso directo por FK (``tablero.optimizacion``) usa el manager base de Django y
+    sí llega a ellas; las vistas siempre entran por una consulta filtrada por usuario.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(eliminada_en__isnull=True)
+
+
 class Optimizacion(models.Model):
     UNIDADES_CHOICES = [
         ('cm', 'Centímetros (cm)'),
@@ -72,8 +112,16 @@ class Optimizacion(models.Model):
     unidad_medida = models.CharField(max_length=2, choices=UNIDADES_CHOICES, default='cm', 
                                      help_text="Unidad de medida usada por el usuario")
     piezas = models.TextField(help_text="Listado de piezas en formato ancho,alto,cantidad")
-    imagen = models.ImageField(upload_to='optimizaciones/', null=True, blank=True)
-    pdf = models.FileField(upload_to='pdfs/', null=True, blank=True)
+    # Resultados: archivos nombrados por contenido (deduplicados, ver cutless/storage.py)
+    imagen = models.ImageField(upload_to='optimizaciones/', storage=almacenamiento_por_contenido, null=True, blank=True)
+    imagen_miniatura = models.ImageField(
+        upload_to='optimizaciones/miniaturas/',
+        storage=almacenamiento_por_contenido,
+        null=True,
+        blank=True,
+        help_text="Miniatura del primer tablero para listados",
+    )
+    pdf = models.FileField(upload_to='pdfs/', storage=almacenamiento_por_contenido, null=True, blank=True)
     aprovechamiento_total = models.FloatField(default=0)
     # Campo legado para evitar errores de integridad en la BD
     favorito = models.BooleanField(default=False)
@@ -133,6 +181,41 @@ class Optimizacion(models.Model):
 
     def __str__(self):
         return f"Optimización de {self.usuario.username} ({self.fecha.strftime('%d/%m/%Y %H:%M')})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Texto y unidad ya reflejados en PiezaOptimizacion (None si alguno está diferido)
+        diferido = not {'piezas', 'unidad_medida'} <= instance.__dict__.keys()
+        instance._piezas_sincronizadas = None if diferido else instance._origen_piezas()
+        return instance
+
+    def _origen_piezas(self):
+        """Lo que determina las filas PiezaOptimizacion: desde_texto pasa las medidas a cm con la unidad."""
+        return self.piezas, self.unidad_medida
+
+    def delete(self, *args, **kwargs):
+        fila = (self.pk, self.usuario_id, self.fecha, self.eliminada_en)
+        with transaction.atomic():
+            borradas = super().delete(*args, **kwargs)
+            _ajustar_tras_borrar([fila])
+        return borradas
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'piezas', 'unidad_medida'} & set(update_fields):
+            return
+        if self._origen_piezas() != getattr(self, '_piezas_sincronizadas', None):
+            self.sincronizar_piezas()
+
+    def sincronizar_piezas(self):
+        """Reconstruye las filas PiezaOptimizacion a partir del texto ``piezas``."""
+        self.piezas_detalle.all().delete()
+        PiezaOptimizacion.objects.bulk_create(
+            PiezaOptimizacion.desde_texto(self, self.piezas, self.unidad_medida)
+        )
+        self._piezas_sincronizadas = self._origen_piezas()
     
     def calcular_costo_total(self):
         """
@@ -168,6 +251,39 @@ class Optimizacion(models.Model):
         blank=True,
         help_text="Proyecto al que pertenece esta optimización (opcional)"
     )
+    eliminada_en = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Marcada para borrar: oculta hasta que se purgue en segundo plano",
+    )
+
+    objects = OptimizacionManager()
+    # Incluye las marcadas para borrar (purga y mantenimiento)
+    todas = models.Manager.from_queryset(OptimizacionQuerySet)()
+
+    class Meta:
+        indexes = [
+            # Historial, estadísticas y numeración: siempre por usuario
+            models.Index(fields=['usuario', 'fecha'], name='opt_usuario_fecha_idx'),
+            models.Index(fields=['usuario', 'aprovechamiento_total'], name='opt_usuario_aprov_idx'),
+            # Filtro "solo favoritos" y filas con costo: índices parciales (más pequeños)
+            models.Index(
+                fields=['usuario', 'fecha'],
+                name='opt_usuario_fav_fecha_idx',
+                condition=models.Q(favorito=True),
+            ),
+            models.Index(
+                fields=['usuario', 'fecha'],
+                name='opt_usuario_costo_fecha_idx',
+                condition=models.Q(precio_tablero__isnull=False),
+            ),
+            # Cola de purga: solo las marcadas para borrar
+            models.Index(
+                fields=['eliminada_en'],
+                name='opt_eliminada_idx',
+                condition=models.Q(eliminada_en__isnull=False),
+            ),
+        ]
 
 
 class TableroOptimizacion(models.Model):
@@ -178,7 +294,19 @@ class TableroOptimizacion(models.Model):
         related_name='tableros',
     )
     numero = models.PositiveSmallIntegerField()
-    imagen = models.ImageField(upload_to='optimizaciones/tableros/')
+    imagen = models.ImageField(upload_to='optimizaciones/tableros/', storage=almacenamiento_por_contenido)
+    imagen_miniatura = models.ImageField(
+        upload_to='optimizaciones/tableros/miniaturas/',
+        storage=almacenamiento_por_contenido,
+        blank=True,
+        help_text="Resolución pequeña para listados y vistas previas",
+    )
+    imagen_impresion = models.ImageField(
+        upload_to='optimizaciones/tableros/impresion/',
+        storage=almacenamiento_por_contenido,
+        blank=True,
+        help_text="Resolución de impresión para plan de corte y PDF",
+    )
     area_usada = models.FloatField(help_text="Área usada en cm²")
     desperdicio = models.FloatField(help_text="Desperdicio en cm²")
     porcentaje_uso = models.FloatField(help_text="Porcentaje de aprovechamiento del tablero")
@@ -194,6 +322,273 @@ class TableroOptimizacion(models.Model):
         return f"Tablero {self.numero} — Optimización #{self.optimizacion_id}"
 
 
+class PiezaOptimizacion(models.Model):
+    """Pieza de una optimización, normalizada desde el texto ``Optimizacion.piezas``."""
+    optimizacion = models.ForeignKey(
+        Optimizacion,
+        on_delete=models.CASCADE,
+        related_name='piezas_detalle',
+    )
+    orden = models.PositiveSmallIntegerField()
+    nombre = models.CharField(max_length=200)
+    nombre_normalizado = models.CharField(
+        max_length=200,
+        help_text="Nombre en minúsculas y sin acentos, para búsquedas",
+    )
+    ancho_cm = models.FloatField(help_text="Ancho en cm")
+    alto_cm = models.FloatField(help_text="Alto en cm")
+    cantidad = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = "Pieza de optimización"
+        verbose_name_plural = "Piezas de optimización"
+        ordering = ['orden']
+        indexes = [
+            # Búsqueda por nombre en el historial: se recorren solo las piezas de las
+            # optimizaciones del usuario (índice cubriente, sin leer la tabla)
+            models.Index(fields=['optimizacion', 'nombre_normalizado'], name='pieza_opt_nombre_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} (x{self.cantidad}) — Optimización #{self.optimizacion_id}"
+
+    @classmethod
+    def desde_texto(cls, optimizacion, texto_piezas, unidad_medida='cm'):
+        """Filas sin guardar para las piezas del texto (nombre,ancho,alto,cantidad)."""
+        return [
+            cls(
+                optimizacion=optimizacion,
+                orden=orden,
+                nombre=p['nombre'][:200],
+                nombre_normalizado=normalizar_nombre_pieza(p['nombre'])[:200],
+                ancho_cm=p['ancho_cm'],
+                alto_cm=p['alto_cm'],
+                cantidad=p['cantidad'],
+            )
+            for orden, p in enumerate(parsear_piezas_desde_texto(texto_piezas, unidad_medida or 'cm'))
+        ]
+
+    @classmethod
+    def existe_con_nombre(cls, texto):
+        """
+        Condición (Exists) para filtrar optimizaciones con alguna pieza cuyo nombre
+        contiene ``texto`` (sin distinguir mayúsculas ni acentos). Correlacionada con la
+        optimización: sobre un queryset de un usuario solo mira las piezas de ese usuario.
+        """
+        return models.Exists(cls.objects.filter(
+            optimizacion=models.OuterRef('pk'),
+            nombre_normalizado__contains=normalizar_nombre_pieza(texto),
+        ))
+
+    def _en_unidad(self, valor_cm):
+        unidad = getattr(self.optimizacion, 'unidad_medida', 'cm') or 'cm'
+        valor = round(convertir_desde_cm(valor_cm, unidad), 2)
+        return int(valor) if float(valor).is_integer() else valor
+
+    @property
+    def ancho(self):
+        """Ancho en la unidad de la optimización."""
+        return self._en_unidad(self.ancho_cm)
+
+    @property
+    def alto(self):
+        """Alto en la unidad de la optimización."""
+        return self._en_unidad(self.alto_cm)
+
+
+class EstadisticaDiaria(models.Model):
+    """
+    Resumen diario de las optimizaciones de un usuario (conteos, sumas y extremos).
+    Se recalcula por día al guardar o borrar una optimización; las páginas de
+    estadísticas y costos suman estas filas en lugar de recorrer todo el historial.
+    """
+    # Campos de Optimizacion que afectan al resumen
+    CAMPOS_ORIGEN = (
+        'aprovechamiento_total', 'num_tableros', 'area_usada_total',
+        'desperdicio_total', 'precio_tablero', 'mano_obra',
+    )
+
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='estadisticas_diarias')
+    fecha = models.DateField(help_text="Día (zona horaria local) de las optimizaciones")
+    num_optimizaciones = models.PositiveIntegerField(default=0)
+    suma_aprovechamiento = models.FloatField(default=0)
+    min_aprovechamiento = models.FloatField(default=0)
+    max_aprovechamiento = models.FloatField(default=0)
+    num_tableros = models.PositiveIntegerField(default=0)
+    area_usada = models.FloatField(default=0, help_text="Área usada en cm²")
+    desperdicio = models.FloatField(default=0, help_text="Desperdicio en cm²")
+    # Solo optimizaciones con precio de tablero
+    num_con_costo = models.PositiveIntegerField(default=0)
+    num_tableros_con_costo = models.PositiveIntegerField(default=0)
+    suma_aprovechamiento_con_costo = models.FloatField(default=0)
+    costo_material = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    costo_mano_obra = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    costo_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        verbose_name = "Estadística diaria"
+        verbose_name_plural = "Estadísticas diarias"
+        ordering = ['usuario', 'fecha']
+        unique_together = [['usuario', 'fecha']]
+
+    def __str__(self):
+        return f"{self.usuario} — {self.fecha:%d/%m/%Y} ({self.num_optimizaciones})"
+
+    @classmethod
+    def valores_desde_filas(cls, filas):
+        """Campos del resumen para las filas (dicts con CAMPOS_ORIGEN) de un mismo día."""
+        aprovechamientos = [f['aprovechamiento_total'] or 0 for f in filas]
+        con_costo = [f for f in filas if f['precio_tablero'] is not None]
+        costo_material = sum(
+            (Decimal(f['num_tableros'] or 0) * f['precio_tablero'] for f in con_costo),
+            Decimal('0.00'),
+        )
+        costo_mano_obra = sum((f['mano_obra'] or Decimal('0.00') for f in con_costo), Decimal('0.00'))
+        return {
+            'num_optimizaciones': len(filas),
+            'suma_aprovechamiento': sum(aprovechamientos),
+            'min_aprovechamiento': min(aprovechamientos),
+            'max_aprovechamiento': max(aprovechamientos),
+            'num_tableros': sum(f['num_tableros'] or 0 for f in filas),
+            'area_usada': sum(f['area_usada_total'] or 0 for f in filas),
+            'desperdicio': sum(f['desperdicio_total'] or 0 for f in filas),
+            'num_con_costo': len(con_costo),
+            'num_tableros_con_costo': sum(f['num_tableros'] or 0 for f in con_costo),
+            'suma_aprovechamiento_con_costo': sum(f['aprovechamiento_total'] or 0 for f in con_costo),
+            'costo_material': costo_material,
+            'costo_mano_obra': costo_mano_obra,
+            'costo_total': costo_material + costo_mano_obra,
+        }
+
+    @classmethod
+    def recalcular(cls, usuario_id, dia):
+        """Recalcula (o elimina si ya no hay optimizaciones) el resumen de un día."""
+        inicio, fin = limites_dia(dia)
+        with transaction.atomic():
+            filas = list(
+                Optimizacion.objects
+                .filter(usuario_id=usuario_id, fecha__gte=inicio, fecha__lt=fin)
+                .values(*cls.CAMPOS_ORIGEN)
+            )
+            if not filas:
+                cls.objects.filter(usuario_id=usuario_id, fecha=dia).delete()
+                return None
+            estadistica, _ = cls.objects.update_or_create(
+                usuario_id=usuario_id,
+                fecha=dia,
+                defaults=cls.valores_desde_filas(filas),
+            )
+        return estadistica
+
+    @classmethod
+    def reconstruir(cls, usuarios=None):
+        """
+        Borra y vuelve a generar los resúmenes (de todos los usuarios o de ``usuarios``)
+        a partir de las optimizaciones. Devuelve el número de días resumidos.
+        """
+        optimizaciones = Optimizacion.objects.all()
+        resumenes = cls.objects.all()
+        if usuarios is not None:
+            optimizaciones = optimizaciones.filter(usuario__in=usuarios)
+            resumenes = resumenes.filter(usuario__in=usuarios)
+        filas = (
+            optimizaciones
+            .order_by('usuario_id', 'fecha')
+            .values('usuario_id', 'fecha', *cls.CAMPOS_ORIGEN)
+            .iterator(chunk_size=1000)
+        )
+        nuevas = [
+            cls(usuario_id=usuario_id, fecha=dia, **cls.valores_desde_filas(list(grupo)))
+            for (usuario_id, dia), grupo in groupby(
+                filas, key=lambda f: (f['usuario_id'], timezone.localdate(f['fecha']))
+            )
+        ]
+        with transaction.atomic():
+            resumenes.delete()
+            cls.objects.bulk_create(nuevas, batch_size=500)
+        return len(nuevas)
+
+    @classmethod
+    def resumen(cls, usuario, desde=None, hasta=None):
+        """
+        Totales del usuario entre dos días (incluidos). Suma filas diarias, por lo que
+        el costo no depende del tamaño del historial.
+        """
+        filas = cls.objects.filter(usuario=usuario)
+        if desde:
+            filas = filas.filter(fecha__gte=desde)
+        if hasta:
+            filas = filas.filter(fecha__lte=hasta)
+        totales = filas.aggregate(
+            num_optimizaciones=Sum('num_optimizaciones'),
+            suma_aprovechamiento=Sum('suma_aprovechamiento'),
+            min_aprovechamiento=Min('min_aprovechamiento'),
+            max_aprovechamiento=Max('max_aprovechamiento'),
+            num_tableros=Sum('num_tableros'),
+            area_usada=Sum('area_usada'),
+            desperdicio=Sum('desperdicio'),
+            num_con_costo=Sum('num_con_costo'),
+            num_tableros_con_costo=Sum('num_tableros_con_costo'),
+            suma_aprovechamiento_con_costo=Sum('suma_aprovechamiento_con_costo'),
+            costo_material=Sum('costo_material'),
+            costo_mano_obra=Sum('costo_mano_obra'),
+            costo_total=Sum('costo_total'),
+        )
+        for campo in ('costo_material', 'costo_mano_obra', 'costo_total'):
+            totales[campo] = totales[campo] or Decimal('0.00')
+        for campo, valor in totales.items():
+            if valor is None:
+                totales[campo] = 0
+        n = totales['num_optimizaciones']
+        n_costo = totales['num_con_costo']
+        totales['promedio_aprovechamiento'] = totales['suma_aprovechamiento'] / n if n else 0
+        totales['promedio_aprovechamiento_con_costo'] = (
+            totales['suma_aprovechamiento_con_costo'] / n_costo if n_costo else 0
+        )
+        return totales
+
+
+@receiver(post_save, sender=Optimizacion)
+def actualizar_estadistica_diaria(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mantiene EstadisticaDiaria al crear o editar una optimización."""
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(EstadisticaDiaria.CAMPOS_ORIGEN):
+        return
+    EstadisticaDiaria.recalcular(instance.usuario_id, timezone.localdate(instance.fecha))
+    _invalidar_graficos(instance.usuario_id)
+
+
+def _ajustar_tras_borrar(filas):
+    """
+    Mantiene EstadisticaDiaria tras borrar optimizaciones, dadas como tuplas (pk,
+    usuario_id, fecha, eliminada_en): un recálculo por día afectado, una invalidación de
+    gráficos por usuario y un recorrido de la caché de artefactos. Las ya marcadas (purga)
+    no se recalculan: sus estadísticas se ajustaron al marcarlas.
+    """
+    dias = {
+        (usuario_id, timezone.localdate(fecha))
+        for _, usuario_id, fecha, eliminada_en in filas
+        if eliminada_en is None
+    }
+    for usuario_id, dia in dias:
+        EstadisticaDiaria.recalcular(usuario_id, dia)
+    for usuario_id in {usuario_id for usuario_id, _ in dias}:
+        _invalidar_graficos(usuario_id)
+    if filas:
+        _borrar_artefactos([pk for pk, *_ in filas])
+
+
+def _invalidar_graficos(usuario_id):
+    from .services.charts import invalidar_graficos_usuario
+    invalidar_graficos_usuario(usuario_id)
+
+
+def _borrar_artefactos(optimizacion_ids):
+    from .services.artifacts import borrar_artefactos
+    borrar_artefactos(optimizacion_ids)
+
+
 class Cliente(models.Model):
     """
     Modelo para gestionar clientes del usuario.
@@ -266,6 +661,10 @@ class Proyecto(models.Model):
         verbose_name = "Proyecto"
         verbose_name_plural = "Proyectos"
         ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['usuario', 'fecha_creacion'], name='proy_usuario_fecha_idx'),
+            models.Index(fields=['usuario', 'estado', 'fecha_creacion'], name='proy_usuario_estado_idx'),
+        ]
     
     def __str__(self):
         return self.nombre
@@ -358,6 +757,10 @@ class Presupuesto(models.Model):
         verbose_name_plural = "Presupuestos"
         ordering = ['-fecha_creacion']
         unique_together = [['usuario', 'numero']]
+        indexes = [
+            models.Index(fields=['usuario', 'fecha_creacion'], name='pres_usuario_fecha_idx'),
+            models.Index(fields=['usuario', 'estado', 'fecha_creacion'], name='pres_usuario_estado_idx'),
+        ]
     
     def __str__(self):
         return f"Presupuesto {self.numero} - {self.cliente.nombre if self.cliente else 'Sin cliente'}"
@@ -489,3 +892,45 @@ class Plantilla(models.Model):
             }
             for p in parsear_piezas_desde_texto(self.piezas)
         ]
+
+
+class NotificacionEmail(models.Model):
+    """
+    Email de notificación en cola (outbox). La petición solo inserta la fila; el comando
+    ``enviar_notificaciones`` los envía por lotes, con reintentos y espera creciente.
+    """
+    ESTADOS_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('enviada', 'Enviada'),
+        ('fallida', 'Fallida'),
+    ]
+
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='notificaciones_email',
+    )
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=255)
+    mensaje = models.TextField(help_text="Cuerpo en texto plano")
+    mensaje_html = models.TextField(blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADOS_CHOICES, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now, help_text="No se envía antes de esta fecha")
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Notificación por email"
+        verbose_name_plural = "Notificaciones por email"
+        ordering = ['fecha_creacion']
+        indexes = [
+            # Cola: pendientes cuyo próximo intento ya llegó
+            models.Index(fields=['estado', 'proximo_intento'], name='notif_estado_intento_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} → {self.destinatario} ({self.get_estado_display()})"
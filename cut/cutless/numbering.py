@@ -0,0 +1,57 @@
+"""Número de visualización de las optimizaciones en el historial, calculado en la base de datos."""
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Optimizacion
+
+# Campo que ordena el historial para cada criterio. El número mostrado es la posición
+# ascendente según ese campo (desempate por id) en ambos sentidos del orden, por lo
+# que un mismo registro conserva su número al invertir el listado.
+CAMPO_NUMERO_LISTA = {
+    'fecha_desc': 'fecha',
+    'fecha_asc': 'fecha',
+    'aprovechamiento_desc': 'aprovechamiento_total',
+    'aprovechamiento_asc': 'aprovechamiento_total',
+}
+
+
+def expresion_numero_lista(ordenar_por='fecha_desc'):
+    """
+    Expresión equivalente a ROW_NUMBER() OVER (PARTITION BY usuario ORDER BY campo, id).
+
+    Se calcula como subconsulta correlacionada (cuántas optimizaciones del mismo usuario
+    van antes o en la misma posición) para que el número no dependa de los filtros ni de
+    la paginación aplicados al queryset anotado.
+    """
+    campo = CAMPO_NUMERO_LISTA.get(ordenar_por, 'fecha')
+    anteriores = (
+        Optimizacion.objects
+        .filter(usuario=OuterRef('usuario'))
+        .filter(
+            Q(**{f'{campo}__lt': OuterRef(campo)})
+            | Q(**{campo: OuterRef(campo), 'pk__lte': OuterRef('pk')})
+        )
+        .order_by()
+        .values('usuario')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(anteriores, output_field=IntegerField()), 0)
+
+
+def anotar_numero_lista(queryset, ordenar_por='fecha_desc'):
+    """Anota ``numero_lista`` (número en el historial del usuario) en un queryset de Optimizacion."""
+    return queryset.annotate(numero_lista=expresion_numero_lista(ordenar_por))
+
+
+def calcular_numero_lista(usuario, optimizacion_id, ordenar_por='fecha_desc'):
+    """Calcula el número de visualización en el historial."""
+    numero = (
+        anotar_numero_lista(
+            Optimizacion.objects.filter(usuario=usuario, pk=optimizacion_id),
+            ordenar_por,
+        )
+        .values_list('numero_lista', flat=True)
+        .first()
+    )
+    return numero if numero is not None else optimizacion_id
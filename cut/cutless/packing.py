@@ -4,7 +4,11 @@ Motor de empaquetado 2D — FFD + BSSF con kerf y rotación opcional.
 Sin dependencias de Django, matplotlib ni exports. Todas las medidas en cm.
 """
 
+from .profiling import medir_etapa
+
 EPS = 1e-9
+# Súbela cuando un cambio del motor altere las disposiciones: invalida las cachés por contenido
+VERSION_MOTOR = 1
 
 
 def pieza_cabe_en_tablero(pieza_ancho_cm, pieza_alto_cm, tablero_ancho_cm, tablero_alto_cm, permitir_rotacion=True):
@@ -120,6 +124,7 @@ def _normalizar_rects_libres(rects, eps=1e-5):
     return r
 
 
+@medir_etapa('optimizar_corte')
 def optimizar_corte(
     piezas,
     ancho_tablero,
@@ -1,8 +1,11 @@
 """Parseo de piezas y mensajes al usuario."""
+import unicodedata
 from collections import Counter
 
 from .units import convertir_a_cm, convertir_desde_cm, obtener_simbolo_unidad
+from .profiling import medir_etapa
 
+@medir_etapa('parsear_piezas')
 def parsear_piezas_desde_texto(texto_piezas, unidad_medida='cm'):
     """
     Parsea líneas de piezas guardadas en Optimizacion o Plantilla.
@@ -48,6 +51,12 @@ def parsear_piezas_desde_texto(texto_piezas, unidad_medida='cm'):
 
     return piezas
 
+def normalizar_nombre_pieza(nombre):
+    """Nombre de pieza en minúsculas, sin acentos y con espacios simples (para búsquedas)."""
+    descompuesto = unicodedata.normalize('NFKD', nombre or '')
+    sin_acentos = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_acentos.casefold().split())
+
 def mensaje_advertencia_piezas_no_colocadas(info_desperdicio, unidad='cm'):
     """
     Mensaje para el usuario cuando hubo piezas omitidas por no caber en el tablero.
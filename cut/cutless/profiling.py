@@ -0,0 +1,112 @@
+"""
+Medición de tiempos por etapa dentro de una petición.
+
+``medir_etapa('nombre')`` (decorador o context manager) acumula la duración, las llamadas
+y las consultas SQL de cada etapa en la medición activa. Solo hay medición activa dentro
+de ``ProfilingMiddleware`` (ver ``cutless.middleware``); fuera de ella no registra nada y
+su coste es una lectura de ContextVar. Sin dependencias de Django al importar (el motor
+de empaquetado también lo usa).
+"""
+import functools
+import re
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+_medicion_activa = ContextVar('cutless_medicion', default=None)
+
+
+class Medicion:
+    """Etapas y consultas SQL registradas durante una petición."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        # nombre -> [segundos, llamadas, consultas], en orden de primera aparición
+        self.etapas = {}
+
+    def registrar(self, nombre, segundos, consultas):
+        etapa = self.etapas.setdefault(nombre, [0.0, 0, 0])
+        etapa[0] += segundos
+        etapa[1] += 1
+        etapa[2] += consultas
+
+    def duracion_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def contar_consulta(self, execute, sql, params, many, context):
+        self.consultas += 1
+        return execute(sql, params, many, context)
+
+    def server_timing(self, total_ms):
+        """Valor de la cabecera ``Server-Timing`` (las etapas anidadas se solapan)."""
+        partes = [f'total;desc="{self.consultas} SQL";dur={total_ms:.1f}']
+        for nombre, (segundos, llamadas, consultas) in self.etapas.items():
+            descripcion = f"{llamadas}x, {consultas} SQL" if llamadas > 1 else f"{consultas} SQL"
+            partes.append(f'{_token(nombre)};desc="{descripcion}";dur={segundos * 1000:.1f}')
+        return ', '.join(partes)
+
+    def resumen(self):
+        """Etapas para la línea de log: ``optimizar_corte=12.3ms/0sql ...``."""
+        return ' '.join(
+            f"{nombre}={segundos * 1000:.1f}ms/{consultas}sql" + (f"x{llamadas}" if llamadas > 1 else '')
+            for nombre, (segundos, llamadas, consultas) in self.etapas.items()
+        )
+
+
+def _token(nombre):
+    # Los nombres de métrica de Server-Timing son tokens HTTP (sin espacios ni separadores)
+    return re.sub(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]", '_', nombre)
+
+
+@contextmanager
+def medir_peticion():
+    """Activa una medición (y el conteo de SQL en todas las conexiones) dentro del bloque."""
+    from django.db import connections
+
+    medicion = Medicion()
+    token = _medicion_activa.set(medicion)
+    try:
+        with ExitStack() as pila:
+            for alias in connections:
+                pila.enter_context(connections[alias].execute_wrapper(medicion.contar_consulta))
+            yield medicion
+    finally:
+        _medicion_activa.reset(token)
+
+
+class medir_etapa:
+    """Registra una etapa en la medición activa; sirve como decorador o en un ``with``."""
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self._pila = []
+
+    def __enter__(self):
+        medicion = _medicion_activa.get()
+        if medicion is not None:
+            self._pila.append((medicion, time.perf_counter(), medicion.consultas))
+        else:
+            self._pila.append(None)
+        return self
+
+    def __exit__(self, *exc):
+        entrada = self._pila.pop()
+        if entrada is not None:
+            medicion, inicio, consultas = entrada
+            medicion.registrar(self.nombre, time.perf_counter() - inicio, medicion.consultas - consultas)
+        return False
+
+    def __call__(self, funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            medicion = _medicion_activa.get()
+            if medicion is None:
+                return funcion(*args, **kwargs)
+            inicio = time.perf_counter()
+            consultas = medicion.consultas
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                medicion.registrar(self.nombre, time.perf_counter() - inicio, medicion.consultas - consultas)
+        return envoltura
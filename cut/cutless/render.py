@@ -1,18 +1,25 @@
-"""Renderizado de tableros y graficos estadisticos (matplotlib)."""
-import base64
+"""Renderizado de tableros (matplotlib)."""
 import io
 
 import matplotlib
 matplotlib.use('Agg')
-import matplotlib.dates as mdates
 import matplotlib.patches as patches
 from matplotlib.gridspec import GridSpec
 import matplotlib.pyplot as plt
 
 from .packing import optimizar_corte, normalizar_info_desperdicio
 from .pieces import parsear_piezas_desde_texto
+from .profiling import medir_etapa
 from .units import convertir_desde_cm, obtener_simbolo_area, obtener_simbolo_unidad
 
+# Pirámide de resoluciones por tablero (dpi al rasterizar la misma figura):
+# miniatura para listados, media para la vista de resultado, impresión para plan de corte y PDF.
+RESOLUCIONES_TABLERO = {
+    'miniatura': 40,
+    'media': 120,
+    'impresion': 200,
+}
+
 def _unpack_posicion_grafico(pos_data, idx_fallback):
     """Normaliza cualquier formato de tupla ``posiciones``."""
     nombre_pieza = f'Pieza {idx_fallback + 1}'
@@ -57,13 +64,17 @@ def _paleta_tipos_visual(n):
     return out
 
 def _dibujar_leyenda_tipos_piezas(ax_leg, catalogo_ord, numero_por_tipo, color_por_tipo, unidad, cantidad_por_tipo):
+    """
+    Dibuja la leyenda de los tipos con cantidad > 0 y devuelve {tipo: Text} con la línea
+    de cantidad, lo único que cambia entre tableros que comparten los mismos tipos.
+    """
     ax_leg.axis('off')
     entries = [k for k in catalogo_ord if cantidad_por_tipo.get(k, 0) > 0]
     n = len(entries)
     if n == 0:
         ax_leg.set_xlim(0, 1)
         ax_leg.set_ylim(0, 1)
-        return
+        return {}
 
     simbolo = obtener_simbolo_unidad(unidad)
     fs = 8
@@ -79,6 +90,7 @@ def _dibujar_leyenda_tipos_piezas(ax_leg, catalogo_ord, numero_por_tipo, color_p
         fontsize=11, fontweight='bold', va='top', color='#111',
     )
 
+    textos_cantidad = {}
     for i, key in enumerate(entries):
         nombre_t, wc, hc = key
         num_t = numero_por_tipo[key]
@@ -97,10 +109,11 @@ def _dibujar_leyenda_tipos_piezas(ax_leg, catalogo_ord, numero_por_tipo, color_p
             f'Cantidad de piezas: {cantidad}',
         ]
         for j, linea in enumerate(lineas):
-            ax_leg.text(
+            texto = ax_leg.text(
                 4, y - j * lh, linea,
                 fontsize=fs, va='top', ha='left', color='#111',
             )
+        textos_cantidad[key] = texto
 
         color_y = y - len(lineas) * lh
         ax_leg.text(4, color_y, 'Color:', fontsize=fs, va='top', ha='left', color='#111')
@@ -119,6 +132,92 @@ def _dibujar_leyenda_tipos_piezas(ax_leg, catalogo_ord, numero_por_tipo, color_p
             sep_y = row_top - rh + 4
             ax_leg.plot([4, 96], [sep_y, sep_y], color='#ddd', linewidth=0.8)
 
+    return textos_cantidad
+
+class _PlantillaFiguraTablero:
+    """
+    Figura reutilizada por todos los tableros de un trabajo.
+
+    Ejes, rejilla, etiquetas y borde del tablero se dibujan una sola vez; las leyendas se
+    cachean por conjunto de tipos presentes (solo se actualizan las cantidades). Por tablero
+    se añaden las piezas y los textos variables, que se retiran después de rasterizar.
+    """
+
+    def __init__(self, ancho_tablero, alto_tablero, unidad, modo_plan_corte,
+                 catalogo_ord, numero_por_tipo, color_por_tipo):
+        self.unidad = unidad
+        self.catalogo_ord = catalogo_ord
+        self.numero_por_tipo = numero_por_tipo
+        self.color_por_tipo = color_por_tipo
+        self._leyendas = {}
+        self._variables = []
+
+        self.fig = plt.figure(figsize=(12.5, 9.8))
+        self._gs = GridSpec(1, 2, figure=self.fig, width_ratios=[1, 0.44], wspace=0.10)
+        self.ax = self.fig.add_subplot(self._gs[0, 0])
+        self.fig.subplots_adjust(left=0.05, right=0.96, top=0.91, bottom=0.06)
+
+        ax = self.ax
+        ax.set_xlim(0, ancho_tablero)
+        ax.set_ylim(0, alto_tablero)
+        ax.invert_yaxis()
+        ax.set_aspect('equal')
+
+        simbolo = obtener_simbolo_unidad(unidad)
+        if modo_plan_corte:
+            # Modo plan de corte: sin título, solo dimensiones del tablero
+            ax.set_title(f"{ancho_tablero} × {alto_tablero} {simbolo}",
+                        fontsize=12, fontweight='bold', pad=10)
+            ax.set_xlabel(f"Ancho ({simbolo})", fontsize=10)
+            ax.set_ylabel(f"Alto ({simbolo})", fontsize=10)
+            ax.grid(True, alpha=0.2, linestyle='-', linewidth=0.5, color='gray')
+        else:
+            ax.set_xlabel(f"Ancho ({simbolo})", fontsize=11)
+            ax.set_ylabel(f"Alto ({simbolo})", fontsize=11)
+            ax.grid(True, alpha=0.3, linestyle='--', linewidth=0.5)
+
+        ax.set_axisbelow(True)
+
+        # Borde del tablero
+        if modo_plan_corte:
+            borde = patches.Rectangle((0, 0), ancho_tablero, alto_tablero,
+                                      linewidth=2, edgecolor='black',
+                                      facecolor='white', alpha=1.0)
+        else:
+            borde = patches.Rectangle((0, 0), ancho_tablero, alto_tablero,
+                                      linewidth=3, edgecolor='black',
+                                      facecolor='#f0f0f0', alpha=0.3)
+        ax.add_patch(borde)
+
+    def agregar(self, artista):
+        """Registra un artista propio del tablero actual (se retira en limpiar)."""
+        self._variables.append(artista)
+        return artista
+
+    def mostrar_leyenda(self, cantidad_por_tipo):
+        clave = tuple(k for k in self.catalogo_ord if cantidad_por_tipo.get(k, 0) > 0)
+        if clave not in self._leyendas:
+            ax_leg = self.fig.add_subplot(self._gs[0, 1])
+            textos = _dibujar_leyenda_tipos_piezas(
+                ax_leg, self.catalogo_ord, self.numero_por_tipo, self.color_por_tipo,
+                self.unidad, cantidad_por_tipo,
+            )
+            self._leyendas[clave] = (ax_leg, textos)
+
+        for otra_clave, (ax_leg, _) in self._leyendas.items():
+            ax_leg.set_visible(otra_clave == clave)
+        _, textos = self._leyendas[clave]
+        for key, texto in textos.items():
+            texto.set_text(f'Cantidad de piezas: {cantidad_por_tipo[key]}')
+
+    def limpiar(self):
+        for artista in self._variables:
+            artista.remove()
+        self._variables = []
+
+    def cerrar(self):
+        plt.close(self.fig)
+
 def _numero_interior_pieza(num_tipo, w_placed_cm, h_placed_cm, ancho_tb_cm, alto_tb_cm):
     """Devuelve (texto o None, fontsize)."""
     min_tab = max(min(ancho_tb_cm, alto_tb_cm), 1e-9)
@@ -128,9 +227,10 @@ def _numero_interior_pieza(num_tipo, w_placed_cm, h_placed_cm, ancho_tb_cm, alto
     fs = max(6, min(15, min_tab / 8 + rel * 48))
     return str(num_tipo), fs
 
-def generar_grafico(piezas, ancho_tablero, alto_tablero, unidad='cm', permitir_rotacion=True, margen_corte=0.3, nombres_piezas=None, modo_plan_corte=False):
+@medir_etapa('generar_grafico')
+def generar_grafico(piezas, ancho_tablero, alto_tablero, unidad='cm', permitir_rotacion=True, margen_corte=0.3, nombres_piezas=None, modo_plan_corte=False, resoluciones=None):
     """
-    Ejecuta el motor de corte (FFD + BSSF) y genera imágenes PNG en base64.
+    Ejecuta el motor de corte (FFD + BSSF) y genera las imágenes PNG (bytes) de cada tablero.
 
     Args:
         piezas: Lista de tuplas (ancho, alto, cantidad) en cm
@@ -140,6 +240,9 @@ def generar_grafico(piezas, ancho_tablero, alto_tablero, unidad='cm', permitir_r
         permitir_rotacion: Si True, intenta rotar piezas 90° si mejora el aprovechamiento
         margen_corte: Margen de corte (kerf) en cm entre cortes vecinos (no sobre borde placa).
         nombres_piezas: Lista opcional de nombres para la etiqueta en el gráfico
+        resoluciones: Dict opcional {nombre: dpi} (p. ej. RESOLUCIONES_TABLERO). Si se indica,
+                      cada figura se rasteriza una vez por resolución y cada imagen devuelta
+                      es un dict {nombre: bytes PNG}; si no, bytes PNG a 120 dpi.
     """
     tableros, aprovechamiento_total, info_desperdicio = optimizar_corte(
         piezas,
@@ -158,125 +261,100 @@ def generar_grafico(piezas, ancho_tablero, alto_tablero, unidad='cm', permitir_r
     paleta_visual = _paleta_tipos_visual(len(catalogo_ord))
     color_por_tipo = {k: paleta_visual[j] for j, k in enumerate(catalogo_ord)}
 
-    # Generar imágenes
-    imagenes_base64 = []
+    # Generar imágenes sobre una plantilla común (ejes, borde y leyendas se dibujan una vez)
+    imagenes_png = []
+    plantilla = _PlantillaFiguraTablero(
+        ancho_tablero, alto_tablero, unidad, modo_plan_corte,
+        catalogo_ord, numero_por_tipo, color_por_tipo,
+    )
+    ax = plantilla.ax
 
-    for i, tablero in enumerate(tableros, start=1):
-        posiciones = tablero['posiciones']
-        info_tablero = info_tableros[i-1]
+    # Convertir desperdicio para mostrar
+    simbolo_area = obtener_simbolo_area(unidad)
+    factor_lineal = convertir_desde_cm(1, unidad)
+    factor_area = factor_lineal ** 2
 
-        fig = plt.figure(figsize=(12.5, 9.8))
-        gs = GridSpec(1, 2, figure=fig, width_ratios=[1, 0.44], wspace=0.10)
-        ax = fig.add_subplot(gs[0, 0])
-        ax_leg = fig.add_subplot(gs[0, 1])
-        fig.subplots_adjust(left=0.05, right=0.96, top=0.91, bottom=0.06)
+    try:
+        for i, tablero in enumerate(tableros, start=1):
+            posiciones = tablero['posiciones']
+            info_tablero = info_tableros[i-1]
+            desperdicio_mostrar = round(info_tablero['desperdicio'] * factor_area, 2)
 
-        ax.set_xlim(0, ancho_tablero)
-        ax.set_ylim(0, alto_tablero)
-        ax.invert_yaxis()
-        ax.set_aspect('equal')
-        
-        # Convertir desperdicio para mostrar
-        simbolo = obtener_simbolo_unidad(unidad)
-        simbolo_area = obtener_simbolo_area(unidad)
-        factor_lineal = convertir_desde_cm(1, unidad)
-        factor_area = factor_lineal ** 2
-        desperdicio_mostrar = round(info_tablero['desperdicio'] * factor_area, 2)
-        
-        # Título y configuración según modo
-        if modo_plan_corte:
-            # Modo plan de corte: sin título, solo dimensiones del tablero
-            ax.set_title(f"{ancho_tablero} × {alto_tablero} {simbolo}",
-                        fontsize=12, fontweight='bold', pad=10)
-            ax.set_xlabel(f"Ancho ({simbolo})", fontsize=10)
-            ax.set_ylabel(f"Alto ({simbolo})", fontsize=10)
-            ax.grid(True, alpha=0.2, linestyle='-', linewidth=0.5, color='gray')
-        else:
-            # Modo normal: con información completa
-            ax.set_title(f"Tablero {i} de {num_tableros} - FFD + rect. libres\n"
-                        f"Uso: {info_tablero['porcentaje_uso']}% | Desperdicio: {desperdicio_mostrar} {simbolo_area}",
-                        fontsize=13, fontweight='bold', pad=20)
-            ax.set_xlabel(f"Ancho ({simbolo})", fontsize=11)
-            ax.set_ylabel(f"Alto ({simbolo})", fontsize=11)
-            ax.grid(True, alpha=0.3, linestyle='--', linewidth=0.5)
-        
-        ax.set_axisbelow(True)
-        
-        # Borde del tablero
-        if modo_plan_corte:
-            borde = patches.Rectangle((0, 0), ancho_tablero, alto_tablero,
-                                      linewidth=2, edgecolor='black', 
-                                      facecolor='white', alpha=1.0)
-        else:
-            borde = patches.Rectangle((0, 0), ancho_tablero, alto_tablero,
-                                      linewidth=3, edgecolor='black', 
-                                      facecolor='#f0f0f0', alpha=0.3)
-        ax.add_patch(borde)
-        
-        # Dibujar piezas
-        if modo_plan_corte:
-            for idx, pos_data in enumerate(posiciones):
-                x, y, w, h, rotada, _wo, _ho, _nom = _unpack_posicion_grafico(pos_data, idx)
-                key_tv = _tipo_pieza_visual_key(pos_data, idx)
-                num_t = numero_por_tipo[key_tv]
-                clr = color_por_tipo[key_tv]
-                ax.add_patch(patches.Rectangle(
-                    (x, y), w, h, linewidth=2.8, edgecolor=clr,
-                    facecolor='white', alpha=1.0,
-                ))
-                texto_n, psz = _numero_interior_pieza(num_t, w, h, ancho_tablero, alto_tablero)
-                if texto_n:
-                    ax.text(
-                        x + w / 2, y + h / 2,
-                        texto_n,
-                        fontsize=psz, ha='center', va='center', fontweight='bold',
-                        color='#1a1f2c',
-                    )
-        else:
-            for idx, pos_data in enumerate(posiciones):
-                x, y, w, h, rotada, _wo, _ho, _nom = _unpack_posicion_grafico(pos_data, idx)
-                key_tv = _tipo_pieza_visual_key(pos_data, idx)
-                clr = color_por_tipo[key_tv]
-                num_t = numero_por_tipo[key_tv]
-                ax.add_patch(patches.Rectangle(
-                    (x, y), w, h, linewidth=2,
-                    edgecolor='#263238', facecolor=clr, alpha=0.78,
+            # Dibujar piezas
+            if modo_plan_corte:
+                for idx, pos_data in enumerate(posiciones):
+                    x, y, w, h, rotada, _wo, _ho, _nom = _unpack_posicion_grafico(pos_data, idx)
+                    key_tv = _tipo_pieza_visual_key(pos_data, idx)
+                    num_t = numero_por_tipo[key_tv]
+                    clr = color_por_tipo[key_tv]
+                    plantilla.agregar(ax.add_patch(patches.Rectangle(
+                        (x, y), w, h, linewidth=2.8, edgecolor=clr,
+                        facecolor='white', alpha=1.0,
+                    )))
+                    texto_n, psz = _numero_interior_pieza(num_t, w, h, ancho_tablero, alto_tablero)
+                    if texto_n:
+                        plantilla.agregar(ax.text(
+                            x + w / 2, y + h / 2,
+                            texto_n,
+                            fontsize=psz, ha='center', va='center', fontweight='bold',
+                            color='#1a1f2c',
+                        ))
+            else:
+                # Modo normal: con información completa
+                ax.set_title(f"Tablero {i} de {num_tableros} - FFD + rect. libres\n"
+                            f"Uso: {info_tablero['porcentaje_uso']}% | Desperdicio: {desperdicio_mostrar} {simbolo_area}",
+                            fontsize=13, fontweight='bold', pad=20)
+                for idx, pos_data in enumerate(posiciones):
+                    x, y, w, h, rotada, _wo, _ho, _nom = _unpack_posicion_grafico(pos_data, idx)
+                    key_tv = _tipo_pieza_visual_key(pos_data, idx)
+                    clr = color_por_tipo[key_tv]
+                    num_t = numero_por_tipo[key_tv]
+                    plantilla.agregar(ax.add_patch(patches.Rectangle(
+                        (x, y), w, h, linewidth=2,
+                        edgecolor='#263238', facecolor=clr, alpha=0.78,
+                    )))
+                    texto_n, psz = _numero_interior_pieza(num_t, w, h, ancho_tablero, alto_tablero)
+                    if texto_n:
+                        plantilla.agregar(ax.text(
+                            x + w / 2, y + h / 2,
+                            texto_n,
+                            fontsize=psz, ha='center', va='center', fontweight='bold',
+                            color='#102027',
+                        ))
+
+                # Información detallada (solo en modo normal)
+                area_usada_mostrar = round(info_tablero['area_usada'] * factor_area, 2)
+                info_text = (f"Piezas: {info_tablero['num_piezas']}\n"
+                            f"Área usada: {area_usada_mostrar} {simbolo_area}\n"
+                            f"Desperdicio: {desperdicio_mostrar} {simbolo_area}")
+                plantilla.agregar(ax.text(
+                    ancho_tablero * 0.02, alto_tablero * 0.98, info_text,
+                    fontsize=9, verticalalignment='top',
+                    bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.9),
                 ))
-                texto_n, psz = _numero_interior_pieza(num_t, w, h, ancho_tablero, alto_tablero)
-                if texto_n:
-                    ax.text(
-                        x + w / 2, y + h / 2,
-                        texto_n,
-                        fontsize=psz, ha='center', va='center', fontweight='bold',
-                        color='#102027',
-                    )
-
-            # Información detallada (solo en modo normal)
-            area_usada_mostrar = round(info_tablero['area_usada'] * factor_area, 2)
-            info_text = (f"Piezas: {info_tablero['num_piezas']}\n"
-                        f"Área usada: {area_usada_mostrar} {simbolo_area}\n"
-                        f"Desperdicio: {desperdicio_mostrar} {simbolo_area}")
-            ax.text(ancho_tablero * 0.02, alto_tablero * 0.98, info_text,
-                   fontsize=9, verticalalignment='top',
-                   bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.9))
-
-        cantidad_por_tipo_tablero = {}
-        for ji, pd in enumerate(posiciones):
-            key_tv = _tipo_pieza_visual_key(pd, ji)
-            cantidad_por_tipo_tablero[key_tv] = cantidad_por_tipo_tablero.get(key_tv, 0) + 1
-
-        _dibujar_leyenda_tipos_piezas(
-            ax_leg, catalogo_ord, numero_por_tipo, color_por_tipo,
-            unidad, cantidad_por_tipo_tablero,
-        )
-
-        buf = io.BytesIO()
-        fig.savefig(buf, format="png", dpi=120, bbox_inches='tight', facecolor='white')
-        plt.close(fig)
-        buf.seek(0)
-        imagenes_base64.append(base64.b64encode(buf.read()).decode("utf-8"))
-
-    return imagenes_base64, aprovechamiento_total, normalizar_info_desperdicio(info_desperdicio)
+
+            cantidad_por_tipo_tablero = {}
+            for ji, pd in enumerate(posiciones):
+                key_tv = _tipo_pieza_visual_key(pd, ji)
+                cantidad_por_tipo_tablero[key_tv] = cantidad_por_tipo_tablero.get(key_tv, 0) + 1
+            plantilla.mostrar_leyenda(cantidad_por_tipo_tablero)
+
+            if resoluciones:
+                imagenes_png.append({
+                    nombre: _figura_a_png(plantilla.fig, dpi) for nombre, dpi in resoluciones.items()
+                })
+            else:
+                imagenes_png.append(_figura_a_png(plantilla.fig, 120))
+            plantilla.limpiar()
+    finally:
+        plantilla.cerrar()
+
+    return imagenes_png, aprovechamiento_total, normalizar_info_desperdicio(info_desperdicio)
+
+def _figura_a_png(fig, dpi):
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi, bbox_inches='tight', facecolor='white')
+    return buf.getvalue()
 
 def _info_desperdicio_desde_optimizacion(optimizacion):
     """Regenera el dict info_desperdicio sin generar imágenes."""
@@ -301,155 +379,3 @@ def _info_desperdicio_desde_optimizacion(optimizacion):
         nombres_piezas=nombres_piezas if nombres_piezas else None,
     )
     return info
-
-def generar_grafico_aprovechamiento(optimizaciones, periodo='todos', alta_resolucion=False):
-    """
-    Genera un gráfico de línea mostrando la tendencia de aprovechamiento.
-    
-    Args:
-        optimizaciones: QuerySet de optimizaciones ordenadas por fecha
-        periodo: 'semanal', 'mensual', 'anual', 'todos'
-        alta_resolucion: Si es True, genera una versión en alta resolución para zoom
-    
-    Returns:
-        String base64 de la imagen del gráfico
-    """
-    if not optimizaciones.exists():
-        return None
-    
-    # Ajustar tamaño y DPI según resolución
-    if alta_resolucion:
-        fig, ax = plt.subplots(figsize=(16, 9))
-        dpi = 200
-        fontsize_title = 18
-        fontsize_labels = 14
-        fontsize_legend = 12
-        linewidth = 3
-        markersize = 8
-    else:
-        fig, ax = plt.subplots(figsize=(12, 6))
-        dpi = 100
-        fontsize_title = 14
-        fontsize_labels = 11
-        fontsize_legend = 10
-        linewidth = 2
-        markersize = 6
-    
-    # Preparar datos
-    fechas = [opt.fecha for opt in optimizaciones]
-    aprovechamientos = [opt.aprovechamiento_total for opt in optimizaciones]
-    
-    # Calcular promedio
-    promedio = sum(aprovechamientos) / len(aprovechamientos) if aprovechamientos else 0
-    
-    # Gráfico de línea
-    ax.plot(fechas, aprovechamientos, marker='o', linewidth=linewidth, markersize=markersize, 
-            color='#4ECDC4', label='Aprovechamiento')
-    
-    # Línea de promedio
-    ax.axhline(y=promedio, color='#FF6B6B', linestyle='--', linewidth=linewidth, 
-               label=f'Promedio: {promedio:.2f}%')
-    
-    # Formatear fechas según período
-    if periodo == 'semanal':
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-    elif periodo == 'mensual':
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%Y'))
-    elif periodo == 'anual':
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
-    else:
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%Y'))
-    
-    plt.xticks(rotation=45, ha='right')
-    ax.set_xlabel('Fecha', fontsize=fontsize_labels, fontweight='bold')
-    ax.set_ylabel('Aprovechamiento (%)', fontsize=fontsize_labels, fontweight='bold')
-    ax.set_title('📊 Tendencia de Aprovechamiento', fontsize=fontsize_title, fontweight='bold', pad=20)
-    ax.grid(True, alpha=0.3, linestyle='--')
-    ax.legend(loc='best', fontsize=fontsize_legend)
-    ax.set_ylim(0, 100)
-    
-    plt.tight_layout()
-    
-    # Convertir a base64
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight', facecolor='white')
-    plt.close(fig)
-    buf.seek(0)
-    return base64.b64encode(buf.read()).decode('utf-8')
-
-def generar_grafico_desperdicio(optimizaciones, periodo='todos', alta_resolucion=False):
-    """
-    Genera un gráfico de línea mostrando la tendencia de desperdicio.
-    Calcula el desperdicio basado en el aprovechamiento.
-    
-    Args:
-        optimizaciones: QuerySet de optimizaciones ordenadas por fecha
-        periodo: 'semanal', 'mensual', 'anual', 'todos'
-        alta_resolucion: Si es True, genera una versión en alta resolución para zoom
-    
-    Returns:
-        String base64 de la imagen del gráfico
-    """
-    if not optimizaciones.exists():
-        return None
-    
-    # Ajustar tamaño y DPI según resolución
-    if alta_resolucion:
-        fig, ax = plt.subplots(figsize=(16, 9))
-        dpi = 200
-        fontsize_title = 18
-        fontsize_labels = 14
-        fontsize_legend = 12
-        linewidth = 3
-        markersize = 8
-    else:
-        fig, ax = plt.subplots(figsize=(12, 6))
-        dpi = 100
-        fontsize_title = 14
-        fontsize_labels = 11
-        fontsize_legend = 10
-        linewidth = 2
-        markersize = 6
-    
-    # Preparar datos
-    fechas = [opt.fecha for opt in optimizaciones]
-    # Calcular desperdicio: 100 - aprovechamiento
-    desperdicios = [100 - opt.aprovechamiento_total for opt in optimizaciones]
-    
-    # Calcular promedio
-    promedio = sum(desperdicios) / len(desperdicios) if desperdicios else 0
-    
-    # Gráfico de línea
-    ax.plot(fechas, desperdicios, marker='s', linewidth=linewidth, markersize=markersize, 
-            color='#FF6B6B', label='Desperdicio')
-    
-    # Línea de promedio
-    ax.axhline(y=promedio, color='#4ECDC4', linestyle='--', linewidth=linewidth, 
-               label=f'Promedio: {promedio:.2f}%')
-    
-    # Formatear fechas según período
-    if periodo == 'semanal':
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-    elif periodo == 'mensual':
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%Y'))
-    elif periodo == 'anual':
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y'))
-    else:
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%Y'))
-    
-    plt.xticks(rotation=45, ha='right')
-    ax.set_xlabel('Fecha', fontsize=fontsize_labels, fontweight='bold')
-    ax.set_ylabel('Desperdicio (%)', fontsize=fontsize_labels, fontweight='bold')
-    ax.set_title('📉 Tendencia de Desperdicio', fontsize=fontsize_title, fontweight='bold', pad=20)
-    ax.grid(True, alpha=0.3, linestyle='--')
-    ax.legend(loc='best', fontsize=fontsize_legend)
-    ax.set_ylim(0, 100)
-    
-    plt.tight_layout()
-    
-    # Convertir a base64
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight', facecolor='white')
-    plt.close(fig)
-    buf.seek(0)
-    return base64.b64encode(buf.read()).decode('utf-8')
@@ -1,7 +1,26 @@
-from .notifications import enviar_notificacion
+from .artifacts import (
+    borrar_artefactos,
+    directorio_artefactos,
+    obtener_artefacto,
+    obtener_artefactos,
+    recortar_artefactos,
+    version_artefacto,
+)
+from .charts import (
+    grafico_cacheado,
+    invalidar_graficos_usuario,
+    serie_costos,
+    serie_estadisticas,
+    version_datos_usuario,
+)
+from .deletion import marcar_optimizaciones_eliminadas, purgar_optimizaciones_eliminadas
+from .images import archivo_tablero, respuesta_imagen_tablero, url_imagen_tablero, urls_tableros
+from ..numbering import anotar_numero_lista, calcular_numero_lista
+from .notifications import encolar_email, enviar_notificacion, enviar_notificaciones_pendientes
 from .optimization import (
-    calcular_numero_lista,
+    asegurar_resultado_optimizacion,
     convertir_info_desperdicio_unidad,
+    imagenes_plan_corte,
     nombre_descarga_excel,
     nombre_descarga_pdf,
     nombre_descarga_png,
@@ -10,22 +29,52 @@ from .optimization import (
     obtener_resultado_optimizacion,
     preparar_contexto_resultado,
     pdf_path_para_template,
+    renderizar_resultado_optimizacion,
+    respuesta_imagen_plan_corte,
     respuesta_png_tablero,
     respuesta_pdf_optimizacion,
+    resumen_disposicion,
+    urls_plan_corte,
 )
 
 __all__ = [
+    'anotar_numero_lista',
+    'archivo_tablero',
+    'asegurar_resultado_optimizacion',
+    'borrar_artefactos',
     'calcular_numero_lista',
     'convertir_info_desperdicio_unidad',
+    'directorio_artefactos',
+    'encolar_email',
     'enviar_notificacion',
+    'enviar_notificaciones_pendientes',
+    'grafico_cacheado',
+    'imagenes_plan_corte',
+    'invalidar_graficos_usuario',
+    'marcar_optimizaciones_eliminadas',
     'nombre_descarga_excel',
     'nombre_descarga_pdf',
     'nombre_descarga_png',
     'nombre_descarga_png_tablero',
+    'obtener_artefacto',
+    'obtener_artefactos',
     'persistir_resultado_optimizacion',
     'obtener_resultado_optimizacion',
     'preparar_contexto_resultado',
+    'purgar_optimizaciones_eliminadas',
     'pdf_path_para_template',
+    'recortar_artefactos',
+    'renderizar_resultado_optimizacion',
+    'respuesta_imagen_plan_corte',
+    'respuesta_imagen_tablero',
     'respuesta_png_tablero',
     'respuesta_pdf_optimizacion',
+    'resumen_disposicion',
+    'serie_costos',
+    'serie_estadisticas',
+    'url_imagen_tablero',
+    'urls_plan_corte',
+    'urls_tableros',
+    'version_artefacto',
+    'version_datos_usuario',
 ]
@@ -0,0 +1,152 @@
+"""
+Caché en disco de los archivos derivados de cada optimización (PDF, Excel, imágenes del
+plan de corte).
+
+Cada archivo se guarda en ``MEDIA_ROOT/artefactos/<tipo>/`` con un nombre que incluye la
+versión de su contenido: una huella de los datos que se imprimen y de las versiones del
+motor y del formato. Una descarga repetida solo sirve el archivo; si la optimización
+cambia, la versión cambia y se genera uno nuevo. Los archivos que ya no se usan se borran
+al eliminar la optimización o, por tamaño, los menos usados recientemente.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+
+from ..packing import VERSION_MOTOR
+
+DIRECTORIO_ARTEFACTOS = 'artefactos'
+# Súbela al cambiar el contenido o el formato de los PDF / Excel generados
+VERSION_FORMATO_ARTEFACTOS = 1
+# Tamaño máximo de la caché (se puede cambiar con CUTLESS_ARTEFACTOS_MAX_BYTES en settings)
+MAX_BYTES_ARTEFACTOS = 512 * 1024 * 1024
+
+# Campos de Optimizacion que aparecen en los archivos generados (o los determinan)
+CAMPOS_VERSION_ARTEFACTO = (
+    'fecha', 'piezas', 'ancho_tablero', 'alto_tablero', 'unidad_medida', 'margen_corte',
+    'permitir_rotacion', 'material_id', 'precio_tablero', 'mano_obra', 'num_tableros',
+    'aprovechamiento_total', 'area_usada_total', 'desperdicio_total', 'resultado_generado_en',
+)
+
+
+def directorio_artefactos(tipo=None):
+    base = os.path.join(settings.MEDIA_ROOT, DIRECTORIO_ARTEFACTOS)
+    return os.path.join(base, tipo) if tipo else base
+
+
+def version_artefacto(optimizacion, tipo, *extra):
+    """
+    Versión del contenido del archivo ``tipo``: campos impresos de la optimización,
+    nombre del material, ``extra`` (p. ej. el número de lista del título) y versiones
+    del motor y del formato.
+    """
+    valores = [getattr(optimizacion, campo) for campo in CAMPOS_VERSION_ARTEFACTO]
+    material = optimizacion.material.nombre if optimizacion.material_id else None
+    contenido = repr((tipo, VERSION_MOTOR, VERSION_FORMATO_ARTEFACTOS, valores, material, extra))
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:24]
+
+
+def obtener_artefacto(optimizacion, tipo, extension, generar, *extra):
+    """
+    Ruta del archivo ``tipo`` de la optimización para su versión actual. Si no está en
+    la caché lo escribe ``generar(destino)`` (archivo binario abierto) y recorta la caché
+    al tamaño máximo.
+    """
+    version = version_artefacto(optimizacion, tipo, *extra)
+    ruta = os.path.join(directorio_artefactos(tipo), f"opt_{optimizacion.pk}_{version}.{extension}")
+    if os.path.exists(ruta):
+        # Marca de último uso para el desalojo por antigüedad
+        os.utime(ruta)
+        return ruta
+
+    _escribir_artefacto(ruta, generar)
+    recortar_artefactos()
+    return ruta
+
+
+def obtener_artefactos(optimizacion, tipo, extension, cantidad, generar, *extra):
+    """
+    Como ``obtener_artefacto`` para ``cantidad`` archivos que se generan juntos (p. ej.
+    una imagen por tablero): si falta alguno, ``generar()`` devuelve los contenidos (bytes)
+    de todos. Devuelve las rutas, en orden.
+    """
+    version = version_artefacto(optimizacion, tipo, *extra)
+    directorio = directorio_artefactos(tipo)
+    rutas = [
+        os.path.join(directorio, f"opt_{optimizacion.pk}_{version}_{numero}.{extension}")
+        for numero in range(1, cantidad + 1)
+    ]
+    if all(os.path.exists(ruta) for ruta in rutas):
+        for ruta in rutas:
+            os.utime(ruta)
+        return rutas
+
+    for ruta, contenido in zip(rutas, generar()):
+        _escribir_artefacto(ruta, lambda destino: destino.write(contenido))
+    recortar_artefactos()
+    return rutas
+
+
+def _escribir_artefacto(ruta, generar):
+    directorio = os.path.dirname(ruta)
+    os.makedirs(directorio, exist_ok=True)
+    # Se escribe aparte y se renombra: una descarga concurrente nunca ve un archivo a medias
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as destino:
+            generar(destino)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def borrar_artefactos(optimizacion_ids):
+    """Borra todas las versiones de los archivos de las optimizaciones (un solo recorrido)."""
+    ids = {str(pk) for pk in optimizacion_ids}
+    for raiz, _, nombres in os.walk(directorio_artefactos()):
+        for nombre in nombres:
+            # opt_<id>_<versión>.<extensión>
+            partes = nombre.split('_', 2)
+            if len(partes) == 3 and partes[0] == 'opt' and partes[1] in ids:
+                try:
+                    os.remove(os.path.join(raiz, nombre))
+                except OSError:
+                    pass
+
+
+def recortar_artefactos(max_bytes=None):
+    """
+    Si la caché supera ``max_bytes`` borra los archivos usados hace más tiempo hasta
+    quedar por debajo. Devuelve los bytes liberados.
+    """
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'CUTLESS_ARTEFACTOS_MAX_BYTES', MAX_BYTES_ARTEFACTOS)
+    archivos = []
+    total = 0
+    for raiz, _, nombres in os.walk(directorio_artefactos()):
+        for nombre in nombres:
+            if nombre.endswith('.tmp'):
+                continue
+            ruta = os.path.join(raiz, nombre)
+            try:
+                estado = os.stat(ruta)
+            except OSError:
+                continue
+            archivos.append((estado.st_mtime, estado.st_size, ruta))
+            total += estado.st_size
+    if total <= max_bytes:
+        return 0
+
+    liberados = 0
+    for _, tamano, ruta in sorted(archivos):
+        if total - liberados <= max_bytes:
+            break
+        try:
+            os.remove(ruta)
+        except OSError:
+            continue
+        liberados += tamano
+    return liberados
@@ -0,0 +1,224 @@
+"""Gráficos estadísticos: caché por usuario y versión de datos, y series para el navegador."""
+import time
+
+from django.core.cache import cache
+from django.db.models import Max, Min, Sum
+from django.db.models.functions import TruncMonth, TruncWeek, TruncYear
+
+from ..models import EstadisticaDiaria
+
+# Los gráficos solo cambian cuando cambian las optimizaciones del usuario (nueva versión);
+# el tiempo de vida solo acota el espacio que ocupan los que ya nadie pide.
+TIMEOUT_GRAFICOS = 60 * 60 * 24
+# Marca para "sin datos": un gráfico vacío también se cachea
+_SIN_GRAFICO = ''
+
+
+def _clave_version(usuario_id):
+    return f"cutless:graficos:version:{usuario_id}"
+
+
+def version_datos_usuario(usuario_id):
+    """
+    Versión de los datos estadísticos del usuario. Si la caché la perdió se inicia con
+    la hora actual, de modo que nunca coincide con una versión anterior ya usada.
+    """
+    clave = _clave_version(usuario_id)
+    version = cache.get(clave)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(clave, version, timeout=None):
+            version = cache.get(clave, version)
+    return version
+
+
+def invalidar_graficos_usuario(usuario_id):
+    """Cambia la versión de datos del usuario (los gráficos anteriores dejan de usarse)."""
+    clave = _clave_version(usuario_id)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, time.time_ns(), timeout=None)
+
+
+def grafico_cacheado(usuario_id, nombre, generar, *partes_clave):
+    """
+    Devuelve el gráfico o la serie ``nombre`` del usuario desde la caché o lo genera con
+    ``generar()``. ``partes_clave`` distingue variantes (período, fechas, resolución).
+    """
+    version = version_datos_usuario(usuario_id)
+    sufijo = ':'.join(str(parte) for parte in partes_clave)
+    clave = f"cutless:grafico:{usuario_id}:{version}:{nombre}:{sufijo}"
+    grafico = cache.get(clave)
+    if grafico is None:
+        grafico = generar() or _SIN_GRAFICO
+        cache.set(clave, grafico, timeout=TIMEOUT_GRAFICOS)
+    return grafico or None
+
+
+# Series de estadísticas para dibujar en el navegador
+MAX_PUNTOS_GRAFICO = 120
+GRANULARIDADES = ('dia', 'semana', 'mes', 'anio')
+GRANULARIDAD_POR_PERIODO = {
+    'semanal': 'dia',
+    'mensual': 'dia',
+    'anual': 'semana',
+    'todos': 'dia',
+}
+# 'todos' usa los días y se reduce por forma (LTTB) en vez de promediar intervalos
+PERIODOS_REDUCIDOS = ('todos',)
+TRUNCAR = {
+    'semana': TruncWeek,
+    'mes': TruncMonth,
+    'anio': TruncYear,
+}
+FORMATO_ETIQUETA = {
+    'dia': '%d/%m',
+    'semana': '%d/%m/%Y',
+    'mes': '%m/%Y',
+    'anio': '%Y',
+}
+
+
+def _filas_intervalo(filas, granularidad):
+    """
+    Filas (inicio, cantidad, suma, mínimo, máximo) agrupadas por intervalo en la base
+    de datos (TruncWeek/TruncMonth/TruncYear); para días se leen los resúmenes tal cual.
+    """
+    if granularidad == 'dia':
+        return list(
+            filas.order_by('fecha').values_list(
+                'fecha', 'num_optimizaciones', 'suma_aprovechamiento',
+                'min_aprovechamiento', 'max_aprovechamiento',
+            )
+        )
+    return list(
+        filas.annotate(inicio=TRUNCAR[granularidad]('fecha'))
+        .values('inicio')
+        .annotate(
+            cantidad=Sum('num_optimizaciones'),
+            suma=Sum('suma_aprovechamiento'),
+            minimo=Min('min_aprovechamiento'),
+            maximo=Max('max_aprovechamiento'),
+        )
+        .order_by('inicio')
+        .values_list('inicio', 'cantidad', 'suma', 'minimo', 'maximo')
+    )
+
+
+def reducir_lttb(puntos, umbral, x, y):
+    """
+    Reduce ``puntos`` a ``umbral`` elementos con Largest-Triangle-Three-Buckets: conserva
+    el primero y el último y, de cada tramo intermedio, el punto que forma el triángulo
+    de mayor área con el elegido anterior y el promedio del tramo siguiente. Mantiene
+    picos y valles, a diferencia de promediar.
+    """
+    total = len(puntos)
+    if umbral >= total or umbral < 3:
+        return list(puntos)
+
+    tam_tramo = (total - 2) / (umbral - 2)
+    elegidos = [puntos[0]]
+    anterior = 0
+    for i in range(umbral - 2):
+        inicio = int(i * tam_tramo) + 1
+        fin = int((i + 1) * tam_tramo) + 1
+        sig_inicio = fin
+        sig_fin = min(int((i + 2) * tam_tramo) + 1, total)
+        siguientes = puntos[sig_inicio:sig_fin] or [puntos[-1]]
+        prom_x = sum(x(p) for p in siguientes) / len(siguientes)
+        prom_y = sum(y(p) for p in siguientes) / len(siguientes)
+
+        ax, ay = x(puntos[anterior]), y(puntos[anterior])
+        mejor, mayor_area = inicio, -1.0
+        for j in range(inicio, fin):
+            area = abs(
+                (ax - prom_x) * (y(puntos[j]) - ay)
+                - (ax - x(puntos[j])) * (prom_y - ay)
+            )
+            if area > mayor_area:
+                mejor, mayor_area = j, area
+        elegidos.append(puntos[mejor])
+        anterior = mejor
+    elegidos.append(puntos[-1])
+    return elegidos
+
+
+def serie_estadisticas(usuario, periodo='todos', desde=None):
+    """
+    Serie temporal de aprovechamiento y desperdicio del usuario (promedio, mínimo y
+    máximo por intervalo), con a lo sumo MAX_PUNTOS_GRAFICO puntos. Se agrupa en la
+    base de datos sobre los resúmenes diarios, por lo que ni la consulta ni lo que se
+    transfiere dependen del tamaño del historial.
+    """
+    filas = EstadisticaDiaria.objects.filter(usuario=usuario, num_optimizaciones__gt=0)
+    if desde:
+        filas = filas.filter(fecha__gte=desde)
+
+    granularidad = GRANULARIDAD_POR_PERIODO.get(periodo, 'dia')
+    grupos = _filas_intervalo(filas, granularidad)
+    reducida = periodo in PERIODOS_REDUCIDOS
+    if reducida:
+        grupos = reducir_lttb(
+            grupos, MAX_PUNTOS_GRAFICO,
+            x=lambda fila: fila[0].toordinal(),
+            y=lambda fila: fila[2] / fila[1],
+        )
+    else:
+        # Intervalos más gruesos hasta respetar el máximo de puntos
+        for siguiente in GRANULARIDADES[GRANULARIDADES.index(granularidad) + 1:]:
+            if len(grupos) <= MAX_PUNTOS_GRAFICO:
+                break
+            granularidad = siguiente
+            grupos = _filas_intervalo(filas, granularidad)
+
+    formato = FORMATO_ETIQUETA['semana'] if reducida else FORMATO_ETIQUETA[granularidad]
+    puntos = []
+    for inicio, cantidad, suma, minimo, maximo in grupos:
+        aprovechamiento = round(suma / cantidad, 2)
+        puntos.append({
+            'fecha': inicio.isoformat(),
+            'etiqueta': inicio.strftime(formato),
+            'optimizaciones': cantidad,
+            'aprovechamiento': aprovechamiento,
+            'aprovechamiento_min': round(minimo, 2),
+            'aprovechamiento_max': round(maximo, 2),
+            'desperdicio': round(100 - aprovechamiento, 2),
+            'desperdicio_min': round(100 - maximo, 2),
+            'desperdicio_max': round(100 - minimo, 2),
+        })
+
+    totales = filas.aggregate(cantidad=Sum('num_optimizaciones'), suma=Sum('suma_aprovechamiento'))
+    total = totales['cantidad'] or 0
+    promedio = round(totales['suma'] / total, 2) if total else 0
+    return {
+        'periodo': periodo,
+        'granularidad': granularidad,
+        'reducida': reducida,
+        'puntos': puntos,
+        'promedio_aprovechamiento': promedio,
+        'promedio_desperdicio': round(100 - promedio, 2) if total else 0,
+    }
+
+
+def serie_costos(usuario, desde=None, hasta=None):
+    """
+    Costo total por día (solo días con costo) desde los resúmenes diarios, reducido por
+    forma (LTTB) a lo sumo MAX_PUNTOS_GRAFICO puntos.
+    """
+    filas = EstadisticaDiaria.objects.filter(usuario=usuario, num_con_costo__gt=0)
+    if desde:
+        filas = filas.filter(fecha__gte=desde)
+    if hasta:
+        filas = filas.filter(fecha__lte=hasta)
+    dias = reducir_lttb(
+        list(filas.order_by('fecha').values_list('fecha', 'costo_total')), MAX_PUNTOS_GRAFICO,
+        x=lambda fila: fila[0].toordinal(),
+        y=lambda fila: float(fila[1]),
+    )
+    return {
+        'puntos': [
+            {'fecha': dia.isoformat(), 'etiqueta': dia.strftime(FORMATO_ETIQUETA['semana']), 'costo': float(costo)}
+            for dia, costo in dias
+        ],
+    }
@@ -0,0 +1,72 @@
+"""
+Borrado diferido del historial: las optimizaciones se marcan al instante (quedan ocultas
+en todas las consultas) y el comando ``purgar_optimizaciones`` borra después las filas
+por lotes y los archivos que ya nadie referencia.
+"""
+from django.db import models, transaction
+from django.utils import timezone
+
+from ..models import EstadisticaDiaria, Optimizacion, TableroOptimizacion
+from ..storage import borrar_archivos
+from .charts import invalidar_graficos_usuario
+
+# Optimizaciones borradas por transacción al purgar
+TAM_LOTE_PURGA = 500
+
+
+def marcar_optimizaciones_eliminadas(usuario, ids=None):
+    """
+    Oculta las optimizaciones del usuario (todas, o solo las de ``ids``) y ajusta sus
+    estadísticas. Devuelve cuántas se marcaron.
+    """
+    optimizaciones = Optimizacion.objects.filter(usuario=usuario)
+    dias = None
+    if ids is not None:
+        optimizaciones = optimizaciones.filter(pk__in=ids)
+        dias = {timezone.localdate(fecha) for fecha in optimizaciones.values_list('fecha', flat=True)}
+
+    with transaction.atomic():
+        marcadas = optimizaciones.update(eliminada_en=timezone.now())
+        if dias is None:
+            # Todo el historial: no queda ningún día que resumir
+            EstadisticaDiaria.objects.filter(usuario=usuario).delete()
+        else:
+            for dia in dias:
+                EstadisticaDiaria.recalcular(usuario.pk, dia)
+    if marcadas:
+        invalidar_graficos_usuario(usuario.pk)
+    return marcadas
+
+
+def _archivos_optimizaciones(ids):
+    """Pares (storage, nombre) de los archivos de las optimizaciones ``ids`` y sus tableros."""
+    archivos = []
+    for modelo, filtro in ((Optimizacion, 'pk__in'), (TableroOptimizacion, 'optimizacion_id__in')):
+        campos = [campo for campo in modelo._meta.concrete_fields if isinstance(campo, models.FileField)]
+        filas = modelo._base_manager.filter(**{filtro: ids}).values_list(
+            *(campo.attname for campo in campos)
+        )
+        for fila in filas:
+            archivos.extend((campo.storage, nombre) for campo, nombre in zip(campos, fila) if nombre)
+    return archivos
+
+
+def purgar_optimizaciones_eliminadas(lote=TAM_LOTE_PURGA):
+    """
+    Borra un lote de optimizaciones marcadas (con sus tableros y piezas) y después los
+    archivos que quedaron sin referencias. Devuelve cuántas se borraron.
+    """
+    ids = list(
+        Optimizacion.todas
+        .filter(eliminada_en__isnull=False)
+        .order_by('eliminada_en', 'pk')
+        .values_list('pk', flat=True)[:lote]
+    )
+    if not ids:
+        return 0
+    archivos = _archivos_optimizaciones(ids)
+    with transaction.atomic():
+        Optimizacion.todas.filter(pk__in=ids).delete()
+    # Fuera de la transacción: los archivos solo se tocan con las filas ya borradas
+    borrar_archivos(archivos)
+    return len(ids)
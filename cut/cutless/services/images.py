@@ -0,0 +1,94 @@
+"""Entrega de las imágenes de tableros persistidos (URLs, resoluciones y caché HTTP)."""
+import io
+
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from PIL import Image
+
+# Lado máximo (px) de la miniatura derivada al vuelo para tableros sin miniatura persistida
+TAMANO_MINIATURA = 500
+# Las URLs apuntan a la fila TableroOptimizacion, que se recrea al regenerar:
+# el contenido de una URL no cambia y el navegador puede cachearlo largo tiempo.
+MAX_AGE_IMAGENES = 60 * 60 * 24 * 30
+
+URL_POR_TAMANO = {
+    'miniatura': 'cutless:miniatura_tablero',
+    'media': 'cutless:imagen_tablero',
+    'impresion': 'cutless:impresion_tablero',
+}
+
+
+def resoluciones_imagen(imagen):
+    """Normaliza una imagen de generar_grafico a {resolución: bytes PNG}."""
+    if isinstance(imagen, dict):
+        return imagen
+    return {'media': imagen}
+
+
+def archivo_tablero(tablero, tamano='media'):
+    """Archivo de la resolución pedida; cae a la imagen media si no está persistida."""
+    archivo = {
+        'miniatura': tablero.imagen_miniatura,
+        'impresion': tablero.imagen_impresion,
+    }.get(tamano)
+    if archivo and archivo.storage.exists(archivo.name):
+        return archivo
+    return tablero.imagen
+
+
+def url_imagen_tablero(tablero, tamano='media'):
+    return reverse(URL_POR_TAMANO[tamano], args=[tablero.pk])
+
+
+def urls_tableros(tableros, tamano='media'):
+    """URLs de las imágenes de los tableros persistidos, en orden."""
+    return [url_imagen_tablero(tablero, tamano=tamano) for tablero in tableros]
+
+
+def _fecha_modificacion(imagen):
+    try:
+        return imagen.storage.get_modified_time(imagen.name)
+    except (NotImplementedError, OSError):
+        return None
+
+
+def generar_miniatura_png(imagen, tamano=TAMANO_MINIATURA):
+    """Reduce un PNG (archivo) a un lado máximo de ``tamano`` px y devuelve los bytes."""
+    with imagen.open('rb') as archivo:
+        with Image.open(archivo) as original:
+            miniatura = original.copy()
+    miniatura.thumbnail((tamano, tamano), Image.LANCZOS)
+    buffer = io.BytesIO()
+    miniatura.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def respuesta_imagen_tablero(request, tablero, tamano='media'):
+    """
+    Sirve la imagen de un tablero en la resolución pedida con ETag y Last-Modified.
+    Responde 304 a los GET condicionales; devuelve None si el archivo no existe.
+    """
+    imagen = archivo_tablero(tablero, tamano)
+    if not imagen or not imagen.storage.exists(imagen.name):
+        return None
+    # Registros previos a la pirámide de resoluciones: la miniatura se deriva al vuelo
+    derivar_miniatura = tamano == 'miniatura' and imagen is tablero.imagen
+
+    etag = quote_etag(f"t{tablero.pk}-{imagen.size}-{tamano}")
+    modificado = _fecha_modificacion(imagen)
+    last_modified = int(modificado.timestamp()) if modificado else None
+
+    respuesta = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if respuesta is None:
+        if derivar_miniatura:
+            respuesta = HttpResponse(generar_miniatura_png(imagen), content_type='image/png')
+        else:
+            respuesta = FileResponse(imagen.open('rb'), content_type='image/png')
+
+    respuesta.headers['ETag'] = etag
+    if last_modified is not None:
+        respuesta.headers['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(respuesta, private=True, max_age=MAX_AGE_IMAGENES)
+    return respuesta
@@ -1,11 +1,22 @@
 """Notificaciones en pantalla y por email segun preferencias del usuario."""
+from datetime import timedelta
 
 from django.conf import settings
 from django.contrib import messages
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
+from django.utils import timezone
 
+from ..models import NotificacionEmail
+from ..profiling import medir_etapa
 
+# Reintentos de la cola de emails: espera base * 2^(intento - 1), con tope
+MAX_INTENTOS_EMAIL = 5
+ESPERA_BASE_REINTENTO = timedelta(minutes=1)
+ESPERA_MAXIMA_REINTENTO = timedelta(hours=6)
+
+
+@medir_etapa('enviar_notificacion')
 def enviar_notificacion(request, tipo, titulo, mensaje, contexto_adicional=None):
     """
     Envia una notificacion al usuario segun sus preferencias.
@@ -22,7 +33,6 @@ def enviar_notificacion(request, tipo, titulo, mensaje, contexto_adicional=None)
 
     try:
         perfil = request.user.perfil
-        perfil.refresh_from_db()
     except Exception as e:
         perfil = None
         if settings.DEBUG:
@@ -82,17 +92,94 @@ def enviar_notificacion(request, tipo, titulo, mensaje, contexto_adicional=None)
                     contexto.update(contexto_adicional)
 
                 asunto = f"CutLess - {titulo}"
-                mensaje_email = render_to_string('cutless/emails/notificacion.txt', contexto)
-                mensaje_email_html = render_to_string('cutless/emails/notificacion.html', contexto)
-
-                if hasattr(settings, 'EMAIL_HOST') and settings.EMAIL_HOST:
-                    send_mail(
-                        subject=asunto,
-                        message=mensaje_email,
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[email_destino],
-                        html_message=mensaje_email_html,
-                        fail_silently=True,
-                    )
+                # Solo se encola: el envío (SMTP) lo hace el comando enviar_notificaciones
+                encolar_email(
+                    destinatario=email_destino,
+                    asunto=asunto,
+                    mensaje=render_to_string('cutless/emails/notificacion.txt', contexto),
+                    mensaje_html=render_to_string('cutless/emails/notificacion.html', contexto),
+                    usuario=request.user,
+                )
             except Exception:
                 pass
+
+
+def encolar_email(destinatario, asunto, mensaje, mensaje_html='', usuario=None):
+    """Inserta el email en la cola de notificaciones (no abre conexiones SMTP)."""
+    return NotificacionEmail.objects.create(
+        usuario=usuario,
+        destinatario=destinatario,
+        asunto=asunto[:255],
+        mensaje=mensaje,
+        mensaje_html=mensaje_html,
+    )
+
+
+def espera_reintento(intentos):
+    """Tiempo hasta el siguiente intento tras ``intentos`` fallos (backoff exponencial)."""
+    return min(ESPERA_BASE_REINTENTO * 2 ** max(intentos - 1, 0), ESPERA_MAXIMA_REINTENTO)
+
+
+def enviar_notificaciones_pendientes(lote=50, max_intentos=MAX_INTENTOS_EMAIL):
+    """
+    Envía un lote de emails en cola cuyo próximo intento ya llegó, reutilizando una sola
+    conexión SMTP. Los fallos se reprograman con espera creciente y, al agotar
+    ``max_intentos``, quedan como 'fallida'. Devuelve (enviadas, fallidas).
+
+    Pensado para un solo proceso de envío a la vez (las filas no se reservan).
+    """
+    ahora = timezone.now()
+    pendientes = list(
+        NotificacionEmail.objects
+        .filter(estado='pendiente', proximo_intento__lte=ahora)
+        .order_by('proximo_intento', 'pk')[:lote]
+    )
+    if not pendientes:
+        return 0, 0
+
+    enviadas = fallidas = 0
+    conexion = get_connection(fail_silently=False)
+    try:
+        conexion.open()
+    except Exception as e:
+        # Sin servidor no se intenta ninguno: todo el lote cuenta un intento fallido
+        for notificacion in pendientes:
+            _registrar_fallo(notificacion, e, max_intentos, ahora)
+        return 0, len(pendientes)
+
+    try:
+        for notificacion in pendientes:
+            email = EmailMultiAlternatives(
+                subject=notificacion.asunto,
+                body=notificacion.mensaje,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[notificacion.destinatario],
+                connection=conexion,
+            )
+            if notificacion.mensaje_html:
+                email.attach_alternative(notificacion.mensaje_html, 'text/html')
+            try:
+                email.send()
+            except Exception as e:
+                _registrar_fallo(notificacion, e, max_intentos, ahora)
+                fallidas += 1
+                continue
+            notificacion.estado = 'enviada'
+            notificacion.intentos += 1
+            notificacion.fecha_envio = timezone.now()
+            notificacion.ultimo_error = ''
+            notificacion.save(update_fields=['estado', 'intentos', 'fecha_envio', 'ultimo_error'])
+            enviadas += 1
+    finally:
+        conexion.close()
+    return enviadas, fallidas
+
+
+def _registrar_fallo(notificacion, error, max_intentos, ahora):
+    notificacion.intentos += 1
+    notificacion.ultimo_error = str(error)[:1000]
+    if notificacion.intentos >= max_intentos:
+        notificacion.estado = 'fallida'
+    else:
+        notificacion.proximo_intento = ahora + espera_reintento(notificacion.intentos)
+    notificacion.save(update_fields=['estado', 'intentos', 'ultimo_error', 'proximo_intento'])
@@ -1,83 +1,55 @@
-import base64
-import os
+import hashlib
 
-from django.conf import settings
-from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile, File
+from django.db import transaction
 from django.http import FileResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.utils import timezone
 
-from ..models import Optimizacion, TableroOptimizacion
+from ..models import TableroOptimizacion
+from .artifacts import obtener_artefacto, obtener_artefactos, version_artefacto
+from .images import MAX_AGE_IMAGENES, archivo_tablero, resoluciones_imagen
 from ..exports.pdf import generar_pdf
-from ..packing import normalizar_info_desperdicio
+from ..packing import VERSION_MOTOR, normalizar_info_desperdicio, optimizar_corte
 from ..pieces import parsear_piezas_desde_texto
-from ..render import generar_grafico
+from ..profiling import medir_etapa
+from ..render import RESOLUCIONES_TABLERO, generar_grafico
+from ..storage import AlmacenamientoPorContenido, borrar_archivos
 from ..units import convertir_desde_cm, obtener_simbolo_area
 
 
-def _media_root():
-    return os.fspath(settings.MEDIA_ROOT)
-
-
-def _normalizar_ruta_absoluta(ruta):
-    """Convierte rutas relativas (p. ej. pdfs/archivo.pdf) en ruta absoluta bajo MEDIA_ROOT."""
-    if not ruta:
-        return None
-    ruta = os.fspath(ruta)
-    if os.path.isabs(ruta):
-        return ruta
-    ruta = ruta.replace('\\', '/').lstrip('/')
-    if ruta.startswith('pdfs/'):
-        return os.path.join(_media_root(), ruta.replace('/', os.sep))
-    return os.path.join(_media_root(), ruta.replace('/', os.sep))
-
-
-def _ruta_pdf_en_disco(optimizacion):
-    """Devuelve la ruta absoluta del PDF si el archivo existe, o None."""
-    candidatos = []
-
-    if optimizacion.pdf:
-        candidatos.append(optimizacion.pdf.name)
-        try:
-            candidatos.append(optimizacion.pdf.path)
-        except (ValueError, NotImplementedError):
-            pass
-
-    for candidato in candidatos:
-        ruta = _normalizar_ruta_absoluta(candidato)
-        if ruta and os.path.isfile(ruta):
-            return ruta
-
-    return None
-
-
-def _guardar_pdf_en_modelo(optimizacion, pdf_filepath):
-    pdf_filepath = _normalizar_ruta_absoluta(pdf_filepath)
-    if not pdf_filepath or not os.path.isfile(pdf_filepath):
-        return None
-    if optimizacion.pdf:
-        optimizacion.pdf.delete(save=False)
-    storage_name = f"opt_{optimizacion.pk}.pdf"
-    with open(pdf_filepath, 'rb') as pdf_file:
-        optimizacion.pdf.save(
-            storage_name,
-            ContentFile(pdf_file.read()),
-            save=True,
-        )
-    return pdf_filepath
+def _pdf_persistido(optimizacion):
+    """Indica si el PDF de la optimización existe en el storage."""
+    pdf = optimizacion.pdf
+    if not pdf:
+        return False
+    try:
+        return pdf.storage.exists(pdf.name)
+    except (SuspiciousFileOperation, OSError):
+        return False
 
 
-def _generar_y_guardar_pdf(optimizacion, imagenes_base64, info_desperdicio, numero_lista=None):
+def _generar_y_guardar_pdf(optimizacion, imagenes, info_desperdicio, numero_lista=None):
+    """Genera el PDF en memoria y lo guarda directamente en el storage (sin archivos temporales)."""
     lista = numero_lista if numero_lista is not None else optimizacion.pk
-    pdf_filepath = generar_pdf(
+    pdf_buffer = generar_pdf(
         optimizacion,
-        imagenes_base64,
+        imagenes,
         numero_lista=lista,
         info_desperdicio=info_desperdicio,
     )
-    pdf_filepath = _normalizar_ruta_absoluta(pdf_filepath)
-    if pdf_filepath and os.path.isfile(pdf_filepath):
-        _guardar_pdf_en_modelo(optimizacion, pdf_filepath)
-    return pdf_filepath
+    if pdf_buffer is None:
+        return None
+    anterior = optimizacion.pdf.name if optimizacion.pdf else None
+    optimizacion.pdf.save(f"opt_{optimizacion.pk}.pdf", File(pdf_buffer), save=True)
+    # El anterior se borra después de guardar: puede compartirlo otra fila (mismo contenido)
+    if anterior and anterior != optimizacion.pdf.name:
+        borrar_archivos([(optimizacion.pdf.storage, anterior)])
+    return optimizacion.pdf
 
 
 def _numero_descarga(numero_lista, optimizacion):
@@ -101,59 +73,22 @@ def nombre_descarga_excel(numero_lista, optimizacion):
     return f"optimizacion_{_numero_descarga(numero_lista, optimizacion)}.xlsx"
 
 
-def calcular_numero_lista(usuario, optimizacion_id, ordenar_por='fecha_desc'):
-    """Calcula el número de visualización en el historial."""
-    queryset = Optimizacion.objects.filter(usuario=usuario)
-
-    if ordenar_por == 'fecha_desc':
-        queryset = queryset.order_by('-fecha')
-    elif ordenar_por == 'fecha_asc':
-        queryset = queryset.order_by('fecha')
-    elif ordenar_por == 'aprovechamiento_desc':
-        queryset = queryset.order_by('-aprovechamiento_total')
-    elif ordenar_por == 'aprovechamiento_asc':
-        queryset = queryset.order_by('aprovechamiento_total')
-    else:
-        queryset = queryset.order_by('-fecha')
-
-    total = queryset.count()
-    es_descendente = ordenar_por in ('fecha_desc', 'aprovechamiento_desc')
-
-    for idx, opt in enumerate(queryset, start=1):
-        if opt.id == optimizacion_id:
-            if es_descendente:
-                return total - idx + 1
-            return idx
-
-    return optimizacion_id
-
-
-def _imagen_a_base64(file_field):
-    if not file_field:
+def _cargar_tableros_persistidos(optimizacion):
+    """Tableros guardados (sin leer los PNG); devuelve None si falta algún archivo en disco."""
+    tableros = list(optimizacion.tableros.order_by('numero'))
+    if not tableros:
         return None
-    try:
-        with file_field.open('rb') as archivo:
-            return base64.b64encode(archivo.read()).decode('ascii')
-    except (FileNotFoundError, OSError, ValueError):
-        return None
-
-
-def _cargar_imagenes_persistidas(optimizacion):
-    """Carga imágenes guardadas; devuelve None si falta algún archivo en disco."""
-    if not optimizacion.tableros.exists():
-        return None
-    imagenes = []
-    for tablero in optimizacion.tableros.order_by('numero'):
-        imagen = _imagen_a_base64(tablero.imagen)
-        if not imagen:
+    for tablero in tableros:
+        if not tablero.imagen or not tablero.imagen.storage.exists(tablero.imagen.name):
             return None
-        imagenes.append(imagen)
-    return imagenes
+    return tableros
 
 
-def _info_desperdicio_desde_modelo(optimizacion):
+def _info_desperdicio_desde_modelo(optimizacion, tableros=None):
+    if tableros is None:
+        tableros = optimizacion.tableros.order_by('numero')
     info_tableros = []
-    for tablero in optimizacion.tableros.order_by('numero'):
+    for tablero in tableros:
         info_tableros.append({
             'numero': tablero.numero,
             'area_usada': tablero.area_usada,
@@ -190,88 +125,230 @@ def _regenerar_grafico(optimizacion):
         permitir_rotacion=rotacion,
         margen_corte=margen,
         nombres_piezas=nombres or None,
+        resoluciones=RESOLUCIONES_TABLERO,
     )
 
 
-def persistir_resultado_optimizacion(optimizacion, imagenes_base64, info_desperdicio, aprovechamiento, numero_lista=None):
-    """Guarda tableros, estadísticas y PDF tras generar_grafico."""
+# La disposición solo depende de piezas, tablero, margen y rotación: se cachea por contenido
+TIMEOUT_DISPOSICION = 60 * 60 * 24
+
+
+def _calcular_disposicion(optimizacion):
+    """Corre solo el motor de corte (sin dibujar) y cachea el resultado por contenido."""
+    piezas_guardadas = list(optimizacion.piezas_detalle.all())
+    piezas = [(p.ancho_cm, p.alto_cm, p.cantidad) for p in piezas_guardadas]
+    margen = getattr(optimizacion, 'margen_corte', 0.3) or 0.3
+    rotacion = getattr(optimizacion, 'permitir_rotacion', True)
+    contenido = repr((VERSION_MOTOR, piezas, optimizacion.ancho_tablero, optimizacion.alto_tablero, margen, rotacion))
+    clave = f"cutless:disposicion:{hashlib.sha256(contenido.encode()).hexdigest()}"
+
+    resultado = cache.get(clave)
+    if resultado is None:
+        if piezas:
+            _, aprovechamiento, info = optimizar_corte(
+                piezas,
+                optimizacion.ancho_tablero,
+                optimizacion.alto_tablero,
+                permitir_rotacion=rotacion,
+                margen_corte=margen,
+                nombres_piezas=[p.nombre for p in piezas_guardadas],
+            )
+        else:
+            aprovechamiento, info = 0, normalizar_info_desperdicio({})
+        resultado = (aprovechamiento, info)
+        cache.set(clave, resultado, timeout=TIMEOUT_DISPOSICION)
+    return resultado
+
+
+def resumen_disposicion(optimizacion):
+    """
+    Devuelve (aprovechamiento, info_desperdicio en cm²) sin generar imágenes.
+    Usa los tableros guardados si existen; para registros legacy corre solo el motor de corte.
+    Conviene prefetch de ``tableros`` y ``piezas_detalle`` al procesar varias optimizaciones.
+    """
+    if optimizacion.resultado_generado:
+        tableros = list(optimizacion.tableros.all())
+        if tableros:
+            return optimizacion.aprovechamiento_total, _info_desperdicio_desde_modelo(optimizacion, tableros)
+    return _calcular_disposicion(optimizacion)
+
+
+def _guardar_archivo(campo, nombre, contenido, nuevos):
+    """
+    Escribe el archivo del campo sin guardar el modelo. En ``nuevos`` solo se anotan los
+    que escribió esta llamada: un archivo reutilizado puede ser de otro trabajo en curso.
+    """
+    storage = campo.storage
+    if not isinstance(storage, AlmacenamientoPorContenido):
+        campo.save(nombre, contenido, save=False)
+        nuevos.append((storage, campo.name))
+        return
+    nombre, creado = storage.guardar(campo.field.generate_filename(campo.instance, nombre), contenido)
+    setattr(campo.instance, campo.field.attname, nombre)
+    if creado:
+        nuevos.append((storage, nombre))
+
+
+def _archivos_resultado(optimizacion):
+    """Archivos del resultado persistido actual (vista previa, PDF e imágenes de tableros)."""
+    archivos = [
+        (campo.storage, campo.name)
+        for campo in (optimizacion.imagen, optimizacion.imagen_miniatura, optimizacion.pdf)
+        if campo
+    ]
+    storage = TableroOptimizacion._meta.get_field('imagen').storage
+    for nombres in optimizacion.tableros.values_list('imagen', 'imagen_miniatura', 'imagen_impresion'):
+        archivos.extend((storage, nombre) for nombre in nombres if nombre)
+    return archivos
+
+
+@medir_etapa('persistir_resultado')
+def persistir_resultado_optimizacion(optimizacion, imagenes_png, info_desperdicio, aprovechamiento, numero_lista=None):
+    """
+    Guarda tableros, estadísticas y PDF tras generar_grafico.
+    Cada imagen es un dict {resolución: bytes PNG} (ver RESOLUCIONES_TABLERO) o bytes de la resolución media.
+
+    Primero escribe todos los archivos; después, en una sola transacción, reemplaza las
+    filas de tableros (un bulk_create) y actualiza la optimización. Si algo falla el
+    resultado anterior queda intacto y se descartan los archivos nuevos; los del resultado
+    anterior se descartan al confirmar la transacción. En el almacenamiento por contenido
+    descartar no borra lo usado en la última hora: eso lo recoge ``limpiar_media``.
+    """
     info_desperdicio = normalizar_info_desperdicio(
         info_desperdicio,
         area_usada_total=getattr(optimizacion, 'area_usada_total', None),
         desperdicio_total=getattr(optimizacion, 'desperdicio_total', None),
     )
-    optimizacion.tableros.all().delete()
-
-    info_tableros = info_desperdicio.get('info_tableros') or []
-    for indice, imagen_b64 in enumerate(imagenes_base64):
-        info = info_tableros[indice] if indice < len(info_tableros) else {}
-        numero = info.get('numero', indice + 1)
-        tablero = TableroOptimizacion(
-            optimizacion=optimizacion,
-            numero=numero,
-            area_usada=info.get('area_usada', 0),
-            desperdicio=info.get('desperdicio', 0),
-            porcentaje_uso=info.get('porcentaje_uso', 0),
-            num_piezas=info.get('num_piezas', 0),
-        )
-        nombre = f"opt_{optimizacion.pk}_tablero_{numero}.png"
-        tablero.imagen.save(
-            nombre,
-            ContentFile(base64.b64decode(imagen_b64)),
-            save=True,
-        )
+    anteriores = _archivos_resultado(optimizacion)
+    nuevos = []
 
-    if imagenes_base64:
-        nombre_preview = f"opt_{optimizacion.pk}_preview.png"
-        optimizacion.imagen.save(
-            nombre_preview,
-            ContentFile(base64.b64decode(imagenes_base64[0])),
-            save=False,
-        )
+    try:
+        info_tableros = info_desperdicio.get('info_tableros') or []
+        resoluciones = [resoluciones_imagen(imagen) for imagen in imagenes_png]
+        tableros = []
+        for indice, imagen in enumerate(resoluciones):
+            info = info_tableros[indice] if indice < len(info_tableros) else {}
+            numero = info.get('numero', indice + 1)
+            tablero = TableroOptimizacion(
+                optimizacion=optimizacion,
+                numero=numero,
+                area_usada=info.get('area_usada', 0),
+                desperdicio=info.get('desperdicio', 0),
+                porcentaje_uso=info.get('porcentaje_uso', 0),
+                num_piezas=info.get('num_piezas', 0),
+            )
+            nombre = f"opt_{optimizacion.pk}_tablero_{numero}.png"
+            _guardar_archivo(tablero.imagen, nombre, ContentFile(imagen['media']), nuevos)
+            if imagen.get('miniatura'):
+                _guardar_archivo(tablero.imagen_miniatura, nombre, ContentFile(imagen['miniatura']), nuevos)
+            if imagen.get('impresion'):
+                _guardar_archivo(tablero.imagen_impresion, nombre, ContentFile(imagen['impresion']), nuevos)
+            tableros.append(tablero)
+
+        if resoluciones:
+            nombre_preview = f"opt_{optimizacion.pk}_preview.png"
+            _guardar_archivo(optimizacion.imagen, nombre_preview, ContentFile(resoluciones[0]['media']), nuevos)
+            if resoluciones[0].get('miniatura'):
+                _guardar_archivo(
+                    optimizacion.imagen_miniatura,
+                    nombre_preview,
+                    ContentFile(resoluciones[0]['miniatura']),
+                    nuevos,
+                )
+
+        optimizacion.aprovechamiento_total = aprovechamiento
+        optimizacion.area_usada_total = info_desperdicio.get('area_usada_total', 0)
+        optimizacion.desperdicio_total = info_desperdicio.get('desperdicio_total', 0)
+        optimizacion.num_tableros = len(imagenes_png)
+        optimizacion.resultado_generado = True
+        optimizacion.resultado_generado_en = timezone.now()
+        optimizacion.resultado_extra = {
+            'piezas_no_colocadas': info_desperdicio.get('piezas_no_colocadas', []),
+            'num_piezas_solicitadas': info_desperdicio.get('num_piezas_solicitadas', 0),
+            'num_piezas_colocadas': info_desperdicio.get('num_piezas_colocadas', 0),
+        }
 
-    optimizacion.aprovechamiento_total = aprovechamiento
-    optimizacion.area_usada_total = info_desperdicio.get('area_usada_total', 0)
-    optimizacion.desperdicio_total = info_desperdicio.get('desperdicio_total', 0)
-    optimizacion.num_tableros = len(imagenes_base64)
-    optimizacion.resultado_generado = True
-    optimizacion.resultado_generado_en = timezone.now()
-    optimizacion.resultado_extra = {
-        'piezas_no_colocadas': info_desperdicio.get('piezas_no_colocadas', []),
-        'num_piezas_solicitadas': info_desperdicio.get('num_piezas_solicitadas', 0),
-        'num_piezas_colocadas': info_desperdicio.get('num_piezas_colocadas', 0),
+        lista = numero_lista if numero_lista is not None else optimizacion.pk
+        pdf_buffer = generar_pdf(
+            optimizacion,
+            [imagen.get('impresion') or imagen['media'] for imagen in resoluciones],
+            numero_lista=lista,
+            info_desperdicio=info_desperdicio,
+        )
+        if pdf_buffer is not None:
+            _guardar_archivo(optimizacion.pdf, f"opt_{optimizacion.pk}.pdf", File(pdf_buffer), nuevos)
+
+        with transaction.atomic():
+            optimizacion.tableros.all().delete()
+            TableroOptimizacion.objects.bulk_create(tableros)
+            optimizacion.save()
+    except BaseException:
+        borrar_archivos(nuevos)
+        raise
+
+    # Un archivo anterior que el resultado nuevo reutiliza no se borra
+    escritos = {
+        archivo.name
+        for archivo in (
+            optimizacion.imagen, optimizacion.imagen_miniatura, optimizacion.pdf,
+            *(campo for t in tableros for campo in (t.imagen, t.imagen_miniatura, t.imagen_impresion)),
+        )
+        if archivo
     }
-
-    lista = numero_lista if numero_lista is not None else optimizacion.pk
-    _generar_y_guardar_pdf(optimizacion, imagenes_base64, info_desperdicio, numero_lista=lista)
-
-    optimizacion.save()
+    obsoletos = [(storage, nombre) for storage, nombre in anteriores if nombre not in escritos]
+    transaction.on_commit(lambda: borrar_archivos(obsoletos))
     return optimizacion
 
 
 def obtener_resultado_optimizacion(optimizacion, numero_lista=None, persistir_si_falta=True):
     """
-    Devuelve (imagenes_base64, aprovechamiento, info_desperdicio en cm²).
+    Devuelve (tableros, aprovechamiento, info_desperdicio en cm²).
+    ``tableros`` son las filas TableroOptimizacion persistidas (imagen accesible por URL).
     Usa datos persistidos o regenera (y opcionalmente persiste) para registros legacy.
     """
-    if optimizacion.resultado_generado and optimizacion.tableros.exists():
-        imagenes = _cargar_imagenes_persistidas(optimizacion)
-        if imagenes is not None:
-            info = _info_desperdicio_desde_modelo(optimizacion)
-            if persistir_si_falta and not _ruta_pdf_en_disco(optimizacion) and imagenes:
-                _generar_y_guardar_pdf(optimizacion, imagenes, info, numero_lista=numero_lista)
-            return imagenes, optimizacion.aprovechamiento_total, info
+    if optimizacion.resultado_generado:
+        tableros = _cargar_tableros_persistidos(optimizacion)
+        if tableros is not None:
+            info = _info_desperdicio_desde_modelo(optimizacion, tableros)
+            if persistir_si_falta and not _pdf_persistido(optimizacion):
+                _generar_y_guardar_pdf(
+                    optimizacion,
+                    [archivo_tablero(tablero, 'impresion') for tablero in tableros],
+                    info,
+                    numero_lista=numero_lista,
+                )
+            return tableros, optimizacion.aprovechamiento_total, info
 
     imagenes, aprovechamiento, info = _regenerar_grafico(optimizacion)
     info = normalizar_info_desperdicio(info)
-    if persistir_si_falta and imagenes:
-        persistir_resultado_optimizacion(
-            optimizacion,
-            imagenes,
-            info,
-            aprovechamiento,
-            numero_lista=numero_lista,
-        )
-    return imagenes, aprovechamiento, info
+    if not (persistir_si_falta and imagenes):
+        return [], aprovechamiento, info
+    persistir_resultado_optimizacion(
+        optimizacion,
+        imagenes,
+        info,
+        aprovechamiento,
+        numero_lista=numero_lista,
+    )
+    return list(optimizacion.tableros.order_by('numero')), aprovechamiento, info
+
+
+def asegurar_resultado_optimizacion(optimizacion, numero_lista=None):
+    """
+    Completa el resultado persistido (registros legacy o sin PDF guardado) antes de
+    calcular la versión de sus archivos, para que esta no cambie justo después de generarlos.
+    """
+    if not optimizacion.resultado_generado or not _pdf_persistido(optimizacion):
+        obtener_resultado_optimizacion(optimizacion, numero_lista=numero_lista, persistir_si_falta=True)
+
+
+def renderizar_resultado_optimizacion(optimizacion):
+    """
+    Calcula y dibuja el resultado sin tocar la base de datos: (imagenes, aprovechamiento,
+    info_desperdicio). Para persistirlo, ``persistir_resultado_optimizacion``.
+    """
+    imagenes, aprovechamiento, info = _regenerar_grafico(optimizacion)
+    return imagenes, aprovechamiento, normalizar_info_desperdicio(info)
 
 
 def convertir_info_desperdicio_unidad(info_desperdicio, unidad, optimizacion=None):
@@ -297,8 +374,11 @@ def convertir_info_desperdicio_unidad(info_desperdicio, unidad, optimizacion=Non
     }
 
 
-def preparar_contexto_resultado(optimizacion, imagenes_base64, info_desperdicio, piezas_parseadas=None):
-    """Construye el contexto de visualización para resultado.html."""
+def preparar_contexto_resultado(optimizacion, imagenes, info_desperdicio, piezas_parseadas=None, miniaturas=None):
+    """
+    Construye el contexto de visualización para resultado.html.
+    ``imagenes`` y ``miniaturas`` son las URLs de los tableros (ver urls_tableros).
+    """
     unidad = getattr(optimizacion, 'unidad_medida', 'cm') or 'cm'
     simbolo_area = obtener_simbolo_area(unidad)
 
@@ -321,14 +401,16 @@ def preparar_contexto_resultado(optimizacion, imagenes_base64, info_desperdicio,
     info_tableros_convertida = info_desperdicio_mostrar['info_tableros']
 
     tableros_con_imagenes = []
-    for imagen, info in zip(imagenes_base64, info_tableros_convertida):
+    miniaturas = miniaturas or imagenes
+    for imagen, miniatura, info in zip(imagenes, miniaturas, info_tableros_convertida):
         tableros_con_imagenes.append({
             'numero': info['numero'],
             'imagen': imagen,
+            'miniatura': miniatura,
             'info': info,
         })
 
-    num_tableros = len(imagenes_base64)
+    num_tableros = len(imagenes)
     precio_tablero = optimizacion.precio_tablero
     mano_obra = optimizacion.mano_obra or 0
     costo_material = None
@@ -338,8 +420,8 @@ def preparar_contexto_resultado(optimizacion, imagenes_base64, info_desperdicio,
 
     return {
         'optimizacion': optimizacion,
-        'imagen': imagenes_base64[0] if imagenes_base64 else None,
-        'imagenes': imagenes_base64,
+        'imagen': imagenes[0] if imagenes else None,
+        'imagenes': imagenes,
         'num_tableros': num_tableros,
         'piezas_con_nombre': piezas_con_nombre,
         'info_desperdicio': info_desperdicio_mostrar,
@@ -355,44 +437,110 @@ def preparar_contexto_resultado(optimizacion, imagenes_base64, info_desperdicio,
 
 def pdf_path_para_template(optimizacion):
     """Ruta relativa al MEDIA_ROOT para enlaces /media/..."""
-    if _ruta_pdf_en_disco(optimizacion):
-        return optimizacion.pdf.name if optimizacion.pdf else None
+    if _pdf_persistido(optimizacion):
+        return optimizacion.pdf.name
     return None
 
 
 def respuesta_pdf_optimizacion(optimizacion, numero_lista=None):
-    """Devuelve FileResponse del PDF persistido o lo regenera si falta."""
+    """
+    Devuelve FileResponse del PDF persistido de la optimización (se genera y guarda si
+    falta). Solo si no se pudo persistir se genera en la caché de artefactos.
+    """
     nombre_descarga = nombre_descarga_pdf(numero_lista, optimizacion)
-    ruta = _ruta_pdf_en_disco(optimizacion)
-    if ruta:
+    asegurar_resultado_optimizacion(optimizacion, numero_lista=numero_lista)
+    if _pdf_persistido(optimizacion):
         return FileResponse(
-            open(ruta, 'rb'),
+            optimizacion.pdf.open('rb'),
             as_attachment=True,
             filename=nombre_descarga,
+            content_type='application/pdf',
         )
 
-    imagenes, _, info = obtener_resultado_optimizacion(
-        optimizacion,
-        numero_lista=numero_lista,
-        persistir_si_falta=True,
-    )
-
-    optimizacion.refresh_from_db()
-    ruta = _ruta_pdf_en_disco(optimizacion)
-    if not ruta:
-        ruta = _generar_y_guardar_pdf(optimizacion, imagenes, info, numero_lista=numero_lista)
-
-    ruta = _normalizar_ruta_absoluta(ruta)
-    if not ruta or not os.path.isfile(ruta):
-        raise FileNotFoundError(f'No se pudo generar el PDF de la optimización #{optimizacion.pk}')
+    lista = numero_lista if numero_lista is not None else optimizacion.pk
 
+    def generar(destino):
+        tableros, _, info = obtener_resultado_optimizacion(
+            optimizacion,
+            numero_lista=numero_lista,
+            persistir_si_falta=True,
+        )
+        if generar_pdf(
+            optimizacion,
+            [archivo_tablero(tablero, 'impresion') for tablero in tableros],
+            numero_lista=lista,
+            info_desperdicio=info,
+            destino=destino,
+        ) is None:
+            raise FileNotFoundError(f'No se pudo generar el PDF de la optimización #{optimizacion.pk}')
+
+    # El PDF imprime el número de lista: va en la versión, como en el Excel
+    ruta = obtener_artefacto(optimizacion, 'pdf', 'pdf', generar, lista)
     return FileResponse(
         open(ruta, 'rb'),
         as_attachment=True,
         filename=nombre_descarga,
+        content_type='application/pdf',
+    )
+
+
+def _dibujar_plan_corte(optimizacion):
+    """PNG en resolución de impresión del plan de corte (blanco y negro, solo medidas)."""
+    piezas = list(optimizacion.piezas_detalle.all())
+    imagenes, _, _ = generar_grafico(
+        [(p.ancho_cm, p.alto_cm, p.cantidad) for p in piezas],
+        optimizacion.ancho_tablero,
+        optimizacion.alto_tablero,
+        'cm',
+        permitir_rotacion=getattr(optimizacion, 'permitir_rotacion', True),
+        margen_corte=getattr(optimizacion, 'margen_corte', 0.3) or 0.3,
+        nombres_piezas=[p.nombre for p in piezas] or None,
+        modo_plan_corte=True,
+        resoluciones={'impresion': RESOLUCIONES_TABLERO['impresion']},
+    )
+    return [imagen['impresion'] for imagen in imagenes]
+
+
+def imagenes_plan_corte(optimizacion, num_tableros):
+    """
+    Rutas de las imágenes del plan de corte (una por tablero) en la caché de artefactos:
+    se dibujan todas juntas la primera vez y luego solo se leen hasta que la optimización
+    cambia.
+    """
+    return obtener_artefactos(
+        optimizacion, 'plan', 'png', num_tableros, lambda: _dibujar_plan_corte(optimizacion),
     )
 
 
+def urls_plan_corte(optimizacion, num_tableros):
+    """
+    URLs de las imágenes del plan de corte. Llevan la versión: al cambiar la optimización
+    cambian y el navegador no reutiliza una imagen antigua.
+    """
+    version = version_artefacto(optimizacion, 'plan')
+    return [
+        f"{reverse('cutless:plan_corte_tablero', args=[optimizacion.pk, numero])}?v={version}"
+        for numero in range(1, num_tableros + 1)
+    ]
+
+
+def respuesta_imagen_plan_corte(request, optimizacion, numero):
+    """
+    Sirve la imagen del plan de corte del tablero ``numero`` con ETag (por versión y
+    tablero); responde 304 a los GET condicionales. Devuelve None si el tablero no existe.
+    """
+    etag = quote_etag(f"plan-{optimizacion.pk}-{version_artefacto(optimizacion, 'plan')}-{numero}")
+    respuesta = get_conditional_response(request, etag=etag)
+    if respuesta is None:
+        rutas = imagenes_plan_corte(optimizacion, optimizacion.num_tableros or 0)
+        if not 1 <= numero <= len(rutas):
+            return None
+        respuesta = FileResponse(open(rutas[numero - 1], 'rb'), content_type='image/png')
+    respuesta.headers['ETag'] = etag
+    patch_cache_control(respuesta, private=True, max_age=MAX_AGE_IMAGENES)
+    return respuesta
+
+
 def respuesta_png_tablero(optimizacion, tablero_num, numero_lista=None):
     """Devuelve FileResponse del PNG persistido de un tablero."""
     nombre_descarga = nombre_descarga_png_tablero(numero_lista, optimizacion, tablero_num)
@@ -404,26 +552,16 @@ def respuesta_png_tablero(optimizacion, tablero_num, numero_lista=None):
             filename=nombre_descarga,
         )
 
-    imagenes, _, _ = obtener_resultado_optimizacion(
+    tableros, _, _ = obtener_resultado_optimizacion(
         optimizacion,
         numero_lista=numero_lista,
         persistir_si_falta=True,
     )
-    tablero = optimizacion.tableros.filter(numero=tablero_num).first()
+    tablero = next((t for t in tableros if t.numero == tablero_num), None)
     if tablero and tablero.imagen:
         return FileResponse(
             tablero.imagen.open('rb'),
             as_attachment=True,
             filename=nombre_descarga,
         )
-
-    if tablero_num < 1 or tablero_num > len(imagenes):
-        return None
-
-    from django.core.files.base import ContentFile
-    image_data = base64.b64decode(imagenes[tablero_num - 1])
-    return FileResponse(
-        ContentFile(image_data),
-        as_attachment=True,
-        filename=nombre_descarga,
-    )
+    return None
@@ -0,0 +1,64 @@
+/**
+ * Gráfico de evolución de costos dibujado en el navegador — CutLess.
+ * Requiere Chart.js 4. La serie se pide al endpoint JSON indicado en data-url del
+ * lienzo #graficoCostos.
+ */
+(function () {
+    'use strict';
+
+    var COLOR = '#0d6efd';
+
+    function dibujar(canvas, serie) {
+        return new Chart(canvas, {
+            type: 'line',
+            data: {
+                labels: serie.puntos.map(function (p) { return p.etiqueta; }),
+                datasets: [
+                    {
+                        label: 'Costo total ($)',
+                        data: serie.puntos.map(function (p) { return p.costo; }),
+                        borderColor: COLOR,
+                        backgroundColor: COLOR,
+                        pointRadius: serie.puntos.length > 40 ? 0 : 3,
+                        tension: 0.2
+                    }
+                ]
+            },
+            options: {
+                responsive: true,
+                animation: false,
+                scales: {
+                    y: { beginAtZero: true, title: { display: true, text: 'Costo total ($)' } }
+                },
+                plugins: {
+                    legend: { position: 'bottom' }
+                }
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var canvas = document.getElementById('graficoCostos');
+        if (!canvas || typeof Chart === 'undefined') {
+            return;
+        }
+        fetch(canvas.dataset.url, {
+            credentials: 'same-origin',
+            headers: { 'Accept': 'application/json' }
+        }).then(function (respuesta) {
+            if (!respuesta.ok) {
+                throw new Error('No se pudo cargar la serie de costos');
+            }
+            return respuesta.json();
+        }).then(function (serie) {
+            if (serie.puntos.length) {
+                dibujar(canvas, serie);
+            }
+        }).catch(function () {
+            canvas.replaceWith(Object.assign(document.createElement('p'), {
+                className: 'text-muted',
+                textContent: 'No se pudo cargar el gráfico'
+            }));
+        });
+    });
+})();
@@ -0,0 +1,133 @@
+/**
+ * Gráficos de estadísticas dibujados en el navegador — CutLess.
+ * Requiere Chart.js 4. La serie se pide una vez al endpoint JSON (data-url del contenedor
+ * #graficosEstadisticas) y se reutiliza para las miniaturas y la vista en pantalla completa.
+ */
+(function () {
+    'use strict';
+
+    var ESTILOS = {
+        aprovechamiento: {
+            etiqueta: 'Aprovechamiento (%)',
+            color: '#4CAF50',
+            colorPromedio: '#FF5722',
+            promedio: 'promedio_aprovechamiento'
+        },
+        desperdicio: {
+            etiqueta: 'Desperdicio (%)',
+            color: '#F44336',
+            colorPromedio: '#2196F3',
+            promedio: 'promedio_desperdicio'
+        }
+    };
+
+    var seriePromesa = null;
+
+    function cargarSerie() {
+        if (seriePromesa) {
+            return seriePromesa;
+        }
+        var contenedor = document.getElementById('graficosEstadisticas');
+        if (!contenedor) {
+            return Promise.resolve(null);
+        }
+        seriePromesa = fetch(contenedor.dataset.url, {
+            credentials: 'same-origin',
+            headers: { 'Accept': 'application/json' }
+        }).then(function (respuesta) {
+            if (!respuesta.ok) {
+                throw new Error('No se pudieron cargar las estadísticas');
+            }
+            return respuesta.json();
+        });
+        return seriePromesa;
+    }
+
+    function dibujar(canvas, serie, tipo, opciones) {
+        opciones = opciones || {};
+        var estilo = ESTILOS[tipo];
+        var etiquetas = serie.puntos.map(function (p) { return p.etiqueta; });
+        var valores = serie.puntos.map(function (p) { return p[tipo]; });
+        var minimos = serie.puntos.map(function (p) { return p[tipo + '_min']; });
+        var maximos = serie.puntos.map(function (p) { return p[tipo + '_max']; });
+        var promedio = serie[estilo.promedio];
+
+        return new Chart(canvas, {
+            type: 'line',
+            data: {
+                labels: etiquetas,
+                datasets: [
+                    {
+                        label: estilo.etiqueta,
+                        data: valores,
+                        borderColor: estilo.color,
+                        backgroundColor: estilo.color,
+                        pointRadius: serie.puntos.length > 40 ? 0 : 3,
+                        tension: 0.2
+                    },
+                    {
+                        // Banda mínimo-máximo del intervalo (rellena hasta la serie de mínimos)
+                        label: 'Mínimo - máximo',
+                        data: maximos,
+                        borderWidth: 0,
+                        pointRadius: 0,
+                        backgroundColor: estilo.color + '33',
+                        fill: '+1'
+                    },
+                    {
+                        label: 'Mínimo',
+                        data: minimos,
+                        borderWidth: 0,
+                        pointRadius: 0,
+                        fill: false
+                    },
+                    {
+                        label: 'Promedio: ' + promedio.toFixed(1) + '%',
+                        data: valores.map(function () { return promedio; }),
+                        borderColor: estilo.colorPromedio,
+                        borderDash: [6, 4],
+                        pointRadius: 0
+                    }
+                ]
+            },
+            options: {
+                responsive: opciones.responsive !== false,
+                animation: false,
+                scales: {
+                    y: { min: 0, max: 100, title: { display: true, text: estilo.etiqueta } }
+                },
+                plugins: {
+                    legend: {
+                        position: 'bottom',
+                        labels: {
+                            filter: function (item) { return item.text !== 'Mínimo'; }
+                        }
+                    }
+                }
+            }
+        });
+    }
+
+    window.cutlessDibujarGraficoEstadisticas = function (canvas, tipo, opciones) {
+        return cargarSerie().then(function (serie) {
+            if (!serie || !serie.puntos.length) {
+                return null;
+            }
+            return dibujar(canvas, serie, tipo, opciones);
+        });
+    };
+
+    document.addEventListener('DOMContentLoaded', function () {
+        if (typeof Chart === 'undefined') {
+            return;
+        }
+        document.querySelectorAll('canvas[data-grafico]').forEach(function (canvas) {
+            window.cutlessDibujarGraficoEstadisticas(canvas, canvas.dataset.grafico).catch(function () {
+                canvas.replaceWith(Object.assign(document.createElement('p'), {
+                    className: 'text-muted',
+                    textContent: 'No se pudo cargar el gráfico'
+                }));
+            });
+        });
+    });
+})();
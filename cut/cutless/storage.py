@@ -0,0 +1,139 @@
+"""
+Almacenamiento de archivos por contenido para los resultados de optimización.
+
+Cada archivo se guarda con el hash SHA-256 de sus bytes como nombre
+(``contenido/ab/abcd….png``): guardar dos veces los mismos bytes (trabajos duplicados,
+plantillas, la vista previa que repite el primer tablero) no ocupa espacio extra.
+Como un mismo archivo puede estar referenciado por varias filas, borrar solo lo elimina
+del disco cuando ningún campo lo referencia y no se usó en la última hora (un trabajo
+que lo reutilizó puede no haber confirmado aún su fila); lo que quede suelto lo recoge
+el comando ``limpiar_media``.
+"""
+import hashlib
+import os
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+
+DIRECTORIO_CONTENIDO = 'contenido'
+
+# Antigüedad mínima (segundos desde la última escritura o reutilización) para borrar un
+# archivo sin referencias; también es el valor por defecto de limpiar_media --edad-minima
+EDAD_MINIMA_BORRADO = 3600
+
+
+class AlmacenamientoPorContenido(FileSystemStorage):
+    """FileSystemStorage que nombra los archivos por su hash y deduplica."""
+
+    def nombre_por_contenido(self, name, content):
+        digest = hashlib.sha256()
+        for bloque in content.chunks():
+            digest.update(bloque)
+        content.seek(0)
+        huella = digest.hexdigest()
+        extension = os.path.splitext(name or '')[1].lower()
+        return f"{DIRECTORIO_CONTENIDO}/{huella[:2]}/{huella}{extension}"
+
+    def save(self, name, content, max_length=None):
+        return self.guardar(name, content, max_length=max_length)[0]
+
+    def guardar(self, name, content, max_length=None):
+        """Como ``save``, pero indica además si escribió el archivo (False si ya existía)."""
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        nombre = self.nombre_por_contenido(name, content)
+        if self.exists(nombre):
+            try:
+                # Los mismos bytes ya están guardados: se reutiliza el archivo. Se renueva
+                # su fecha para que limpiar_media no lo tome por abandonado
+                os.utime(self.path(nombre))
+                return nombre, False
+            except FileNotFoundError:
+                pass  # se acaba de borrar: se vuelve a escribir
+        return super().save(nombre, content, max_length=max_length), True
+
+    def delete(self, name):
+        self.borrar_sin_referencias([name])
+
+    def borrar_sin_referencias(self, nombres):
+        """Borra del disco los archivos de ``nombres`` que ya no referencia ninguna fila."""
+        nombres = [nombre for nombre in set(nombres) if nombre]
+        if not nombres:
+            return
+        en_uso = referencias(nombres)
+        limite = time.time() - EDAD_MINIMA_BORRADO
+        for nombre in nombres:
+            if en_uso[nombre]:
+                continue
+            try:
+                # guardar renueva la fecha al reutilizar: si es reciente, otro trabajo puede
+                # estar por confirmar una fila que lo referencia
+                if os.stat(self.path(nombre)).st_mtime > limite:
+                    continue
+            except FileNotFoundError:
+                continue
+            super().delete(nombre)
+
+
+_almacenamiento = AlmacenamientoPorContenido()
+
+
+def almacenamiento_por_contenido():
+    """Storage de los campos de resultados (callable: no fija la ruta en las migraciones)."""
+    return _almacenamiento
+
+
+def campos_archivo(solo_por_contenido=False):
+    """(modelo, campo) de todos los FileField / ImageField del proyecto."""
+    return [
+        (modelo, campo)
+        for modelo in apps.get_models()
+        for campo in modelo._meta.concrete_fields
+        if isinstance(campo, models.FileField)
+        and (not solo_por_contenido or isinstance(campo.storage, AlmacenamientoPorContenido))
+    ]
+
+
+# Nombres por consulta IN (lejos del límite de parámetros de SQLite)
+TAM_LOTE_REFERENCIAS = 500
+
+
+def referencias(nombres, solo_por_contenido=True):
+    """Cuántas filas referencian cada nombre (Counter), una consulta por campo y lote."""
+    nombres = list(nombres)
+    contador = Counter()
+    for modelo, campo in campos_archivo(solo_por_contenido=solo_por_contenido):
+        for inicio in range(0, len(nombres), TAM_LOTE_REFERENCIAS):
+            filas = (
+                modelo._base_manager
+                .filter(**{f'{campo.attname}__in': nombres[inicio:inicio + TAM_LOTE_REFERENCIAS]})
+                .values_list(campo.attname, flat=True)
+            )
+            contador.update(filas)
+    return contador
+
+
+def borrar_archivos(archivos):
+    """
+    Borra archivos dados como pares (storage, nombre), agrupados por storage; en el
+    storage por contenido solo los que ya no referencia ninguna fila.
+    """
+    por_storage = {}
+    for storage, nombre in archivos:
+        por_storage.setdefault(storage, []).append(nombre)
+    for storage, nombres in por_storage.items():
+        try:
+            if isinstance(storage, AlmacenamientoPorContenido):
+                storage.borrar_sin_referencias(nombres)
+            else:
+                for nombre in nombres:
+                    storage.delete(nombre)
+        except (SuspiciousFileOperation, OSError):
+            pass
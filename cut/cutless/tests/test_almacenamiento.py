@@ -0,0 +1,129 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from cutless.models import Optimizacion, TableroOptimizacion
+
+
+class AlmacenamientoPorContenidoTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = media.name
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        usuario = User.objects.create_user('carpintero', password='test12345')
+        self.opt1, self.opt2 = (
+            Optimizacion.objects.create(usuario=usuario, ancho_tablero=100, alto_tablero=100, piezas='Puerta,40,40,1')
+            for _ in range(2)
+        )
+
+    def tablero(self, optimizacion, contenido):
+        tablero = TableroOptimizacion(
+            optimizacion=optimizacion, numero=1, area_usada=1600, desperdicio=8400,
+            porcentaje_uso=16.0, num_piezas=1,
+        )
+        tablero.imagen.save(f'opt_{optimizacion.pk}_tablero_1.png', ContentFile(contenido), save=True)
+        return tablero
+
+    def archivos(self):
+        return [
+            os.path.join(raiz, nombre)
+            for raiz, _, nombres in os.walk(self.media) for nombre in nombres
+        ]
+
+    def envejecer(self):
+        antiguo = 1_000_000_000
+        for ruta in self.archivos():
+            os.utime(ruta, (antiguo, antiguo))
+
+    def test_mismo_contenido_un_solo_archivo(self):
+        t1 = self.tablero(self.opt1, b'mismos bytes')
+        t2 = self.tablero(self.opt2, b'mismos bytes')
+        self.assertEqual(t1.imagen.name, t2.imagen.name)
+        self.assertTrue(t1.imagen.name.startswith('contenido/'))
+        self.assertEqual(len(self.archivos()), 1)
+
+        # Mientras otra fila lo referencia, borrar no lo quita del disco
+        t1.delete()
+        t1.imagen.delete(save=False)
+        self.assertTrue(t2.imagen.storage.exists(t2.imagen.name))
+
+        # Sin referencias pero usado hace poco: queda para limpiar_media
+        nombre, storage = t2.imagen.name, t2.imagen.storage
+        t2.delete()
+        t2.imagen.delete(save=False)
+        self.assertEqual(len(self.archivos()), 1)
+
+        self.envejecer()
+        storage.delete(nombre)
+        self.assertEqual(self.archivos(), [])
+
+    def test_no_borra_lo_que_otro_trabajo_acaba_de_reutilizar(self):
+        tablero = self.tablero(self.opt1, b'compartido')
+        nombre = tablero.imagen.name
+        storage = tablero.imagen.storage
+        tablero.delete()
+        self.envejecer()
+
+        # Otro trabajo reutiliza los mismos bytes y aún no confirma su fila
+        self.assertEqual(storage.guardar('otro.png', ContentFile(b'compartido')), (nombre, False))
+        storage.borrar_sin_referencias([nombre])
+        self.assertTrue(storage.exists(nombre))
+
+    def test_limpiar_media_borra_solo_lo_no_referenciado(self):
+        referenciado = self.tablero(self.opt1, b'en uso')
+        huerfano = self.tablero(self.opt2, b'borrado')
+        ruta_huerfano = huerfano.imagen.path
+        TableroOptimizacion.objects.filter(pk=huerfano.pk).delete()
+        legado = os.path.join(self.media, 'pdfs', 'optimizacion_1.pdf')
+        os.makedirs(os.path.dirname(legado))
+        with open(legado, 'wb') as archivo:
+            archivo.write(b'%PDF')
+
+        # Recién escritos: dentro del margen de seguridad no se tocan
+        salida = io.StringIO()
+        call_command('limpiar_media', stdout=salida)
+        self.assertIn('0 archivo(s)', salida.getvalue())
+
+        antiguo = 1_000_000_000
+        for ruta in (ruta_huerfano, legado, referenciado.imagen.path):
+            os.utime(ruta, (antiguo, antiguo))
+        call_command('limpiar_media', '--simular', stdout=salida)
+        self.assertTrue(os.path.exists(ruta_huerfano))
+
+        salida = io.StringIO()
+        call_command('limpiar_media', stdout=salida)
+        self.assertIn('2 archivo(s)', salida.getvalue())
+        self.assertEqual(self.archivos(), [referenciado.imagen.path])
+
+    def test_reutilizar_renueva_la_fecha(self):
+        antiguo = 1_000_000_000
+        primero = self.tablero(self.opt1, b'reutilizado')
+        os.utime(primero.imagen.path, (antiguo, antiguo))
+        TableroOptimizacion.objects.filter(pk=primero.pk).delete()
+
+        # Otro trabajo guarda los mismos bytes (aún sin fila confirmada) mientras corre el GC
+        nombre = primero.imagen.storage.save('opt_2_tablero_1.png', ContentFile(b'reutilizado'))
+        self.assertEqual(nombre, primero.imagen.name)
+        self.assertGreater(os.path.getmtime(primero.imagen.path), antiguo)
+        call_command('limpiar_media', stdout=io.StringIO())
+        self.assertTrue(os.path.exists(primero.imagen.path))
+
+    def test_limpiar_media_comprueba_referencias_antes_de_borrar(self):
+        tablero = self.tablero(self.opt1, b'referenciado tarde')
+        antiguo = 1_000_000_000
+        os.utime(tablero.imagen.path, (antiguo, antiguo))
+
+        # Instantánea tomada antes de que se confirmara la fila que lo referencia
+        with mock.patch('cutless.management.commands.limpiar_media.archivos_referenciados', return_value=set()):
+            call_command('limpiar_media', stdout=io.StringIO())
+        self.assertTrue(os.path.exists(tablero.imagen.path))
@@ -0,0 +1,142 @@
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cutless.exports import generar_excel, generar_pdf
+from cutless.render import generar_grafico
+from cutless.models import Optimizacion
+from cutless.services import directorio_artefactos, recortar_artefactos
+
+
+class CacheArtefactosTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+        self.usuario.perfil.rol = 'usuario'
+        self.usuario.perfil.save()
+        self.client.login(username='carpintero', password='test12345')
+        self.optimizacion = Optimizacion.objects.create(
+            usuario=self.usuario, ancho_tablero=100, alto_tablero=100, piezas='Puerta,40,40,2',
+        )
+
+    def descargar(self, nombre):
+        response = self.client.get(reverse(f'cutless:{nombre}', args=[self.optimizacion.pk]))
+        self.assertEqual(response.status_code, 200)
+        contenido = b''.join(response.streaming_content)
+        response.close()
+        return contenido
+
+    def archivos(self, tipo):
+        directorio = directorio_artefactos(tipo)
+        return sorted(os.listdir(directorio)) if os.path.isdir(directorio) else []
+
+    def test_descargas_repetidas_sirven_el_archivo(self):
+        with mock.patch('cutless.views.exports.generar_excel', wraps=generar_excel) as excel:
+            # La primera descarga también persiste el resultado del registro legacy
+            primero = self.descargar('descargar_excel')
+            self.assertEqual(self.descargar('descargar_excel'), primero)
+        self.assertEqual(excel.call_count, 1)
+
+        # El PDF ya quedó persistido con el resultado: se sirve ese archivo, sin otra copia
+        with mock.patch('cutless.services.optimization.generar_pdf', wraps=generar_pdf) as pdf:
+            self.optimizacion.refresh_from_db()
+            with self.optimizacion.pdf.open('rb') as archivo:
+                self.assertEqual(self.descargar('descargar_pdf'), archivo.read())
+            self.descargar('descargar_pdf')
+        self.assertEqual(pdf.call_count, 0)
+        self.assertEqual(len(self.archivos('excel')), 1)
+        self.assertEqual(self.archivos('pdf'), [])
+
+    def test_pdf_sin_persistir_usa_la_cache(self):
+        self.descargar('descargar_pdf')
+        self.optimizacion.refresh_from_db()
+        self.optimizacion.pdf.delete(save=True)
+        # Si el PDF no se puede volver a guardar, se genera en la caché de artefactos
+        with mock.patch('cutless.services.optimization._generar_y_guardar_pdf'):
+            with mock.patch('cutless.services.optimization.generar_pdf', wraps=generar_pdf) as pdf:
+                self.assertTrue(self.descargar('descargar_pdf').startswith(b'%PDF'))
+                self.descargar('descargar_pdf')
+        self.assertEqual(pdf.call_count, 1)
+        self.assertEqual(len(self.archivos('pdf')), 1)
+
+        # Una optimización anterior cambia el número de lista impreso; al borrarla vuelve el 1
+        anterior = Optimizacion.objects.create(
+            usuario=self.usuario, ancho_tablero=100, alto_tablero=100, piezas='Puerta,40,40,1',
+        )
+        Optimizacion.objects.filter(pk=anterior.pk).update(fecha=self.optimizacion.fecha - timedelta(days=1))
+        with mock.patch('cutless.services.optimization._generar_y_guardar_pdf'):
+            with mock.patch('cutless.services.optimization.generar_pdf', wraps=generar_pdf) as pdf:
+                self.descargar('descargar_pdf')
+                Optimizacion.objects.filter(pk=anterior.pk).delete()
+                self.descargar('descargar_pdf')
+        self.assertEqual(pdf.call_count, 1)
+        self.assertEqual([llamada.kwargs['numero_lista'] for llamada in pdf.call_args_list], [2])
+        self.assertEqual(len(self.archivos('pdf')), 2)
+
+    def test_plan_de_corte_se_dibuja_una_vez(self):
+        url = reverse('cutless:imprimir_plan_corte', args=[self.optimizacion.pk])
+        self.client.get(url)  # persiste el resultado del registro legacy
+        with mock.patch('cutless.services.optimization.generar_grafico', wraps=generar_grafico) as grafico:
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(grafico.call_count, 0)
+        self.assertEqual(len(self.archivos('plan')), 1)
+
+        self.optimizacion.margen_corte = 0.5
+        self.optimizacion.save()
+        self.client.get(url)
+        self.assertEqual(len(self.archivos('plan')), 2)
+
+    def test_plan_de_corte_enlaza_imagenes_con_etag(self):
+        respuesta = self.client.get(reverse('cutless:imprimir_plan_corte', args=[self.optimizacion.pk]))
+        self.assertNotContains(respuesta, 'data:image/png;base64')
+        url = respuesta.context['tableros_con_imagenes'][0]['imagen']
+        self.assertContains(respuesta, url)
+
+        with mock.patch('cutless.services.optimization.generar_grafico', wraps=generar_grafico) as grafico:
+            imagen = self.client.get(url)
+            self.assertEqual(imagen['Content-Type'], 'image/png')
+            self.assertTrue(b''.join(imagen.streaming_content).startswith(b'\x89PNG'))
+            imagen.close()
+            condicional = self.client.get(url, HTTP_IF_NONE_MATCH=imagen['ETag'])
+        self.assertEqual(condicional.status_code, 304)
+        self.assertEqual(grafico.call_count, 0)
+
+        ajena = User.objects.create_user('ajeno', password='test12345')
+        self.client.force_login(ajena)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_cambio_de_datos_genera_otra_version(self):
+        self.descargar('descargar_excel')
+        self.optimizacion.precio_tablero = 25000
+        self.optimizacion.save()
+        with mock.patch('cutless.views.exports.generar_excel', wraps=generar_excel) as excel:
+            self.descargar('descargar_excel')
+        self.assertEqual(excel.call_count, 1)
+        self.assertEqual(len(self.archivos('excel')), 2)
+
+        self.optimizacion.delete()
+        self.assertEqual(self.archivos('excel'), [])
+
+    def test_recorte_borra_los_menos_usados(self):
+        directorio = directorio_artefactos('pdf')
+        os.makedirs(directorio)
+        for indice in range(4):
+            ruta = os.path.join(directorio, f'opt_{indice}_x.pdf')
+            with open(ruta, 'wb') as archivo:
+                archivo.write(b'0' * 100)
+            os.utime(ruta, (1000 + indice, 1000 + indice))
+
+        self.assertEqual(recortar_artefactos(max_bytes=250), 200)
+        self.assertEqual(self.archivos('pdf'), ['opt_2_x.pdf', 'opt_3_x.pdf'])
+        self.assertEqual(recortar_artefactos(max_bytes=250), 0)
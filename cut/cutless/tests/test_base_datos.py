@@ -0,0 +1,62 @@
+import io
+import logging
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase
+
+from cutless.middleware import DatabaseHealthCheckMiddleware
+from cutless_project.database import configuracion_base_datos
+
+
+class ConfiguracionBaseDatosTests(TestCase):
+    def test_pragmas_en_cada_conexion(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    def test_configuracion_desde_entorno(self):
+        configuracion = configuracion_base_datos(Path('/srv'), {
+            'CUTLESS_DB_CONN_MAX_AGE': '0',
+            'CUTLESS_DB_TIMEOUT': '5',
+            'CUTLESS_DB_JOURNAL_MODE': 'DELETE',
+        })
+        self.assertEqual(configuracion['NAME'], Path('/srv/db.sqlite3'))
+        self.assertEqual(configuracion['CONN_MAX_AGE'], 0)
+        self.assertEqual(configuracion['OPTIONS']['timeout'], 5.0)
+        self.assertIn('PRAGMA journal_mode=DELETE', configuracion['OPTIONS']['init_command'])
+        self.assertIn('PRAGMA busy_timeout=5000', configuracion['OPTIONS']['init_command'])
+
+        # El db.sqlite3 del repositorio no pasa a WAL (queda grabado en el archivo)
+        por_defecto = configuracion_base_datos(Path('/srv'), {})['OPTIONS']['init_command']
+        self.assertNotIn('journal_mode', por_defecto)
+        propia = configuracion_base_datos(Path('/srv'), {'CUTLESS_DB_NAME': '/srv/datos/cutless.sqlite3'})
+        self.assertIn('PRAGMA journal_mode=WAL', propia['OPTIONS']['init_command'])
+
+        postgres = configuracion_base_datos(Path('/srv'), {
+            'CUTLESS_DB_ENGINE': 'django.db.backends.postgresql',
+            'CUTLESS_DB_NAME': 'cutless',
+            'CUTLESS_DB_HOST': 'db',
+        })
+        self.assertNotIn('OPTIONS', postgres)
+        self.assertEqual((postgres['NAME'], postgres['HOST']), ('cutless', 'db'))
+
+    def test_verificacion_sin_consultas_propias_de_sqlite(self):
+        middleware = DatabaseHealthCheckMiddleware(lambda request: None)
+        middleware(RequestFactory().get('/'))
+        self.assertTrue(middleware._has_tables)
+
+        middleware = DatabaseHealthCheckMiddleware(lambda request: None)
+        with mock.patch.object(connection.introspection, 'table_names', return_value=[]), \
+                self.assertLogs('cutless.middleware', logging.WARNING):
+            middleware(RequestFactory().get('/'))
+        self.assertFalse(middleware._has_tables)
+
+        salida = io.StringIO()
+        call_command('check_database', stdout=salida)
+        self.assertIn('synchronous=1', salida.getvalue())
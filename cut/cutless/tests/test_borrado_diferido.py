@@ -0,0 +1,132 @@
+import io
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cutless.models import EstadisticaDiaria, Optimizacion, Presupuesto, Proyecto, TableroOptimizacion
+from cutless.services import marcar_optimizaciones_eliminadas, purgar_optimizaciones_eliminadas
+
+
+class BorradoDiferidoTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = media.name
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+        self.client.force_login(self.usuario)
+        self.optimizaciones = [self.optimizacion(f'pieza {n}'.encode()) for n in range(3)]
+
+    def optimizacion(self, contenido):
+        optimizacion = Optimizacion.objects.create(
+            usuario=self.usuario, ancho_tablero=100, alto_tablero=100, piezas='Puerta,40,40,1',
+        )
+        tablero = TableroOptimizacion(
+            optimizacion=optimizacion, numero=1, area_usada=1600, desperdicio=8400,
+            porcentaje_uso=16.0, num_piezas=1,
+        )
+        tablero.imagen.save(f'opt_{optimizacion.pk}_tablero_1.png', ContentFile(contenido), save=True)
+        return optimizacion
+
+    def archivos(self):
+        return [
+            os.path.join(raiz, nombre)
+            for raiz, _, nombres in os.walk(self.media) for nombre in nombres
+        ]
+
+    def test_borrar_seleccion_oculta_sin_borrar_filas(self):
+        marcada, *resto = self.optimizaciones
+        respuesta = self.client.post(reverse('cutless:borrar_seleccion'), {'seleccion': [marcada.pk]})
+
+        self.assertRedirects(respuesta, reverse('cutless:historial'))
+        self.assertEqual(list(Optimizacion.objects.order_by('pk')), resto)
+        self.assertTrue(Optimizacion.todas.filter(pk=marcada.pk).exists())
+        self.assertEqual(len(self.archivos()), 3)
+        self.assertEqual(EstadisticaDiaria.objects.get(usuario=self.usuario).num_optimizaciones, 2)
+        self.assertEqual(self.client.get(reverse('cutless:resultado', args=[marcada.pk])).status_code, 404)
+
+    def test_borrar_historial_es_una_sola_actualizacion(self):
+        with mock.patch.object(Optimizacion, 'delete') as borrar:
+            respuesta = self.client.post(reverse('cutless:borrar_historial'))
+        borrar.assert_not_called()
+        self.assertRedirects(respuesta, reverse('cutless:historial'))
+        self.assertFalse(Optimizacion.objects.exists())
+        self.assertEqual(Optimizacion.todas.count(), 3)
+        self.assertFalse(EstadisticaDiaria.objects.filter(usuario=self.usuario).exists())
+
+    def test_relaciones_ocultan_las_marcadas_salvo_el_acceso_por_fk(self):
+        marcada = self.optimizaciones[0]
+        proyecto = Proyecto.objects.create(usuario=self.usuario, nombre='Cocina')
+        Optimizacion.objects.filter(pk=marcada.pk).update(proyecto=proyecto)
+        presupuesto = Presupuesto.objects.create(
+            usuario=self.usuario, numero='PRE-2025-0001', precio_tablero=Decimal('1'),
+            mano_obra=Decimal('0'), costo_total=Decimal('1'), fecha_validez=date.today(),
+        )
+        presupuesto.optimizaciones.set(self.optimizaciones)
+        marcar_optimizaciones_eliminadas(self.usuario, [marcada.pk])
+
+        self.assertNotIn(marcada, presupuesto.optimizaciones.all())
+        self.assertEqual(presupuesto.optimizaciones.count(), 2)
+        self.assertFalse(proyecto.optimizacion_set.exists())
+        # El acceso directo por FK usa el manager base: la fila sigue existiendo hasta la purga
+        tablero = TableroOptimizacion.objects.get(optimizacion_id=marcada.pk)
+        self.assertIsNotNone(tablero.optimizacion.eliminada_en)
+
+    def test_eliminar_proyecto_marca_sus_optimizaciones(self):
+        proyecto = Proyecto.objects.create(usuario=self.usuario, nombre='Cocina')
+        marcadas, conservada = self.optimizaciones[:2], self.optimizaciones[2]
+        Optimizacion.objects.filter(pk__in=[o.pk for o in marcadas]).update(proyecto=proyecto)
+        self.client.post(reverse('cutless:eliminar_proyecto', args=[proyecto.pk]), {'accion': 'eliminar'})
+
+        self.assertFalse(Proyecto.objects.filter(pk=proyecto.pk).exists())
+        self.assertEqual(list(Optimizacion.objects.all()), [conservada])
+        self.assertEqual(Optimizacion.todas.filter(eliminada_en__isnull=False).count(), 2)
+        self.assertEqual(EstadisticaDiaria.objects.get(usuario=self.usuario).num_optimizaciones, 1)
+
+    def test_borrado_en_bloque_recalcula_una_vez_por_dia(self):
+        with mock.patch.object(EstadisticaDiaria, 'recalcular') as recalcular:
+            Optimizacion.objects.filter(pk__in=[o.pk for o in self.optimizaciones[:2]]).delete()
+            # En cascada desde el usuario: sin recálculos (sus resúmenes caen con él)
+            self.usuario.delete()
+        recalcular.assert_called_once()
+        self.assertFalse(Optimizacion.todas.exists())
+
+    def test_no_marca_optimizaciones_de_otro_usuario(self):
+        otro = User.objects.create_user('ajeno', password='test12345')
+        self.assertEqual(marcar_optimizaciones_eliminadas(otro, [o.pk for o in self.optimizaciones]), 0)
+        self.assertEqual(Optimizacion.objects.count(), 3)
+
+    def test_purga_por_lotes_borra_filas_y_archivos(self):
+        # Otra optimización comparte la imagen de la primera: ese archivo debe quedar
+        conservada = self.optimizacion(b'pieza 0')
+        marcar_optimizaciones_eliminadas(self.usuario, [o.pk for o in self.optimizaciones])
+        antiguo = 1_000_000_000
+        for ruta in self.archivos():
+            os.utime(ruta, (antiguo, antiguo))
+
+        self.assertEqual(purgar_optimizaciones_eliminadas(lote=2), 2)
+        self.assertEqual(Optimizacion.todas.count(), 2)
+
+        salida = io.StringIO()
+        call_command('purgar_optimizaciones', '--lote', '2', stdout=salida)
+        self.assertIn('1 optimización(es)', salida.getvalue())
+        self.assertEqual(list(Optimizacion.todas.all()), [conservada])
+        self.assertEqual(TableroOptimizacion.objects.count(), 1)
+        self.assertEqual(self.archivos(), [conservada.tableros.get().imagen.path])
+        # La purga no vuelve a descontar estadísticas ya ajustadas al marcar
+        self.assertEqual(EstadisticaDiaria.objects.get(usuario=self.usuario).num_optimizaciones, 1)
+
+        salida = io.StringIO()
+        call_command('purgar_optimizaciones', stdout=salida)
+        self.assertIn('No hay optimizaciones por purgar', salida.getvalue())
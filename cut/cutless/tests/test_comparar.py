@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from cutless.models import Optimizacion, TableroOptimizacion
+
+
+class CompararOptimizacionesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+        self.usuario.perfil.rol = 'usuario'
+        self.usuario.perfil.save()
+        self.client.login(username='carpintero', password='test12345')
+
+    def crear(self, piezas, aprovechamiento=70.0):
+        # Registro legacy: sin tableros guardados ni num_tableros
+        return Optimizacion.objects.create(
+            usuario=self.usuario, ancho_tablero=100, alto_tablero=100,
+            piezas=piezas, aprovechamiento_total=aprovechamiento,
+        )
+
+    def test_legacy_no_dibuja_tableros(self):
+        opt1 = self.crear('Puerta,90,90,3', 81.0)
+        opt2 = self.crear('Estante,49,49,4', 100.0)
+
+        with mock.patch('cutless.render.generar_grafico') as generar_grafico:
+            response = self.client.get(
+                reverse('cutless:comparar_optimizaciones'), {'opt': [opt1.pk, opt2.pk]},
+            )
+        generar_grafico.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+
+        comparadas = response.context['comparadas']
+        self.assertEqual([c['num_tableros'] for c in comparadas], [3, 1])
+        self.assertEqual(comparadas[1]['diferencia_tableros'], -2)
+        self.assertEqual(len(response.context['filas_tableros']), 3)
+        self.assertEqual(response.context['filas_tableros'][1]['usos'][1], None)
+        opt1.refresh_from_db()
+        self.assertEqual(opt1.num_tableros, 3)
+
+    def test_usa_tableros_guardados_y_compara_varias(self):
+        guardada = self.crear('Puerta,90,90,2', 81.0)
+        guardada.resultado_generado = True
+        guardada.num_tableros = 2
+        guardada.save()
+        for numero, uso in ((1, 90.0), (2, 72.0)):
+            TableroOptimizacion.objects.create(
+                optimizacion=guardada, numero=numero, imagen='x.png',
+                area_usada=uso * 100, desperdicio=(100 - uso) * 100, porcentaje_uso=uso, num_piezas=1,
+            )
+        otras = [self.crear('Estante,49,49,4', 100.0), self.crear('Repisa,40,40,1', 16.0)]
+
+        from cutless.services import optimization
+
+        with mock.patch.object(optimization, 'optimizar_corte', wraps=optimization.optimizar_corte) as motor:
+            response = self.client.get(
+                reverse('cutless:comparar_optimizaciones'),
+                {'opt': [guardada.pk] + [o.pk for o in otras]},
+            )
+            # Solo las dos legacy pasan por el motor; una segunda visita sale de la caché
+            self.assertEqual(motor.call_count, 2)
+            self.client.get(
+                reverse('cutless:comparar_optimizaciones'),
+                {'opt': [o.pk for o in otras]},
+            )
+            self.assertEqual(motor.call_count, 2)
+        self.assertEqual(len(response.context['comparadas']), 3)
+        self.assertEqual(response.context['filas_tableros'][0]['usos'][0], 90.0)
+        self.assertEqual(response.context['filas_tableros'][1]['usos'], [72.0, None, None])
+
+    def test_formato_anterior_y_ajena(self):
+        opt1 = self.crear('Puerta,90,90,1')
+        opt2 = self.crear('Estante,50,50,1')
+        response = self.client.get(
+            reverse('cutless:comparar_optimizaciones'), {'opt1': opt1.pk, 'opt2': opt2.pk},
+        )
+        self.assertEqual(len(response.context['comparadas']), 2)
+
+        otro = User.objects.create_user('otro', password='test12345')
+        ajena = Optimizacion.objects.create(
+            usuario=otro, ancho_tablero=100, alto_tablero=100, piezas='Puerta,90,90,1',
+        )
+        response = self.client.get(
+            reverse('cutless:comparar_optimizaciones'), {'opt': [opt1.pk, ajena.pk]},
+        )
+        self.assertRedirects(response, reverse('cutless:comparar_optimizaciones'))
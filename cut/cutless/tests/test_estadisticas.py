@@ -0,0 +1,238 @@
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from cutless.models import EstadisticaDiaria, Optimizacion
+from cutless.services import grafico_cacheado, serie_costos, serie_estadisticas
+from cutless.services.charts import MAX_PUNTOS_GRAFICO, reducir_lttb
+
+
+class EstadisticaDiariaTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+
+    def crear(self, aprovechamiento, **extra):
+        return Optimizacion.objects.create(
+            usuario=self.usuario,
+            ancho_tablero=122,
+            alto_tablero=244,
+            piezas='Puerta,60,40,1',
+            aprovechamiento_total=aprovechamiento,
+            **extra,
+        )
+
+    def resumen_hoy(self):
+        return EstadisticaDiaria.objects.get(usuario=self.usuario, fecha=timezone.localdate())
+
+    def test_se_actualiza_al_crear_editar_y_borrar(self):
+        a = self.crear(80.0, num_tableros=2, precio_tablero=Decimal('100.00'), mano_obra=Decimal('50.00'))
+        b = self.crear(60.0, num_tableros=1)
+
+        resumen = self.resumen_hoy()
+        self.assertEqual(resumen.num_optimizaciones, 2)
+        self.assertEqual(resumen.max_aprovechamiento, 80.0)
+        self.assertEqual(resumen.min_aprovechamiento, 60.0)
+        self.assertEqual(resumen.num_tableros, 3)
+        self.assertEqual(resumen.num_con_costo, 1)
+        self.assertEqual(resumen.costo_total, Decimal('250.00'))
+
+        b.aprovechamiento_total = 90.0
+        b.save()
+        self.assertEqual(self.resumen_hoy().max_aprovechamiento, 90.0)
+
+        a.delete()
+        resumen = self.resumen_hoy()
+        self.assertEqual(resumen.num_optimizaciones, 1)
+        self.assertEqual(resumen.costo_total, Decimal('0.00'))
+
+        Optimizacion.objects.filter(usuario=self.usuario).delete()
+        self.assertFalse(EstadisticaDiaria.objects.filter(usuario=self.usuario).exists())
+
+    def test_comando_reconstruye_igual_que_el_mantenimiento(self):
+        self.crear(80.0, num_tableros=2, precio_tablero=Decimal('10.00'))
+        self.crear(40.0, num_tableros=1)
+        esperado = EstadisticaDiaria.resumen(self.usuario)
+        EstadisticaDiaria.objects.all().delete()
+
+        call_command('reconstruir_estadisticas', stdout=io.StringIO())
+
+        self.assertEqual(EstadisticaDiaria.resumen(self.usuario), esperado)
+        self.assertEqual(esperado['promedio_aprovechamiento'], 60.0)
+
+    def test_paginas_usan_los_resumenes(self):
+        self.crear(75.0, num_tableros=2, precio_tablero=Decimal('20.00'), mano_obra=Decimal('5.00'))
+        self.client.login(username='carpintero', password='test12345')
+
+        response = self.client.get(reverse('cutless:estadisticas'), {'periodo': 'semanal'})
+        self.assertEqual(response.context['total_optimizaciones'], 1)
+        self.assertEqual(response.context['promedio_aprovechamiento'], 75.0)
+
+        response = self.client.get(reverse('cutless:historial_costos'))
+        self.assertEqual(response.context['costo_total'], Decimal('45.00'))
+        self.assertEqual(response.context['num_tableros_total'], 2)
+
+
+class HistorialCostosTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+        for i in range(30):
+            Optimizacion.objects.create(
+                usuario=self.usuario,
+                ancho_tablero=122,
+                alto_tablero=244,
+                piezas='Puerta,60,40,1',
+                num_tableros=2,
+                precio_tablero=Decimal('10.50'),
+                mano_obra=Decimal('4.00'),
+            )
+        self.client.login(username='carpintero', password='test12345')
+
+    def test_costos_por_fila_calculados_en_la_bd_y_paginados(self):
+        response = self.client.get(reverse('cutless:historial_costos'))
+        filas = response.context['optimizaciones_con_costo']
+        self.assertEqual(len(filas), 25)
+        self.assertEqual(filas[0]['costo_material'], Decimal('21.00'))
+        self.assertEqual(filas[0]['costo_total'], Decimal('25.00'))
+        self.assertEqual(response.context['costo_total'], Decimal('750.00'))
+
+        response = self.client.get(reverse('cutless:historial_costos'), {'page': 2})
+        self.assertEqual(len(response.context['optimizaciones_con_costo']), 5)
+
+    def test_grafico_de_costos_desde_json_cacheado(self):
+        cache.clear()
+        response = self.client.get(reverse('cutless:historial_costos'))
+        self.assertNotContains(response, 'base64')
+        self.assertContains(response, reverse('cutless:datos_costos'))
+
+        with mock.patch('cutless.views.analytics.serie_costos', wraps=serie_costos) as generar:
+            serie = self.client.get(reverse('cutless:datos_costos')).json()
+            # Misma versión de datos: se sirve desde la caché
+            self.client.get(reverse('cutless:datos_costos'))
+        self.assertEqual(generar.call_count, 1)
+        self.assertEqual(serie['puntos'], [{
+            'fecha': timezone.localdate().isoformat(),
+            'etiqueta': timezone.localdate().strftime('%d/%m/%Y'),
+            'costo': 750.0,
+        }])
+
+        manana = (timezone.localdate() + timedelta(days=1)).isoformat()
+        self.assertEqual(self.client.get(reverse('cutless:datos_costos'), {'fecha_desde': manana}).json()['puntos'], [])
+
+    def test_exportacion_excel_incluye_todas_las_filas(self):
+        from openpyxl import load_workbook
+
+        response = self.client.get(reverse('cutless:historial_costos'), {'export': 'excel'})
+        self.assertTrue(response.streaming)
+        libro = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        # Encabezado + 30 filas + totales
+        hoja = libro['Detalle de Costos']
+        self.assertEqual(hoja.max_row, 32)
+        self.assertEqual(hoja['A1'].style, 'encabezado')
+        self.assertEqual(hoja['I32'].value, '$750')
+
+    def test_exportacion_desperdicio_en_streaming(self):
+        from openpyxl import load_workbook
+
+        self.usuario.perfil.rol = 'usuario'
+        self.usuario.perfil.save()
+        response = self.client.get(reverse('cutless:exportar_excel_desperdicio'), {'periodo': 'todos'})
+        self.assertTrue(response.streaming)
+        libro = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(libro['Detalle Optimizaciones'].max_row, 32)
+        self.assertEqual(libro['Resumen Desperdicio']['B5'].value, 30)
+
+
+class GraficosEstadisticasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+        self.usuario.perfil.rol = 'usuario'
+        self.usuario.perfil.save()
+        self.crear()
+        self.client.login(username='carpintero', password='test12345')
+
+    def crear(self):
+        return Optimizacion.objects.create(
+            usuario=self.usuario, ancho_tablero=122, alto_tablero=244,
+            piezas='Puerta,60,40,1', aprovechamiento_total=70.0,
+        )
+
+    def test_graficos_se_reutilizan_hasta_que_cambian_los_datos(self):
+        generador = mock.Mock(return_value='UE5H')
+        grafico_cacheado(self.usuario.pk, 'costos', generador, 'todos')
+        grafico_cacheado(self.usuario.pk, 'costos', generador, 'todos')
+        self.assertEqual(generador.call_count, 1)
+
+        self.crear()
+        grafico_cacheado(self.usuario.pk, 'costos', generador, 'todos')
+        self.assertEqual(generador.call_count, 2)
+
+    def test_pagina_no_incrusta_imagenes(self):
+        response = self.client.get(reverse('cutless:estadisticas'))
+        self.assertNotContains(response, 'base64')
+        self.assertContains(response, reverse('cutless:datos_estadisticas'))
+
+    def test_datos_estadisticas_json(self):
+        response = self.client.get(reverse('cutless:datos_estadisticas'), {'periodo': 'semanal'})
+        self.assertEqual(response.status_code, 200)
+        datos = response.json()
+        self.assertEqual(datos['granularidad'], 'dia')
+        self.assertEqual(len(datos['puntos']), 1)
+        self.assertEqual(datos['puntos'][0]['optimizaciones'], 1)
+        self.assertEqual(datos['puntos'][0]['aprovechamiento'], 70.0)
+        self.assertEqual(datos['promedio_desperdicio'], 30.0)
+
+    def crear_dias(self, dias, aprovechamiento=lambda dias: 50.0):
+        hoy = timezone.localdate()
+        EstadisticaDiaria.objects.bulk_create([
+            EstadisticaDiaria(
+                usuario=self.usuario, fecha=hoy - timedelta(days=d),
+                num_optimizaciones=2, suma_aprovechamiento=2 * aprovechamiento(d),
+                min_aprovechamiento=aprovechamiento(d) - 10, max_aprovechamiento=aprovechamiento(d) + 10,
+            )
+            for d in dias
+        ])
+
+    def test_serie_agrupa_en_la_bd_con_bandas(self):
+        self.crear_dias(range(1, 400), aprovechamiento=lambda d: 40.0 + d % 7)
+        hoy = timezone.localdate()
+        serie = serie_estadisticas(self.usuario, 'anual', desde=hoy - timedelta(days=365))
+        self.assertEqual(serie['granularidad'], 'semana')
+        self.assertLessEqual(len(serie['puntos']), MAX_PUNTOS_GRAFICO)
+        for punto in serie['puntos']:
+            self.assertEqual(date.fromisoformat(punto['fecha']).weekday(), 0)
+            self.assertLessEqual(punto['aprovechamiento_min'], punto['aprovechamiento'])
+            self.assertGreaterEqual(punto['aprovechamiento_max'], punto['aprovechamiento'])
+            self.assertEqual(punto['desperdicio_min'], round(100 - punto['aprovechamiento_max'], 2))
+
+        # Sin límite de fecha, los días se agrupan en intervalos más gruesos
+        serie = serie_estadisticas(self.usuario, 'semanal')
+        self.assertEqual(serie['granularidad'], 'semana')
+        self.assertLessEqual(len(serie['puntos']), MAX_PUNTOS_GRAFICO)
+        self.assertEqual(sum(p['optimizaciones'] for p in serie['puntos']), 2 * 399 + 1)
+
+    def test_todos_reduce_con_lttb(self):
+        # Un pico aislado debe sobrevivir a la reducción
+        self.crear_dias(range(1, 1000), aprovechamiento=lambda d: 95.0 if d == 500 else 50.0)
+        serie = serie_estadisticas(self.usuario, 'todos')
+        self.assertTrue(serie['reducida'])
+        self.assertEqual(len(serie['puntos']), MAX_PUNTOS_GRAFICO)
+        self.assertIn(95.0, [p['aprovechamiento'] for p in serie['puntos']])
+        self.assertEqual(serie['puntos'][-1]['optimizaciones'], 1)
+
+    def test_reducir_lttb_conserva_extremos(self):
+        puntos = [(x, (x * 37) % 11) for x in range(50)]
+        reducidos = reducir_lttb(puntos, 10, x=lambda p: p[0], y=lambda p: p[1])
+        self.assertEqual(len(reducidos), 10)
+        self.assertEqual(reducidos[0], puntos[0])
+        self.assertEqual(reducidos[-1], puntos[-1])
+        self.assertEqual(reducidos, sorted(reducidos))
+        self.assertEqual(reducir_lttb(puntos[:5], 10, x=lambda p: p[0], y=lambda p: p[1]), puntos[:5])
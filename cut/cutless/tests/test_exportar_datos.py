@@ -0,0 +1,102 @@
+import csv
+import io
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from cutless.exports import generar_parquet, parquet_disponible
+from cutless.models import Optimizacion, Proyecto, TableroOptimizacion
+
+
+class ExportarDatosTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+        self.usuario.perfil.rol = 'usuario'
+        self.usuario.perfil.save()
+        self.otro = User.objects.create_user('otro', password='test12345')
+        self.client.login(username='carpintero', password='test12345')
+
+    def crear(self, usuario=None, **campos):
+        opt = Optimizacion.objects.create(
+            usuario=usuario or self.usuario, ancho_tablero=100, alto_tablero=100,
+            piezas='Puerta,40,40,2\nEstante,30,20,1', aprovechamiento_total=80.0, **campos,
+        )
+        TableroOptimizacion.objects.create(
+            optimizacion=opt, numero=1, imagen='x.png',
+            area_usada=8000, desperdicio=2000, porcentaje_uso=80.0, num_piezas=3,
+        )
+        return opt
+
+    def exportar(self, **parametros):
+        response = self.client.get(reverse('cutless:exportar_datos'), parametros)
+        self.assertEqual(response.status_code, 200)
+        contenido = b''.join(response.streaming_content).decode('utf-8')
+        return list(csv.DictReader(io.StringIO(contenido)))
+
+    def test_csv_de_cada_tabla(self):
+        opt = self.crear()
+
+        filas = self.exportar(tabla='optimizaciones')
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0]['id'], str(opt.pk))
+        self.assertEqual(filas[0]['usuario'], 'carpintero')
+
+        filas = self.exportar(tabla='tableros')
+        self.assertEqual([f['porcentaje_uso'] for f in filas], ['80.0'])
+
+        filas = self.exportar(tabla='piezas')
+        self.assertEqual([f['nombre'] for f in filas], ['Puerta', 'Estante'])
+        self.assertEqual({f['optimizacion_id'] for f in filas}, {str(opt.pk)})
+
+    def test_filtros_y_solo_datos_propios(self):
+        proyecto = Proyecto.objects.create(usuario=self.usuario, nombre='Cocina')
+        reciente = self.crear(proyecto=proyecto)
+        antigua = self.crear()
+        Optimizacion.objects.filter(pk=antigua.pk).update(fecha=timezone.now() - timedelta(days=40))
+        self.crear(usuario=self.otro)
+
+        ids = [f['id'] for f in self.exportar(usuario='otro')]
+        self.assertCountEqual(ids, [str(reciente.pk), str(antigua.pk)])
+
+        desde = (timezone.localdate() - timedelta(days=7)).isoformat()
+        self.assertEqual([f['id'] for f in self.exportar(desde=desde)], [str(reciente.pk)])
+        hasta = (timezone.localdate() - timedelta(days=30)).isoformat()
+        self.assertEqual([f['id'] for f in self.exportar(hasta=hasta)], [str(antigua.pk)])
+        self.assertEqual([f['id'] for f in self.exportar(proyecto=proyecto.pk)], [str(reciente.pk)])
+
+        self.usuario.perfil.rol = 'admin'
+        self.usuario.perfil.save()
+        self.assertEqual(len(self.exportar()), 3)
+        self.assertEqual(len(self.exportar(usuario='otro')), 1)
+
+    def test_parametros_no_validos(self):
+        response = self.client.get(reverse('cutless:exportar_datos'), {'tabla': 'usuarios'})
+        self.assertRedirects(response, reverse('cutless:estadisticas'))
+
+        with mock.patch('cutless.views.exports.parquet_disponible', return_value=False):
+            response = self.client.get(reverse('cutless:exportar_datos'), {'formato': 'parquet'})
+        self.assertRedirects(response, reverse('cutless:estadisticas'))
+
+    @unittest.skipUnless(parquet_disponible(), 'pyarrow no está instalado')
+    def test_parquet_por_grupos_de_filas(self):
+        import pyarrow.parquet as pq
+
+        for _ in range(3):
+            self.crear()
+        destino = io.BytesIO()
+        with mock.patch('cutless.exports.datos.TAM_BLOQUE_EXPORTACION', 2):
+            generar_parquet('tableros', Optimizacion.objects.all(), destino)
+
+        archivo = pq.ParquetFile(destino)
+        self.assertEqual(archivo.metadata.num_rows, 3)
+        self.assertEqual(archivo.num_row_groups, 2)
+        self.assertEqual(archivo.read().column('porcentaje_uso').to_pylist(), [80.0] * 3)
+
+        response = self.client.get(reverse('cutless:exportar_datos'), {'formato': 'parquet'})
+        tabla = pq.read_table(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(tabla.num_rows, 3)
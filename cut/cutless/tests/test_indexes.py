@@ -0,0 +1,67 @@
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+
+from cutless.models import Optimizacion, PiezaOptimizacion, Presupuesto, Proyecto
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Los planes se verifican con EXPLAIN QUERY PLAN de SQLite')
+class PlanConsultasTests(TestCase):
+    """Las consultas por usuario del historial, costos y listados usan los índices compuestos."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+
+    def assertUsaIndice(self, queryset, indice):
+        plan = queryset.explain()
+        self.assertIn(indice, plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_historial_por_fecha(self):
+        self.assertUsaIndice(
+            Optimizacion.objects.filter(usuario=self.usuario).order_by('-fecha'),
+            'opt_usuario_fecha_idx',
+        )
+
+    def test_historial_por_aprovechamiento(self):
+        self.assertUsaIndice(
+            Optimizacion.objects.filter(usuario=self.usuario).order_by('-aprovechamiento_total'),
+            'opt_usuario_aprov_idx',
+        )
+
+    def test_historial_solo_favoritos(self):
+        self.assertUsaIndice(
+            Optimizacion.objects.filter(usuario=self.usuario, favorito=True).order_by('-fecha'),
+            'opt_usuario_fav_fecha_idx',
+        )
+
+    def test_historial_costos_usa_indice_parcial(self):
+        self.assertUsaIndice(
+            Optimizacion.objects.filter(
+                usuario=self.usuario, precio_tablero__isnull=False,
+            ).order_by('-fecha'),
+            'opt_usuario_costo_fecha_idx',
+        )
+
+    def test_listados_de_presupuestos_y_proyectos(self):
+        self.assertUsaIndice(
+            Presupuesto.objects.filter(usuario=self.usuario, estado='enviado').order_by('-fecha_creacion'),
+            'pres_usuario_estado_idx',
+        )
+        self.assertUsaIndice(
+            Proyecto.objects.filter(usuario=self.usuario).order_by('-fecha_creacion'),
+            'proy_usuario_fecha_idx',
+        )
+
+    def test_busqueda_por_nombre_de_pieza(self):
+        plan = (
+            Optimizacion.objects.filter(usuario=self.usuario)
+            .filter(PiezaOptimizacion.existe_con_nombre('Puerta'))
+            .explain()
+        )
+        # Las piezas se buscan por optimización del usuario, no en toda la tabla
+        self.assertIn('pieza_opt_nombre_idx', plan)
+        self.assertIn('(usuario_id=?)', plan)
+        self.assertNotRegex(plan, r'SCAN (cutless_piezaoptimizacion|cutless_optimizacion)\b(?! USING)')
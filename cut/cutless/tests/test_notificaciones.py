@@ -0,0 +1,81 @@
+import io
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.db import SessionStore
+from django.core import mail
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from cutless.models import NotificacionEmail
+from cutless.services import encolar_email, enviar_notificacion, enviar_notificaciones_pendientes
+
+
+class ColaNotificacionesTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('carpintero', email='taller@example.com', password='test12345')
+        perfil = self.usuario.perfil
+        perfil.notificaciones_email = True
+        perfil.notificar_proyecto_creado = True
+        perfil.save()
+
+    def test_la_peticion_solo_encola(self):
+        request = RequestFactory().get('/')
+        request.user = self.usuario
+        request.session = SessionStore()
+        request._messages = FallbackStorage(request)
+
+        with mock.patch('cutless.services.notifications.get_connection') as conexion:
+            enviar_notificacion(request, 'proyecto_creado', 'Proyecto creado', 'Cocina')
+        conexion.assert_not_called()
+        self.assertEqual(mail.outbox, [])
+
+        notificacion = NotificacionEmail.objects.get()
+        self.assertEqual(notificacion.destinatario, 'taller@example.com')
+        self.assertEqual(notificacion.estado, 'pendiente')
+
+        salida = io.StringIO()
+        call_command('enviar_notificaciones', stdout=salida)
+        self.assertIn('1 email(s) enviado(s)', salida.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'CutLess - Proyecto creado')
+        notificacion.refresh_from_db()
+        self.assertEqual(notificacion.estado, 'enviada')
+
+    def test_una_conexion_por_lote(self):
+        for i in range(5):
+            encolar_email(f'cliente{i}@example.com', 'Aviso', 'Hola')
+
+        from cutless.services import notifications
+
+        with mock.patch.object(notifications, 'get_connection', wraps=notifications.get_connection) as conexion:
+            self.assertEqual(enviar_notificaciones_pendientes(lote=3), (3, 0))
+            self.assertEqual(enviar_notificaciones_pendientes(lote=3), (2, 0))
+        self.assertEqual(conexion.call_count, 2)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_reintentos_con_espera_creciente(self):
+        notificacion = encolar_email('cliente@example.com', 'Aviso', 'Hola')
+
+        with mock.patch('django.core.mail.EmailMultiAlternatives.send', side_effect=OSError('SMTP caído')):
+            self.assertEqual(enviar_notificaciones_pendientes(max_intentos=3), (0, 1))
+            notificacion.refresh_from_db()
+            self.assertEqual((notificacion.estado, notificacion.intentos), ('pendiente', 1))
+            primera_espera = notificacion.proximo_intento - timezone.now()
+            self.assertGreater(primera_espera.total_seconds(), 0)
+            # Aún no toca reintentar
+            self.assertEqual(enviar_notificaciones_pendientes(max_intentos=3), (0, 0))
+
+            NotificacionEmail.objects.update(proximo_intento=timezone.now())
+            enviar_notificaciones_pendientes(max_intentos=3)
+            notificacion.refresh_from_db()
+            self.assertGreater(notificacion.proximo_intento - timezone.now(), primera_espera)
+
+            NotificacionEmail.objects.update(proximo_intento=timezone.now())
+            enviar_notificaciones_pendientes(max_intentos=3)
+        notificacion.refresh_from_db()
+        self.assertEqual((notificacion.estado, notificacion.intentos), ('fallida', 3))
+        self.assertIn('SMTP caído', notificacion.ultimo_error)
+        self.assertEqual(mail.outbox, [])
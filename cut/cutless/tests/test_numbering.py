@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from cutless.models import Optimizacion
+from cutless.numbering import anotar_numero_lista, calcular_numero_lista
+
+
+class NumeroListaTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+        otro = User.objects.create_user('otro', password='test12345')
+        ahora = timezone.now()
+        self.optimizaciones = []
+        for dias, aprovechamiento in ((3, 80.0), (2, 50.0), (1, 95.0)):
+            opt = Optimizacion.objects.create(
+                usuario=self.usuario,
+                ancho_tablero=122,
+                alto_tablero=244,
+                piezas='Puerta,60,40,1',
+                aprovechamiento_total=aprovechamiento,
+            )
+            Optimizacion.objects.filter(pk=opt.pk).update(fecha=ahora - timedelta(days=dias))
+            self.optimizaciones.append(opt)
+        Optimizacion.objects.create(
+            usuario=otro, ancho_tablero=122, alto_tablero=244, piezas='Puerta,60,40,1',
+        )
+
+    def test_numero_por_fecha_es_posicion_cronologica(self):
+        antigua, media, reciente = self.optimizaciones
+        self.assertEqual(calcular_numero_lista(self.usuario, antigua.pk), 1)
+        self.assertEqual(calcular_numero_lista(self.usuario, media.pk), 2)
+        self.assertEqual(calcular_numero_lista(self.usuario, reciente.pk, 'fecha_asc'), 3)
+
+    def test_numero_por_aprovechamiento(self):
+        antigua, media, reciente = self.optimizaciones
+        self.assertEqual(calcular_numero_lista(self.usuario, media.pk, 'aprovechamiento_desc'), 1)
+        self.assertEqual(calcular_numero_lista(self.usuario, reciente.pk, 'aprovechamiento_asc'), 3)
+
+    def test_anotacion_no_depende_de_los_filtros(self):
+        filtradas = anotar_numero_lista(
+            Optimizacion.objects.filter(usuario=self.usuario, aprovechamiento_total__gt=60),
+        ).order_by('-fecha')
+        self.assertEqual([opt.numero_lista for opt in filtradas], [3, 1])
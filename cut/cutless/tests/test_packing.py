@@ -1,3 +1,4 @@
+import matplotlib.pyplot as plt
 from django.contrib.auth.models import User
 from django.test import TestCase
 
@@ -43,6 +44,16 @@ class PackingTests(TestCase):
         self.assertEqual(info['num_piezas_colocadas'], 1)
         self.assertIn('area_usada_total', info)
 
+    def test_generar_grafico_varios_tableros_reutiliza_plantilla(self):
+        piezas = [(100, 200, 2), (50, 30, 3)]
+        imagenes, _, info = generar_grafico(
+            piezas, 122, 244, 'cm', nombres_piezas=['Lateral', 'Repisa'],
+        )
+        self.assertEqual(len(imagenes), info['num_tableros'])
+        self.assertGreater(len(imagenes), 1)
+        self.assertTrue(all(imagen.startswith(b'\x89PNG') for imagen in imagenes))
+        self.assertEqual(plt.get_fignums(), [])
+
     def test_preparar_contexto_resultado_con_info_completa(self):
         user = User.objects.create_user(username='pack_test', password='test12345')
         piezas = [(60, 40, 1)]
@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cutless.pieces import parsear_piezas_desde_texto
+from cutless.profiling import medir_etapa, medir_peticion
+
+
+class MedicionEtapasTests(TestCase):
+    def test_etapas_acumulan_tiempo_llamadas_y_sql(self):
+        with medir_peticion() as medicion:
+            parsear_piezas_desde_texto('Puerta,40,40,1')
+            parsear_piezas_desde_texto('Lateral,60,30,2')
+            with medir_etapa('consulta'):
+                User.objects.count()
+
+        segundos, llamadas, consultas = medicion.etapas['parsear_piezas']
+        self.assertEqual((llamadas, consultas), (2, 0))
+        self.assertEqual(medicion.etapas['consulta'][1:], [1, 1])
+        self.assertEqual(medicion.consultas, 1)
+        cabecera = medicion.server_timing(12.34)
+        self.assertTrue(cabecera.startswith('total;desc="1 SQL";dur=12.3'))
+        self.assertIn('parsear_piezas;desc="2x, 0 SQL";dur=', cabecera)
+
+    def test_sin_medicion_activa_no_registra(self):
+        with medir_etapa('suelta'):
+            pass
+        self.assertEqual(parsear_piezas_desde_texto('Puerta,40,40,1')[0]['nombre'], 'Puerta')
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+        self.client.force_login(self.usuario)
+
+    def test_desactivado_sin_cabecera(self):
+        respuesta = self.client.get(reverse('cutless:historial'))
+        self.assertNotIn('Server-Timing', respuesta)
+
+    @override_settings(CUTLESS_PROFILING=True, CUTLESS_PROFILING_MUESTREO=0)
+    def test_cabecera_y_linea_de_log(self):
+        with self.assertLogs('cutless.profiling', level='INFO') as registros:
+            respuesta = self.client.get(reverse('cutless:historial'))
+        self.assertRegex(respuesta['Server-Timing'], r'^total;desc="\d+ SQL";dur=\d+\.\d$')
+        self.assertIn(f"GET {reverse('cutless:historial')} 200", registros.output[0])
+
+    def test_cprofile_por_muestreo_sobre_el_umbral(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ajustes = dict(CUTLESS_PROFILING=True, CUTLESS_PROFILING_DIRECTORIO=directorio, CUTLESS_PROFILING_MUESTREO=1)
+            with override_settings(CUTLESS_PROFILING_UMBRAL_MS=60_000, **ajustes), self.assertLogs('cutless.profiling'):
+                self.client.get(reverse('cutless:historial'))
+            self.assertEqual(os.listdir(directorio), [])
+
+            self.client = self.client_class()
+            self.client.force_login(self.usuario)
+            with override_settings(CUTLESS_PROFILING_UMBRAL_MS=0, **ajustes), self.assertLogs('cutless.profiling'):
+                self.client.get(reverse('cutless:historial'))
+            perfiles = os.listdir(directorio)
+            self.assertEqual(len(perfiles), 1)
+            self.assertRegex(perfiles[0], r'_GET_\w*historial_\d+ms\.prof$')
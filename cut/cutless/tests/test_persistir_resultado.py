@@ -0,0 +1,109 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from cutless.models import Optimizacion, TableroOptimizacion
+from cutless.services import persistir_resultado_optimizacion
+
+
+def _png(color='white'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (20, 20), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class PersistirResultadoTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = media.name
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        usuario = User.objects.create_user('carpintero', password='test12345')
+        self.optimizacion = Optimizacion.objects.create(
+            usuario=usuario, ancho_tablero=100, alto_tablero=100, piezas='Puerta,90,90,40',
+        )
+
+    def persistir(self, num_tableros, color='white'):
+        png = _png(color)
+        info = {
+            'info_tableros': [
+                {'numero': n, 'area_usada': 8100, 'desperdicio': 1900, 'porcentaje_uso': 81.0, 'num_piezas': 1}
+                for n in range(1, num_tableros + 1)
+            ],
+        }
+        imagenes = [{'media': png, 'miniatura': png} for _ in range(num_tableros)]
+        return persistir_resultado_optimizacion(self.optimizacion, imagenes, info, 81.0)
+
+    def archivos(self):
+        return {
+            os.path.relpath(os.path.join(raiz, nombre), self.media)
+            for raiz, _, nombres in os.walk(self.media) for nombre in nombres
+        }
+
+    def envejecer(self):
+        antiguo = 1_000_000_000
+        for nombre in self.archivos():
+            os.utime(os.path.join(self.media, nombre), (antiguo, antiguo))
+
+    def test_un_insert_para_todos_los_tableros(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.persistir(40)
+        inserts = [
+            q['sql'] for q in consultas.captured_queries
+            if q['sql'].startswith('INSERT') and TableroOptimizacion._meta.db_table in q['sql']
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self.optimizacion.tableros.count(), 40)
+        self.assertEqual(self.optimizacion.num_tableros, 40)
+
+    def test_reemplazo_borra_los_archivos_anteriores_al_confirmar(self):
+        self.persistir(3)
+        anteriores = self.archivos()
+        self.envejecer()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.persistir(2, color='gray')
+
+        actuales = self.archivos()
+        self.assertFalse(anteriores & actuales)
+        self.assertEqual(self.optimizacion.tableros.count(), 2)
+        for tablero in self.optimizacion.tableros.all():
+            self.assertTrue(tablero.imagen.storage.exists(tablero.imagen.name))
+
+    def test_fallo_no_deja_resultado_a_medias(self):
+        self.persistir(3)
+        anteriores = self.archivos()
+
+        with mock.patch.object(TableroOptimizacion.objects, 'bulk_create', side_effect=DatabaseError('disco lleno')):
+            with self.assertRaises(DatabaseError):
+                self.persistir(5)
+
+        # Los archivos recién escritos quedan para limpiar_media, que solo quita los sueltos
+        self.envejecer()
+        call_command('limpiar_media', stdout=io.StringIO())
+        self.assertEqual(self.archivos(), anteriores)
+        optimizacion = Optimizacion.objects.get(pk=self.optimizacion.pk)
+        self.assertEqual(optimizacion.num_tableros, 3)
+        self.assertEqual(optimizacion.tableros.count(), 3)
+
+    def test_fallo_no_borra_archivos_reutilizados(self):
+        # Otro trabajo ya escribió esos mismos bytes: no son de esta llamada
+        storage = TableroOptimizacion._meta.get_field('imagen').storage
+        ajeno = storage.save('ajeno.png', io.BytesIO(_png('blue')))
+        self.envejecer()
+
+        with mock.patch.object(TableroOptimizacion.objects, 'bulk_create', side_effect=DatabaseError('disco lleno')):
+            with self.assertRaises(DatabaseError):
+                self.persistir(2, color='blue')
+
+        self.assertTrue(storage.exists(ajeno))
@@ -0,0 +1,73 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from cutless.models import Optimizacion, PiezaOptimizacion
+from cutless.pieces import normalizar_nombre_pieza
+
+
+class PiezaOptimizacionTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+
+    def crear(self, piezas, unidad='cm', usuario=None):
+        return Optimizacion.objects.create(
+            usuario=usuario or self.usuario,
+            ancho_tablero=122,
+            alto_tablero=244,
+            unidad_medida=unidad,
+            piezas=piezas,
+        )
+
+    def test_normalizar_nombre(self):
+        self.assertEqual(normalizar_nombre_pieza('  Cajón   LATERAL '), 'cajon lateral')
+
+    def test_filas_se_crean_al_guardar(self):
+        opt = self.crear('Puerta,60,40,2\n30,20,1', unidad='m')
+        piezas = list(opt.piezas_detalle.all())
+
+        self.assertEqual([p.nombre for p in piezas], ['Puerta', 'Pieza 2'])
+        self.assertEqual(piezas[0].ancho_cm, 6000.0)
+        self.assertEqual(piezas[0].ancho, 60)
+        self.assertEqual(piezas[0].cantidad, 2)
+
+    def test_filas_se_reconstruyen_al_cambiar_piezas(self):
+        opt = self.crear('Puerta,60,40,2')
+        opt.piezas = 'Estante,80,30,4'
+        opt.save()
+        self.assertEqual(list(opt.piezas_detalle.values_list('nombre', flat=True)), ['Estante'])
+
+        opt.favorito = True
+        opt.save(update_fields=['favorito'])
+        self.assertEqual(opt.piezas_detalle.count(), 1)
+
+    def test_filas_se_reconstruyen_al_cambiar_solo_la_unidad(self):
+        opt = Optimizacion.objects.get(pk=self.crear('Puerta,60,40,2').pk)
+        opt.unidad_medida = 'mm'
+        opt.save()
+        self.assertEqual(list(opt.piezas_detalle.values_list('ancho_cm', 'alto_cm')), [(6.0, 4.0)])
+
+        opt.unidad_medida = 'in'
+        opt.save(update_fields=['unidad_medida'])
+        self.assertEqual(opt.piezas_detalle.get().ancho_cm, 152.4)
+
+    def test_historial_busca_por_parte_del_nombre(self):
+        puerta = self.crear('Puerta Grande,60,40,1')
+        repisa = self.crear('Repisa estante,80,30,2')
+        self.crear('Cajón,40,20,2')
+        otro = User.objects.create_user('otro', password='test12345')
+        self.crear('Puerta,60,40,1', usuario=otro)
+
+        self.client.login(username='carpintero', password='test12345')
+        response = self.client.get(reverse('cutless:historial'), {'nombre_pieza': 'puer'})
+        encontradas = [item['optimizacion'].pk for item in response.context['optimizaciones_con_piezas']]
+        self.assertEqual(encontradas, [puerta.pk])
+
+        response = self.client.get(reverse('cutless:historial'), {'nombre_pieza': 'CAJON'})
+        self.assertEqual(len(response.context['optimizaciones_con_piezas']), 1)
+        self.assertContains(response, 'Cajón')
+
+        # No solo por el comienzo del nombre
+        response = self.client.get(reverse('cutless:historial'), {'nombre_pieza': 'estante'})
+        encontradas = [item['optimizacion'].pk for item in response.context['optimizaciones_con_piezas']]
+        self.assertEqual(encontradas, [repisa.pk])
@@ -1,11 +1,17 @@
+import os
+import tempfile
 from datetime import date
 from decimal import Decimal
+from unittest import mock
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.db import IntegrityError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-from cutless.models import Presupuesto
+from cutless.exports.pdf import generar_pdf_presupuesto, obtener_pdf_presupuesto, optimizaciones_presupuesto
+from cutless.models import Cliente, Optimizacion, Presupuesto
 
 
 class PresupuestoNumeroTests(TestCase):
@@ -47,3 +53,107 @@ class PresupuestoNumeroTests(TestCase):
         segundo = Presupuesto.generar_numero_presupuesto(usuario=self.usuario_a)
 
         self.assertNotEqual(primero, segundo)
+
+
+class PresupuestoPdfTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+        self.usuario.perfil.rol = 'usuario'
+        self.usuario.perfil.save()
+        optimizaciones = [
+            Optimizacion.objects.create(
+                usuario=self.usuario, ancho_tablero=100, alto_tablero=100,
+                piezas=f'Puerta,40,40,{i + 1}\nEstante,30,20,1', num_tableros=1, aprovechamiento_total=50.0,
+            )
+            for i in range(8)
+        ]
+        self.presupuesto = Presupuesto.objects.create(
+            usuario=self.usuario,
+            numero='PRE-2025-0001',
+            precio_tablero=Decimal('10000'),
+            mano_obra=Decimal('5000'),
+            costo_total=Decimal('35000'),
+            fecha_validez=date.today(),
+        )
+        self.presupuesto.optimizaciones.set(optimizaciones[-3:])
+
+    def test_consultas_no_dependen_del_historial(self):
+        # Números de lista + material, y piezas prefetch: sin recorrer el historial por ítem
+        with self.assertNumQueries(2):
+            optimizaciones = optimizaciones_presupuesto(self.presupuesto)
+            self.assertEqual(sorted(o.numero_lista for o in optimizaciones), [6, 7, 8])
+            self.assertEqual(len(optimizaciones[0].piezas_detalle.all()), 2)
+        with self.assertNumQueries(0):
+            ruta = generar_pdf_presupuesto(self.presupuesto, optimizaciones)
+        with open(ruta, 'rb') as archivo:
+            self.assertTrue(archivo.read().startswith(b'%PDF'))
+
+    def test_pdf_cacheado_por_fecha_actualizacion(self):
+        with mock.patch('cutless.exports.pdf.generar_pdf_presupuesto', wraps=generar_pdf_presupuesto) as generar:
+            self.client.login(username='carpintero', password='test12345')
+            url = reverse('cutless:generar_pdf_presupuesto', args=[self.presupuesto.pk])
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            response.close()
+            fecha = Presupuesto.objects.get(pk=self.presupuesto.pk).fecha_actualizacion
+            self.assertEqual(fecha, self.presupuesto.fecha_actualizacion)
+
+            self.client.get(url).close()
+            self.assertEqual(generar.call_count, 1)
+
+            self.presupuesto.notas = 'Incluye instalación'
+            self.presupuesto.save()
+            self.client.get(url).close()
+            self.assertEqual(generar.call_count, 2)
+
+    def test_mismo_numero_en_otro_usuario_no_comparte_pdf(self):
+        otro = User.objects.create_user('ajeno', password='test12345')
+        cliente_ajeno = Cliente.objects.create(usuario=otro, nombre='Cliente ajeno', rut='11.111.111-1')
+        ajeno = Presupuesto.objects.create(
+            usuario=otro, numero=self.presupuesto.numero, cliente=cliente_ajeno,
+            precio_tablero=Decimal('1'), mano_obra=Decimal('0'), costo_total=Decimal('1'),
+            fecha_validez=date.today(),
+        )
+
+        ruta = obtener_pdf_presupuesto(self.presupuesto)
+        with open(ruta, 'rb') as archivo:
+            propio = archivo.read()
+        ruta_ajena = obtener_pdf_presupuesto(ajeno)
+
+        self.assertNotEqual(ruta, ruta_ajena)
+        self.assertEqual(obtener_pdf_presupuesto(self.presupuesto), ruta)
+        with open(ruta, 'rb') as archivo:
+            self.assertEqual(archivo.read(), propio)
+
+    def test_editar_cliente_regenera_pdf(self):
+        cliente = Cliente.objects.create(usuario=self.usuario, nombre='Mueblería Sur')
+        self.presupuesto.cliente = cliente
+        self.presupuesto.save()
+        anterior = obtener_pdf_presupuesto(self.presupuesto)
+
+        cliente.telefono = '+56 9 1234 5678'
+        cliente.save()
+        presupuesto = Presupuesto.objects.get(pk=self.presupuesto.pk)
+        actual = obtener_pdf_presupuesto(presupuesto)
+
+        self.assertNotEqual(actual, anterior)
+        self.assertFalse(os.path.exists(anterior))
+
+    def test_pdf_a_medias_nunca_queda_en_su_ruta(self):
+        ruta = obtener_pdf_presupuesto(self.presupuesto)
+        os.remove(ruta)
+        with mock.patch('cutless.exports.pdf._dibujar_pdf_presupuesto', side_effect=RuntimeError('sin espacio')):
+            with self.assertRaises(RuntimeError):
+                obtener_pdf_presupuesto(self.presupuesto)
+
+        self.assertEqual(os.listdir(os.path.dirname(ruta)), [])
+        self.assertEqual(obtener_pdf_presupuesto(self.presupuesto), ruta)
+        with open(ruta, 'rb') as archivo:
+            self.assertTrue(archivo.read().rstrip().endswith(b'%%EOF'))
@@ -0,0 +1,160 @@
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from cutless.management.commands import reprocesar_resultados
+from cutless.management.commands.reprocesar_resultados import optimizaciones_pendientes
+from cutless.models import Optimizacion
+
+
+class PoolEnOrdenInverso:
+    """
+    Sustituye al pool de procesos en el mismo proceso (la base de datos de pruebas no es
+    visible desde otros): el primer lote enviado termina el último.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.retenido = None
+        self.enviados = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, funcion, *args):
+        self.enviados += 1
+        futuro = Future()
+        if self.enviados == 1:
+            self.retenido = (futuro, funcion, args)
+            return futuro
+        futuro.set_result(funcion(*args))
+        if self.enviados == 5:
+            retenido, funcion_retenida, args_retenidos = self.retenido
+            retenido.set_result(funcion_retenida(*args_retenidos))
+        return futuro
+
+
+class ReprocesarResultadosTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.checkpoint = os.path.join(directorio.name, 'avance.json')
+
+    def crear(self):
+        return Optimizacion.objects.create(
+            usuario=self.usuario, ancho_tablero=100, alto_tablero=100, piezas='Puerta,40,40,2',
+        )
+
+    def ejecutar(self, *args, procesos='1', stderr=None):
+        salida = io.StringIO()
+        call_command(
+            'reprocesar_resultados', '--procesos', procesos, '--lote', '1',
+            '--checkpoint', self.checkpoint, *args, stdout=salida, stderr=stderr or io.StringIO(),
+        )
+        return salida.getvalue()
+
+    def test_genera_resultados_pendientes(self):
+        opt1, opt2 = self.crear(), self.crear()
+        salida = self.ejecutar()
+
+        self.assertIn('2/2', salida)
+        for opt in (opt1, opt2):
+            opt.refresh_from_db()
+            self.assertTrue(opt.resultado_generado)
+            self.assertEqual(opt.tableros.count(), 1)
+            self.assertTrue(opt.pdf)
+        self.assertFalse(optimizaciones_pendientes().exists())
+        self.assertFalse(os.path.exists(self.checkpoint))
+        self.assertIn('No hay optimizaciones pendientes', self.ejecutar())
+
+    def test_reanuda_desde_checkpoint(self):
+        opt1, opt2 = self.crear(), self.crear()
+        with open(self.checkpoint, 'w', encoding='utf-8') as archivo:
+            json.dump({'ultimo_pk': opt1.pk, 'procesadas': 1, 'errores': 0, 'antes_de': None}, archivo)
+
+        salida = self.ejecutar()
+        self.assertIn('Reanudando', salida)
+        opt1.refresh_from_db()
+        opt2.refresh_from_db()
+        self.assertFalse(opt1.resultado_generado)
+        self.assertTrue(opt2.resultado_generado)
+
+        self.ejecutar('--desde-cero')
+        opt1.refresh_from_db()
+        self.assertTrue(opt1.resultado_generado)
+
+    def test_varios_procesos_checkpoint_solo_avanza_en_orden(self):
+        optimizaciones = [self.crear() for _ in range(5)]
+        guardados = []
+        guardar = reprocesar_resultados.Command._guardar_checkpoint
+
+        def registrar(comando, ruta, datos):
+            guardados.append(datos['ultimo_pk'])
+            guardar(comando, ruta, datos)
+
+        with mock.patch.object(reprocesar_resultados, 'ProcessPoolExecutor', PoolEnOrdenInverso), \
+                mock.patch.object(reprocesar_resultados.Command, '_guardar_checkpoint', registrar):
+            salida = self.ejecutar(procesos='2')
+
+        self.assertIn('5/5', salida)
+        # Mientras el primer lote sigue en curso el checkpoint no pasa de él
+        self.assertEqual(guardados[:3], [0, 0, 0])
+        self.assertEqual(guardados[-1], optimizaciones[-1].pk)
+        self.assertFalse(optimizaciones_pendientes().exists())
+
+    def test_sin_tableros_cuenta_como_error(self):
+        opt = self.crear()
+        errores = io.StringIO()
+        with mock.patch('cutless.services.renderizar_resultado_optimizacion', return_value=([], 0, {})):
+            salida = self.ejecutar(stderr=errores)
+        self.assertIn('1 error(es)', salida)
+        self.assertIn(f'#{opt.pk}', errores.getvalue())
+
+    def test_reintento_parte_de_la_fila_guardada(self):
+        opt = self.crear()
+        original = reprocesar_resultados.transaction.atomic
+        intentos = []
+
+        def atomic_que_falla_una_vez(*args, **kwargs):
+            intentos.append(1)
+            if len(intentos) == 1:
+                # Simula un fallo tras modificar la instancia en memoria
+                raise OperationalError('database is locked')
+            return original(*args, **kwargs)
+
+        with mock.patch.object(Optimizacion, 'refresh_from_db', autospec=True,
+                               side_effect=Optimizacion.refresh_from_db) as refrescar, \
+                mock.patch.object(reprocesar_resultados.transaction, 'atomic', atomic_que_falla_una_vez), \
+                mock.patch.object(reprocesar_resultados.time, 'sleep'):
+            self.ejecutar()
+        self.assertEqual(refrescar.call_count, 1)
+        opt.refresh_from_db()
+        self.assertTrue(opt.resultado_generado)
+
+
+class PoolSpawnTests(SimpleTestCase):
+    def test_los_procesos_spawn_arrancan_django(self):
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=contexto, initializer=reprocesar_resultados._inicializar_proceso,
+        ) as pool:
+            # Lote vacío: no consulta la base de datos (la de pruebas no es visible desde otro proceso)
+            self.assertEqual(pool.submit(reprocesar_resultados.procesar_lote, []).result(timeout=120), (0, []))
@@ -1,12 +1,33 @@
+import io
+import tempfile
+
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
+from PIL import Image
+
 from cutless.models import Optimizacion
+from cutless.render import RESOLUCIONES_TABLERO, generar_grafico
+from cutless.services import persistir_resultado_optimizacion, url_imagen_tablero
+from cutless.services.images import TAMANO_MINIATURA
 
 
-class IndexOptimizacionTests(TestCase):
+class MediaTemporalMixin:
+    """Escribe los archivos de la prueba en un MEDIA_ROOT temporal."""
+
     def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        super().setUp()
+
+
+class IndexOptimizacionTests(MediaTemporalMixin, TestCase):
+    def setUp(self):
+        super().setUp()
         self.usuario = User.objects.create_user('carpintero', password='test12345')
         self.usuario.perfil.rol = 'usuario'
         self.usuario.perfil.save()
@@ -35,3 +56,93 @@ class IndexOptimizacionTests(TestCase):
         optimizacion = Optimizacion.objects.get(usuario=self.usuario)
         self.assertGreater(optimizacion.aprovechamiento_total, 0)
         self.assertGreater(optimizacion.area_usada_total, 0)
+        tablero = optimizacion.tableros.get(numero=1)
+        self.assertContains(response, reverse('cutless:miniatura_tablero', args=[tablero.pk]))
+        self.assertNotContains(response, 'data:image/png;base64')
+
+
+class ImagenTableroTests(MediaTemporalMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+        self.client.login(username='carpintero', password='test12345')
+        imagenes, aprovechamiento, info = generar_grafico([(60, 40, 1)], 122, 244)
+        self.optimizacion = Optimizacion.objects.create(
+            usuario=self.usuario,
+            ancho_tablero=122,
+            alto_tablero=244,
+            piezas='Puerta,60,40,1',
+        )
+        persistir_resultado_optimizacion(self.optimizacion, imagenes, info, aprovechamiento)
+        self.tablero = self.optimizacion.tableros.get(numero=1)
+
+    def test_imagen_tablero_con_etag_y_get_condicional(self):
+        url = reverse('cutless:imagen_tablero', args=[self.tablero.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_miniatura_reduce_la_imagen(self):
+        url = reverse('cutless:miniatura_tablero', args=[self.tablero.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with Image.open(io.BytesIO(response.content)) as miniatura:
+            self.assertLessEqual(max(miniatura.size), TAMANO_MINIATURA)
+
+    def test_piramide_de_resoluciones_persistida(self):
+        imagenes, aprovechamiento, info = generar_grafico(
+            [(60, 40, 1)], 122, 244, resoluciones=RESOLUCIONES_TABLERO,
+        )
+        persistir_resultado_optimizacion(self.optimizacion, imagenes, info, aprovechamiento)
+        tablero = self.optimizacion.tableros.get(numero=1)
+        self.assertTrue(self.optimizacion.imagen_miniatura)
+
+        anchos = {}
+        for tamano in ('miniatura', 'media', 'impresion'):
+            response = self.client.get(url_imagen_tablero(tablero, tamano))
+            self.assertEqual(response.status_code, 200)
+            with Image.open(io.BytesIO(b''.join(response.streaming_content))) as imagen:
+                anchos[tamano] = imagen.size[0]
+        self.assertLess(anchos['miniatura'], anchos['media'])
+        self.assertLess(anchos['media'], anchos['impresion'])
+
+    def test_imagen_de_otro_usuario_no_existe(self):
+        User.objects.create_user('otro', password='test12345')
+        self.client.login(username='otro', password='test12345')
+        response = self.client.get(reverse('cutless:imagen_tablero', args=[self.tablero.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+class DescargaPdfTests(MediaTemporalMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.usuario = User.objects.create_user('carpintero', password='test12345')
+        self.client.login(username='carpintero', password='test12345')
+        imagenes, aprovechamiento, info = generar_grafico([(60, 40, 1)], 122, 244)
+        self.optimizacion = Optimizacion.objects.create(
+            usuario=self.usuario,
+            ancho_tablero=122,
+            alto_tablero=244,
+            piezas='Puerta,60,40,1',
+        )
+        persistir_resultado_optimizacion(self.optimizacion, imagenes, info, aprovechamiento)
+
+    def test_pdf_se_guarda_en_storage_y_se_descarga(self):
+        self.assertTrue(self.optimizacion.pdf)
+        response = self.client.get(reverse('cutless:descargar_pdf', args=[self.optimizacion.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    def test_pdf_se_regenera_si_falta_el_archivo(self):
+        self.optimizacion.pdf.delete(save=True)
+        response = self.client.get(reverse('cutless:descargar_pdf', args=[self.optimizacion.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.optimizacion.refresh_from_db()
+        self.assertTrue(self.optimizacion.pdf)
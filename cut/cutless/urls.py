@@ -34,6 +34,16 @@ urlpatterns = [
         auth_perm('puede_ver_estadisticas', views.exportar_pdf_desperdicio),
         name='exportar_pdf_desperdicio',
     ),
+    path(
+        'estadisticas/exportar-datos/',
+        auth_perm('puede_ver_estadisticas', views.exportar_datos),
+        name='exportar_datos',
+    ),
+    path(
+        'estadisticas/datos/',
+        auth_perm('puede_ver_estadisticas', views.datos_estadisticas),
+        name='datos_estadisticas',
+    ),
 
     # Acciones sobre optimizaciones (propias del usuario)
     path('editar/<int:pk>/', auth(views.editar_optimizacion), name='editar_optimizacion'),
@@ -56,6 +66,26 @@ urlpatterns = [
     # API
     path('api/tableros/<int:pk>/', auth(views.api_tableros_optimizacion), name='api_tableros'),
 
+    # Imágenes de tableros persistidos (con caché HTTP)
+    path('imagenes/tablero/<int:pk>/', auth(views.imagen_tablero), name='imagen_tablero'),
+    path(
+        'imagenes/tablero/<int:pk>/miniatura/',
+        auth(views.imagen_tablero),
+        {'tamano': 'miniatura'},
+        name='miniatura_tablero',
+    ),
+    path(
+        'imagenes/tablero/<int:pk>/impresion/',
+        auth(views.imagen_tablero),
+        {'tamano': 'impresion'},
+        name='impresion_tablero',
+    ),
+    path(
+        'imagenes/plan-corte/<int:pk>/<int:numero>/',
+        auth(views.imagen_plan_corte),
+        name='plan_corte_tablero',
+    ),
+
     # Gestión de materiales
     path('materiales/', auth_perm('puede_crear_materiales', views.lista_materiales), name='lista_materiales'),
     path('materiales/crear/', auth_perm('puede_crear_materiales', views.crear_material), name='crear_material'),
@@ -83,6 +113,11 @@ urlpatterns = [
 
     # Historial de costos
     path('historial-costos/', auth_perm('puede_ver_historial_costos', views.historial_costos), name='historial_costos'),
+    path(
+        'historial-costos/datos/',
+        auth_perm('puede_ver_historial_costos', views.datos_costos),
+        name='datos_costos',
+    ),
 
     # Gestión de proyectos
     path('proyectos/', auth_perm('puede_crear_proyectos', views.lista_proyectos), name='lista_proyectos'),
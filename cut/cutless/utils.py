@@ -26,12 +26,12 @@ from .packing import (
 )
 from .pieces import (
     mensaje_advertencia_piezas_no_colocadas,
+    normalizar_nombre_pieza,
     parsear_piezas_desde_texto,
 )
 from .render import (
+    RESOLUCIONES_TABLERO,
     generar_grafico,
-    generar_grafico_aprovechamiento,
-    generar_grafico_desperdicio,
 )
 from .units import (
     convertir_a_cm,
@@ -42,19 +42,19 @@ from .units import (
 
 __all__ = [
     'INFO_DESPERDICIO_CAMPOS',
+    'RESOLUCIONES_TABLERO',
     'convertir_a_cm',
     'convertir_desde_cm',
     'generar_excel',
     'generar_excel_historial_costos',
     'generar_excel_resumen_desperdicio',
     'generar_grafico',
-    'generar_grafico_aprovechamiento',
-    'generar_grafico_desperdicio',
     'generar_pdf',
     'generar_pdf_presupuesto',
     'generar_pdf_resumen_desperdicio',
     'mensaje_advertencia_piezas_no_colocadas',
     'normalizar_info_desperdicio',
+    'normalizar_nombre_pieza',
     'obtener_simbolo_area',
     'obtener_simbolo_unidad',
     'optimizar_corte',
@@ -1,23 +1,24 @@
 import os
+import tempfile
 from datetime import timedelta
 from decimal import Decimal
 
 from django.conf import settings
 from django.contrib import messages
-from django.db.models import Avg
-from django.http import FileResponse
+from django.db.models import DecimalField, ExpressionWrapper, F
+from django.http import FileResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 
-from ..models import Optimizacion
+from ..exports import parquet_disponible
+from ..fechas import fecha_parametro, limites_dia
+from ..models import EstadisticaDiaria, Optimizacion
+from ..services import grafico_cacheado, resumen_disposicion, serie_costos, serie_estadisticas
 from ..utils import (
-    convertir_a_cm,
     convertir_desde_cm,
     generar_excel_historial_costos,
     generar_excel_resumen_desperdicio,
-    generar_grafico,
-    generar_grafico_aprovechamiento,
-    generar_grafico_desperdicio,
     generar_pdf_resumen_desperdicio,
     parsear_piezas_desde_texto,
 )
@@ -111,56 +112,41 @@ def calcular_tiempo_corte(request, pk):
         'velocidad_corte_cm_min': round(velocidad_corte * 60, 0),
     })
 
+def _inicio_periodo(periodo):
+    """Primer día (local) del período de estadísticas; None para 'todos'."""
+    dias_periodo = {'semanal': 7, 'mensual': 30, 'anual': 365}.get(periodo)
+    return timezone.localdate() - timedelta(days=dias_periodo) if dias_periodo else None
+
+def _estadisticas_periodo(usuario, periodo):
+    """
+    Optimizaciones del período (desde el inicio del día límite) y sus estadísticas
+    generales, leídas de los resúmenes diarios en lugar de recorrer el historial.
+    """
+    optimizaciones = Optimizacion.objects.filter(usuario=usuario)
+    desde = _inicio_periodo(periodo)
+    if desde:
+        fecha_limite, _ = limites_dia(desde)
+        optimizaciones = optimizaciones.filter(fecha__gte=fecha_limite)
+    # 'todos' no necesita filtro
+
+    resumen = EstadisticaDiaria.resumen(usuario, desde=desde)
+    promedio_aprovechamiento = resumen['promedio_aprovechamiento']
+    estadisticas = {
+        'total_optimizaciones': resumen['num_optimizaciones'],
+        'promedio_aprovechamiento': promedio_aprovechamiento,
+        'max_aprovechamiento': resumen['max_aprovechamiento'],
+        'min_aprovechamiento': resumen['min_aprovechamiento'],
+        'promedio_desperdicio': 100 - promedio_aprovechamiento if resumen['num_optimizaciones'] else 0,
+    }
+    return optimizaciones, estadisticas
+
 def exportar_pdf_desperdicio(request):
     """
     Exporta un PDF con el resumen de desperdicio desde estadísticas.
     """
     try:
-        # Obtener todas las optimizaciones del usuario
-        todas_optimizaciones = Optimizacion.objects.filter(usuario=request.user)
-        
-        # Obtener período seleccionado
         periodo = request.GET.get('periodo', 'todos')
-        
-        # Filtrar por período
-        ahora = timezone.now()
-        optimizaciones_filtradas = todas_optimizaciones
-        
-        if periodo == 'semanal':
-            fecha_limite = ahora - timedelta(days=7)
-            optimizaciones_filtradas = todas_optimizaciones.filter(fecha__gte=fecha_limite)
-        elif periodo == 'mensual':
-            fecha_limite = ahora - timedelta(days=30)
-            optimizaciones_filtradas = todas_optimizaciones.filter(fecha__gte=fecha_limite)
-        elif periodo == 'anual':
-            fecha_limite = ahora - timedelta(days=365)
-            optimizaciones_filtradas = todas_optimizaciones.filter(fecha__gte=fecha_limite)
-        
-        # Calcular estadísticas
-        total_optimizaciones = optimizaciones_filtradas.count()
-        
-        if total_optimizaciones > 0:
-            promedio_aprovechamiento = optimizaciones_filtradas.aggregate(
-                avg=Avg('aprovechamiento_total')
-            )['avg'] or 0
-            max_aprovechamiento = optimizaciones_filtradas.order_by('-aprovechamiento_total').first()
-            max_aprovech_val = max_aprovechamiento.aprovechamiento_total if max_aprovechamiento else 0
-            min_aprovechamiento = optimizaciones_filtradas.order_by('aprovechamiento_total').first()
-            min_aprovech_val = min_aprovechamiento.aprovechamiento_total if min_aprovechamiento else 0
-            promedio_desperdicio = 100 - promedio_aprovechamiento
-        else:
-            promedio_aprovechamiento = 0
-            max_aprovech_val = 0
-            min_aprovech_val = 0
-            promedio_desperdicio = 0
-        
-        estadisticas = {
-            'total_optimizaciones': total_optimizaciones,
-            'promedio_aprovechamiento': promedio_aprovechamiento,
-            'max_aprovechamiento': max_aprovech_val,
-            'min_aprovechamiento': min_aprovech_val,
-            'promedio_desperdicio': promedio_desperdicio,
-        }
+        optimizaciones_filtradas, estadisticas = _estadisticas_periodo(request.user, periodo)
         
         # Generar PDF
         pdf_path = generar_pdf_resumen_desperdicio(optimizaciones_filtradas, estadisticas, periodo)
@@ -174,61 +160,27 @@ def exportar_pdf_desperdicio(request):
         messages.error(request, f"Error generando PDF: {e}")
         return redirect('cutless:estadisticas')
 
+def _respuesta_excel(archivo, nombre_archivo):
+    """Envía en streaming un libro ya escrito en un archivo temporal (se cierra al terminar)."""
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=nombre_archivo,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
 def exportar_excel_desperdicio(request):
     """
     Exporta un Excel con el resumen de desperdicio desde estadísticas.
     """
-    from django.http import HttpResponse
-
     try:
-        # Obtener todas las optimizaciones del usuario
-        todas_optimizaciones = Optimizacion.objects.filter(usuario=request.user)
-        
-        # Obtener período seleccionado
         periodo = request.GET.get('periodo', 'todos')
+        optimizaciones_filtradas, estadisticas = _estadisticas_periodo(request.user, periodo)
         
-        # Filtrar por período
-        ahora = timezone.now()
-        optimizaciones_filtradas = todas_optimizaciones
-        
-        if periodo == 'semanal':
-            fecha_limite = ahora - timedelta(days=7)
-            optimizaciones_filtradas = todas_optimizaciones.filter(fecha__gte=fecha_limite)
-        elif periodo == 'mensual':
-            fecha_limite = ahora - timedelta(days=30)
-            optimizaciones_filtradas = todas_optimizaciones.filter(fecha__gte=fecha_limite)
-        elif periodo == 'anual':
-            fecha_limite = ahora - timedelta(days=365)
-            optimizaciones_filtradas = todas_optimizaciones.filter(fecha__gte=fecha_limite)
-        
-        # Calcular estadísticas
-        total_optimizaciones = optimizaciones_filtradas.count()
-        
-        if total_optimizaciones > 0:
-            promedio_aprovechamiento = optimizaciones_filtradas.aggregate(
-                avg=Avg('aprovechamiento_total')
-            )['avg'] or 0
-            max_aprovechamiento = optimizaciones_filtradas.order_by('-aprovechamiento_total').first()
-            max_aprovech_val = max_aprovechamiento.aprovechamiento_total if max_aprovechamiento else 0
-            min_aprovechamiento = optimizaciones_filtradas.order_by('aprovechamiento_total').first()
-            min_aprovech_val = min_aprovechamiento.aprovechamiento_total if min_aprovechamiento else 0
-            promedio_desperdicio = 100 - promedio_aprovechamiento
-        else:
-            promedio_aprovechamiento = 0
-            max_aprovech_val = 0
-            min_aprovech_val = 0
-            promedio_desperdicio = 0
-        
-        estadisticas = {
-            'total_optimizaciones': total_optimizaciones,
-            'promedio_aprovechamiento': promedio_aprovechamiento,
-            'max_aprovechamiento': max_aprovech_val,
-            'min_aprovechamiento': min_aprovech_val,
-            'promedio_desperdicio': promedio_desperdicio,
-        }
-        
-        # Generar Excel
-        buffer = generar_excel_resumen_desperdicio(optimizaciones_filtradas, estadisticas, periodo)
+        # Generar Excel en un archivo temporal (memoria constante) y enviarlo en streaming
+        archivo = generar_excel_resumen_desperdicio(
+            optimizaciones_filtradas, estadisticas, periodo, destino=tempfile.TemporaryFile(),
+        )
         
         # Preparar respuesta
         periodo_nombre = {
@@ -239,17 +191,23 @@ def exportar_excel_desperdicio(request):
         }.get(periodo, 'todos')
         
         filename = f"resumen_desperdicio_{periodo_nombre}_{timezone.now().strftime('%Y%m%d')}.xlsx"
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+        return _respuesta_excel(archivo, filename)
         
     except Exception as e:
         messages.error(request, f"Error generando Excel: {e}")
         return redirect('cutless:estadisticas')
 
+def datos_estadisticas(request):
+    """
+    Serie agregada de aprovechamiento y desperdicio del período (JSON), que la página
+    de estadísticas dibuja en el navegador.
+    """
+    periodo = request.GET.get('periodo', 'todos')
+    desde = _inicio_periodo(periodo)
+    respuesta = JsonResponse(serie_estadisticas(request.user, periodo, desde=desde))
+    patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
+
 def estadisticas(request):
     """
     Vista para mostrar estadísticas, gráficos y top de optimizaciones.
@@ -257,95 +215,32 @@ def estadisticas(request):
     IMPORTANTE: Todos los datos están filtrados por usuario (request.user).
     Cada usuario solo ve sus propias optimizaciones y estadísticas.
     """
-    # Obtener todas las optimizaciones del usuario actual (filtrado por seguridad)
-    todas_optimizaciones = Optimizacion.objects.filter(usuario=request.user).order_by('fecha')
-    
     # Obtener período seleccionado
     periodo = request.GET.get('periodo', 'todos')
     
-    # Filtrar por período
-    ahora = timezone.now()
-    optimizaciones_filtradas = todas_optimizaciones
-    
-    if periodo == 'semanal':
-        fecha_limite = ahora - timedelta(days=7)
-        optimizaciones_filtradas = todas_optimizaciones.filter(fecha__gte=fecha_limite)
-    elif periodo == 'mensual':
-        fecha_limite = ahora - timedelta(days=30)
-        optimizaciones_filtradas = todas_optimizaciones.filter(fecha__gte=fecha_limite)
-    elif periodo == 'anual':
-        fecha_limite = ahora - timedelta(days=365)
-        optimizaciones_filtradas = todas_optimizaciones.filter(fecha__gte=fecha_limite)
-    # 'todos' no necesita filtro
-    
-    # Calcular estadísticas generales
-    total_optimizaciones = optimizaciones_filtradas.count()
+    # Optimizaciones del usuario actual (filtrado por seguridad) y resumen del período
+    optimizaciones_filtradas, estadisticas = _estadisticas_periodo(request.user, periodo)
+    total_optimizaciones = estadisticas['total_optimizaciones']
     
     if total_optimizaciones > 0:
-        # Estadísticas de aprovechamiento
-        promedio_aprovechamiento = optimizaciones_filtradas.aggregate(
-            avg=Avg('aprovechamiento_total')
-        )['avg'] or 0
-        
-        max_aprovechamiento = optimizaciones_filtradas.order_by('-aprovechamiento_total').first()
-        max_aprovech_val = max_aprovechamiento.aprovechamiento_total if max_aprovechamiento else 0
-        
-        min_aprovechamiento = optimizaciones_filtradas.order_by('aprovechamiento_total').first()
-        min_aprovech_val = min_aprovechamiento.aprovechamiento_total if min_aprovechamiento else 0
-        
-        # Estadísticas de desperdicio (calculado)
-        promedio_desperdicio = 100 - promedio_aprovechamiento
+        promedio_aprovechamiento = estadisticas['promedio_aprovechamiento']
+        max_aprovech_val = estadisticas['max_aprovechamiento']
+        min_aprovech_val = estadisticas['min_aprovechamiento']
+        promedio_desperdicio = estadisticas['promedio_desperdicio']
         
         # Top 10 optimizaciones (mayor aprovechamiento)
-        top_optimizaciones = optimizaciones_filtradas.order_by('-aprovechamiento_total')[:10]
+        top_optimizaciones = optimizaciones_filtradas.order_by('-aprovechamiento_total').prefetch_related('piezas_detalle')[:10]
         
-        # Generar gráficos (versión normal y alta resolución)
-        grafico_aprovechamiento = generar_grafico_aprovechamiento(
-            optimizaciones_filtradas.order_by('fecha'), periodo, alta_resolucion=False
-        )
-        grafico_aprovechamiento_hd = generar_grafico_aprovechamiento(
-            optimizaciones_filtradas.order_by('fecha'), periodo, alta_resolucion=True
-        )
-        grafico_desperdicio = generar_grafico_desperdicio(
-            optimizaciones_filtradas.order_by('fecha'), periodo, alta_resolucion=False
-        )
-        grafico_desperdicio_hd = generar_grafico_desperdicio(
-            optimizaciones_filtradas.order_by('fecha'), periodo, alta_resolucion=True
-        )
     else:
         promedio_aprovechamiento = 0
         max_aprovech_val = 0
         min_aprovech_val = 0
         promedio_desperdicio = 0
         top_optimizaciones = []
-        grafico_aprovechamiento = None
-        grafico_aprovechamiento_hd = None
-        grafico_desperdicio = None
-        grafico_desperdicio_hd = None
     
     # Procesar top optimizaciones para el template
     top_optimizaciones_list = []
     for idx, opt in enumerate(top_optimizaciones, start=1):
-        # Parsear piezas
-        piezas_procesadas = []
-        for linea in opt.piezas.splitlines():
-            if linea.strip():
-                partes = linea.split(',')
-                if len(partes) == 4:
-                    piezas_procesadas.append({
-                        'nombre': partes[0].strip(),
-                        'ancho': partes[1].strip(),
-                        'alto': partes[2].strip(),
-                        'cantidad': partes[3].strip()
-                    })
-                elif len(partes) == 3:
-                    piezas_procesadas.append({
-                        'nombre': 'Pieza',
-                        'ancho': partes[0].strip(),
-                        'alto': partes[1].strip(),
-                        'cantidad': partes[2].strip()
-                    })
-        
         # Obtener unidad y convertir dimensiones para mostrar
         unidad_opt = getattr(opt, 'unidad_medida', 'cm') or 'cm'
         ancho_mostrar = round(convertir_desde_cm(opt.ancho_tablero, unidad_opt), 2)
@@ -354,7 +249,7 @@ def estadisticas(request):
         top_optimizaciones_list.append({
             'optimizacion': opt,
             'posicion': idx,
-            'piezas': piezas_procesadas,
+            'piezas': opt.piezas_detalle.all(),
             'ancho_mostrar': ancho_mostrar,
             'alto_mostrar': alto_mostrar,
             'unidad_medida': unidad_opt,
@@ -367,81 +262,99 @@ def estadisticas(request):
         'min_aprovechamiento': round(min_aprovech_val, 2),
         'promedio_desperdicio': round(promedio_desperdicio, 2),
         'top_optimizaciones': top_optimizaciones_list,
-        'grafico_aprovechamiento': grafico_aprovechamiento,
-        'grafico_aprovechamiento_hd': grafico_aprovechamiento_hd,
-        'grafico_desperdicio': grafico_desperdicio,
-        'grafico_desperdicio_hd': grafico_desperdicio_hd,
         'periodo': periodo,
         'optimizaciones_filtradas': optimizaciones_filtradas,
+        # Exportación de datos en columnas (mismo período que la página)
+        'tablas_exportacion': [('optimizaciones', 'Optimizaciones'), ('tableros', 'Tableros'), ('piezas', 'Piezas')],
+        'parquet_disponible': parquet_disponible(),
+        'exportar_desde': _inicio_periodo(periodo),
     })
 
+def _anotar_costos(optimizaciones):
+    """Anota costo_material (num_tableros × precio_tablero) y costo_total (+ mano de obra) en la BD."""
+    dinero = DecimalField(max_digits=14, decimal_places=2)
+    return optimizaciones.annotate(
+        costo_material_calc=ExpressionWrapper(F('num_tableros') * F('precio_tablero'), output_field=dinero),
+    ).annotate(
+        costo_total_calc=ExpressionWrapper(F('costo_material_calc') + F('mano_obra'), output_field=dinero),
+    )
+
+def _filas_costo(optimizaciones):
+    """Filas del detalle de costos a partir de optimizaciones anotadas con _anotar_costos."""
+    for opt in optimizaciones:
+        yield {
+            'optimizacion': opt,
+            'costo_total': opt.costo_total_calc,
+            'costo_material': opt.costo_material_calc,
+            'costo_mano_obra': opt.mano_obra,
+        }
+
+def datos_costos(request):
+    """
+    Serie de costo total por día (JSON) que el historial de costos dibuja en el navegador,
+    cacheada por usuario y versión de datos. Parámetros GET: fecha_desde / fecha_hasta.
+    """
+    dia_desde = fecha_parametro(request.GET.get('fecha_desde', '').strip())
+    dia_hasta = fecha_parametro(request.GET.get('fecha_hasta', '').strip())
+    serie = grafico_cacheado(
+        request.user.pk, 'costos', lambda: serie_costos(request.user, dia_desde, dia_hasta), dia_desde, dia_hasta,
+    )
+    respuesta = JsonResponse(serie)
+    patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
+
 def historial_costos(request):
     """
     Vista de historial de costos con gráficos y filtros por fecha.
     Soporta exportación a Excel.
     """
     # Obtener todas las optimizaciones con costos del usuario
-    optimizaciones = Optimizacion.objects.filter(usuario=request.user).exclude(
-        precio_tablero__isnull=True
-    ).order_by('-fecha')
+    # (la condición coincide con el índice parcial opt_usuario_costo_fecha_idx)
+    optimizaciones = _anotar_costos(
+        Optimizacion.objects.filter(
+            usuario=request.user,
+            precio_tablero__isnull=False,
+        ).select_related('material').order_by('-fecha', '-pk')
+    )
     
-    # Filtros por fecha
+    # Filtros por fecha (días completos en la zona horaria local)
     fecha_desde = request.GET.get('fecha_desde', '').strip()
     fecha_hasta = request.GET.get('fecha_hasta', '').strip()
+    dia_desde = dia_hasta = None
     
     if fecha_desde:
         try:
             from datetime import datetime
-            fecha_desde_obj = datetime.strptime(fecha_desde, '%Y-%m-%d')
-            optimizaciones = optimizaciones.filter(fecha__gte=fecha_desde_obj)
+            dia_desde = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
+            optimizaciones = optimizaciones.filter(fecha__gte=limites_dia(dia_desde)[0])
         except ValueError:
             pass
     
     if fecha_hasta:
         try:
-            from datetime import datetime, timedelta
-            fecha_hasta_obj = datetime.strptime(fecha_hasta, '%Y-%m-%d') + timedelta(days=1)
-            optimizaciones = optimizaciones.filter(fecha__lt=fecha_hasta_obj)
+            from datetime import datetime
+            dia_hasta = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
+            optimizaciones = optimizaciones.filter(fecha__lt=limites_dia(dia_hasta)[1])
         except ValueError:
             pass
     
-    # Calcular estadísticas
-    total_optimizaciones = optimizaciones.count()
-    costo_total = Decimal('0.00')
-    costo_material_total = Decimal('0.00')
-    costo_mano_obra_total = Decimal('0.00')
-    num_tableros_total = 0
-    aprovechamiento_total = Decimal('0.00')
-    
-    optimizaciones_con_costo = []
-    for opt in optimizaciones:
-        costo = opt.get_costo_total()
-        if costo:
-            costo_total += costo
-            costo_material = Decimal(str(opt.num_tableros or 0)) * opt.precio_tablero if opt.precio_tablero else Decimal('0.00')
-            costo_material_total += costo_material
-            costo_mano_obra_total += opt.mano_obra
-            num_tableros_total += opt.num_tableros or 0
-            aprovechamiento_total += Decimal(str(opt.aprovechamiento_total or 0))
-            
-            optimizaciones_con_costo.append({
-                'optimizacion': opt,
-                'costo_total': costo,
-                'costo_material': costo_material,
-                'costo_mano_obra': opt.mano_obra,
-            })
+    # Totales desde los resúmenes diarios (no recorre el historial)
+    resumen = EstadisticaDiaria.resumen(request.user, desde=dia_desde, hasta=dia_hasta)
+    total_optimizaciones = resumen['num_con_costo']
+    costo_total = resumen['costo_total']
+    costo_material_total = resumen['costo_material']
+    costo_mano_obra_total = resumen['costo_mano_obra']
+    num_tableros_total = resumen['num_tableros_con_costo']
     
     # Calcular estadísticas adicionales
     costo_promedio = costo_total / total_optimizaciones if total_optimizaciones > 0 else Decimal('0.00')
     costo_por_tablero = costo_total / num_tableros_total if num_tableros_total > 0 else Decimal('0.00')
     porcentaje_material = (costo_material_total / costo_total * 100) if costo_total > 0 else Decimal('0.00')
     porcentaje_mano_obra = (costo_mano_obra_total / costo_total * 100) if costo_total > 0 else Decimal('0.00')
-    aprovechamiento_promedio = aprovechamiento_total / total_optimizaciones if total_optimizaciones > 0 else Decimal('0.00')
+    aprovechamiento_promedio = Decimal(str(resumen['promedio_aprovechamiento_con_costo']))
     
     # Verificar si se solicita exportación a Excel
     if request.GET.get('export') == 'excel':
-        from django.http import HttpResponse
-
         estadisticas = {
             'total_optimizaciones': total_optimizaciones,
             'costo_total': float(costo_total),
@@ -455,11 +368,12 @@ def historial_costos(request):
             'aprovechamiento_promedio': float(aprovechamiento_promedio),
         }
         
-        excel_buffer = generar_excel_historial_costos(
-            optimizaciones_con_costo,
+        archivo = generar_excel_historial_costos(
+            _filas_costo(optimizaciones.iterator(chunk_size=2000)),
             estadisticas,
             fecha_desde=fecha_desde if fecha_desde else None,
-            fecha_hasta=fecha_hasta if fecha_hasta else None
+            fecha_hasta=fecha_hasta if fecha_hasta else None,
+            destino=tempfile.TemporaryFile(),
         )
         
         # Generar nombre de archivo
@@ -467,44 +381,24 @@ def historial_costos(request):
         fecha_actual = datetime.now().strftime('%Y%m%d_%H%M%S')
         nombre_archivo = f"historial_costos_{fecha_actual}.xlsx"
         
-        response = HttpResponse(
-            excel_buffer.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
-        
-        return response
+        return _respuesta_excel(archivo, nombre_archivo)
     
-    # Generar gráfico de costos por fecha
-    grafico_costos_base64 = None
-    if optimizaciones_con_costo:
-        fechas = [opt['optimizacion'].fecha.date() for opt in optimizaciones_con_costo]
-        costos = [float(opt['costo_total']) for opt in optimizaciones_con_costo]
-        
-        import matplotlib.pyplot as plt
-        import matplotlib.dates as mdates
-        from io import BytesIO
-        import base64
-        
-        plt.figure(figsize=(12, 6))
-        plt.plot(fechas, costos, marker='o', linestyle='-', linewidth=2, markersize=6)
-        plt.title('Evolución de Costos', fontsize=16, fontweight='bold')
-        plt.xlabel('Fecha', fontsize=12)
-        plt.ylabel('Costo Total ($)', fontsize=12)
-        plt.grid(True, alpha=0.3)
-        plt.xticks(rotation=45)
-        plt.gcf().autofmt_xdate()
-        plt.tight_layout()
-        
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-        buffer.seek(0)
-        grafico_costos_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-        plt.close()
-        buffer.close()
+    # Listado paginado (las filas de la página se leen ya con sus costos calculados)
+    from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+    paginator = Paginator(optimizaciones, 25)
+    page = request.GET.get('page', 1)
+    try:
+        optimizaciones_page = paginator.page(page)
+    except PageNotAnInteger:
+        optimizaciones_page = paginator.page(1)
+    except EmptyPage:
+        optimizaciones_page = paginator.page(paginator.num_pages)
+    optimizaciones_con_costo = list(_filas_costo(optimizaciones_page))
     
     return render(request, 'cutless/historial_costos.html', {
         'optimizaciones_con_costo': optimizaciones_con_costo,
+        'page_obj': optimizaciones_page,
+        'paginator': paginator,
         'total_optimizaciones': total_optimizaciones,
         'costo_total': costo_total,
         'costo_material_total': costo_material_total,
@@ -517,130 +411,91 @@ def historial_costos(request):
         'aprovechamiento_promedio': aprovechamiento_promedio,
         'fecha_desde': fecha_desde,
         'fecha_hasta': fecha_hasta,
-        'grafico_costos_base64': grafico_costos_base64,
     })
 
+MAX_OPTIMIZACIONES_COMPARAR = 4
+
+def _diferencia(valor, base):
+    if valor is None or base is None:
+        return None
+    return valor - base
+
 def comparar_optimizaciones(request):
     """
-    Vista para seleccionar y comparar dos optimizaciones lado a lado.
+    Vista para seleccionar y comparar varias optimizaciones lado a lado (hasta
+    MAX_OPTIMIZACIONES_COMPARAR), incluido el aprovechamiento de cada tablero.
+    Las diferencias se calculan respecto de la primera seleccionada.
     """
     optimizaciones = Optimizacion.objects.filter(usuario=request.user).order_by('-fecha')
     
-    # Si se seleccionaron dos optimizaciones para comparar
-    opt1_id = request.GET.get('opt1')
-    opt2_id = request.GET.get('opt2')
+    # ?opt=1&opt=2&opt=3 (se aceptan también los antiguos opt1/opt2)
+    ids_seleccionados = request.GET.getlist('opt') or [
+        valor for valor in (request.GET.get('opt1'), request.GET.get('opt2')) if valor
+    ]
+    ids = []
+    for valor in ids_seleccionados:
+        if valor.isdigit() and int(valor) not in ids:
+            ids.append(int(valor))
+    if len(ids) > MAX_OPTIMIZACIONES_COMPARAR:
+        messages.warning(request, f"Solo se pueden comparar hasta {MAX_OPTIMIZACIONES_COMPARAR} optimizaciones a la vez.")
+        ids = ids[:MAX_OPTIMIZACIONES_COMPARAR]
     
-    optimizacion1 = None
-    optimizacion2 = None
-    
-    # Calcular diferencias y desperdicios
-    diferencia_aprovechamiento = None
-    diferencia_tableros = None
-    diferencia_desperdicio = None
-    desperdicio1 = None
-    desperdicio2 = None
-    
-    if opt1_id and opt2_id:
-        try:
-            optimizacion1 = Optimizacion.objects.get(pk=opt1_id, usuario=request.user)
-            optimizacion2 = Optimizacion.objects.get(pk=opt2_id, usuario=request.user)
-            
-            # Calcular num_tableros si no está guardado (para optimizaciones antiguas)
-            def obtener_num_tableros(optimizacion):
-                """Obtiene el número de tableros, calculándolo si no está guardado"""
-                if optimizacion.num_tableros and optimizacion.num_tableros > 0:
-                    return optimizacion.num_tableros
-                
-                # Si no está guardado, calcularlo desde las piezas (tuplas ancho×alto×cantidad en cm)
-                try:
-                    piezas_para_grafico = []
-                    unidad = getattr(optimizacion, 'unidad_medida', 'cm') or 'cm'
-                    for linea in optimizacion.piezas.splitlines():
-                        if linea.strip():
-                            partes = linea.split(',')
-                            if len(partes) >= 3:
-                                cantidad = int(partes[-1]) if len(partes) >= 4 else int(partes[2])
-                                ancho_idx = 1 if len(partes) >= 4 else 0
-                                alto_idx = 2 if len(partes) >= 4 else 1
-                                ancho = float(partes[ancho_idx])
-                                alto = float(partes[alto_idx])
-                                piezas_para_grafico.append((
-                                    convertir_a_cm(ancho, unidad),
-                                    convertir_a_cm(alto, unidad),
-                                    cantidad,
-                                ))
-
-                    if piezas_para_grafico:
-                        margen = getattr(optimizacion, 'margen_corte', 0.3) or 0.3
-                        permitir_rot = getattr(optimizacion, 'permitir_rotacion', True)
-                        imagenes_calc, _, _ = generar_grafico(
-                            piezas_para_grafico,
-                            optimizacion.ancho_tablero,
-                            optimizacion.alto_tablero,
-                            unidad='cm',
-                            permitir_rotacion=permitir_rot,
-                            margen_corte=margen
-                        )
-                        return len(imagenes_calc)
-                except Exception:
-                    pass
-                
-                # Fallback: estimar desde el área
-                try:
-                    area_tablero = optimizacion.ancho_tablero * optimizacion.alto_tablero
-                    area_total = 0
-                    for linea in optimizacion.piezas.splitlines():
-                        if linea.strip():
-                            partes = linea.split(',')
-                            if len(partes) >= 3:
-                                cantidad = int(partes[-1]) if len(partes) >= 4 else int(partes[2])
-                                ancho_idx = 1 if len(partes) >= 4 else 0
-                                alto_idx = 2 if len(partes) >= 4 else 1
-                                ancho = float(partes[ancho_idx])
-                                alto = float(partes[alto_idx])
-                                unidad = getattr(optimizacion, 'unidad_medida', 'cm') or 'cm'
-                                ancho_cm = convertir_a_cm(ancho, unidad)
-                                alto_cm = convertir_a_cm(alto, unidad)
-                                area_total += (ancho_cm * alto_cm) * cantidad
-                    if area_tablero > 0:
-                        return max(1, int(area_total / area_tablero) + 1)
-                except Exception:
-                    pass
-                
-                return 1  # Valor por defecto
-            
-            num_tableros1 = obtener_num_tableros(optimizacion1)
-            num_tableros2 = obtener_num_tableros(optimizacion2)
-            
-            # Actualizar num_tableros si estaba en 0 (para guardarlo en la BD)
-            if optimizacion1.num_tableros == 0 and num_tableros1 > 0:
-                optimizacion1.num_tableros = num_tableros1
-                optimizacion1.save(update_fields=['num_tableros'])
-            if optimizacion2.num_tableros == 0 and num_tableros2 > 0:
-                optimizacion2.num_tableros = num_tableros2
-                optimizacion2.save(update_fields=['num_tableros'])
-            
-            # Calcular diferencias
-            diferencia_aprovechamiento = optimizacion2.aprovechamiento_total - optimizacion1.aprovechamiento_total
-            diferencia_tableros = num_tableros2 - num_tableros1
+    comparadas = []
+    filas_tableros = []
+    if len(ids) >= 2:
+        encontradas = Optimizacion.objects.filter(
+            pk__in=ids, usuario=request.user,
+        ).select_related('material').prefetch_related('tableros', 'piezas_detalle').in_bulk()
+        if len(encontradas) != len(ids):
+            messages.error(request, "Una o más optimizaciones no fueron encontradas.")
+            return redirect('cutless:comparar_optimizaciones')
+        
+        for numero, pk in enumerate(ids, start=1):
+            optimizacion = encontradas[pk]
+            # Tableros guardados o, en registros antiguos, solo el motor de corte (sin dibujar)
+            _, info = resumen_disposicion(optimizacion)
+            num_tableros = optimizacion.num_tableros or info['num_tableros']
             
-            # Calcular desperdicios (100% - aprovechamiento)
-            desperdicio1 = 100 - optimizacion1.aprovechamiento_total
-            desperdicio2 = 100 - optimizacion2.aprovechamiento_total
-            diferencia_desperdicio = desperdicio2 - desperdicio1
+            # Guardar num_tableros si estaba en 0 (optimizaciones antiguas)
+            if not optimizacion.num_tableros and num_tableros:
+                optimizacion.num_tableros = num_tableros
+                optimizacion.save(update_fields=['num_tableros'])
             
-        except Optimizacion.DoesNotExist:
-            messages.error(request, "Una o ambas optimizaciones no fueron encontradas.")
-            return redirect('cutless:comparar_optimizaciones')
+            comparadas.append({
+                'numero': numero,
+                'optimizacion': optimizacion,
+                'num_tableros': num_tableros,
+                'aprovechamiento': optimizacion.aprovechamiento_total,
+                'desperdicio': 100 - optimizacion.aprovechamiento_total,
+                'costo_total': optimizacion.get_costo_total(),
+                'tableros': info['info_tableros'],
+            })
+        
+        # Diferencias respecto de la primera
+        base = comparadas[0]
+        for comparada in comparadas[1:]:
+            comparada['diferencia_aprovechamiento'] = comparada['aprovechamiento'] - base['aprovechamiento']
+            comparada['diferencia_desperdicio'] = comparada['desperdicio'] - base['desperdicio']
+            comparada['diferencia_tableros'] = comparada['num_tableros'] - base['num_tableros']
+            comparada['diferencia_costo'] = _diferencia(comparada['costo_total'], base['costo_total'])
+        
+        # Aprovechamiento por tablero, una fila por número de tablero
+        max_tableros = max(len(comparada['tableros']) for comparada in comparadas)
+        for indice in range(max_tableros):
+            filas_tableros.append({
+                'numero': indice + 1,
+                'usos': [
+                    comparada['tableros'][indice]['porcentaje_uso'] if indice < len(comparada['tableros']) else None
+                    for comparada in comparadas
+                ],
+            })
     
     return render(request, 'cutless/comparar_optimizaciones.html', {
         'optimizaciones': optimizaciones,
-        'optimizacion1': optimizacion1,
-        'optimizacion2': optimizacion2,
-        'diferencia_aprovechamiento': diferencia_aprovechamiento,
-        'diferencia_tableros': diferencia_tableros,
-        'diferencia_desperdicio': diferencia_desperdicio,
-        'desperdicio1': desperdicio1,
-        'desperdicio2': desperdicio2,
+        'comparadas': comparadas,
+        'filas_tableros': filas_tableros,
+        'selectores': [
+            {'numero': i + 1, 'seleccionado': ids[i] if i < len(ids) else None, 'requerido': i < 2}
+            for i in range(MAX_OPTIMIZACIONES_COMPARAR)
+        ],
     })
-
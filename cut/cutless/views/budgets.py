@@ -5,10 +5,10 @@ from django.db.models import Q
 from django.http import FileResponse
 from django.shortcuts import render, redirect, get_object_or_404
 
-from ..exports.pdf import generar_pdf_presupuesto as construir_pdf_presupuesto
+from ..exports.pdf import obtener_pdf_presupuesto
 from ..forms import PresupuestoForm
 from ..models import Presupuesto, Optimizacion, Cliente
-from ..services import enviar_notificacion
+from ..services import anotar_numero_lista, enviar_notificacion
 
 
 def lista_presupuestos(request):
@@ -128,30 +128,14 @@ def crear_presupuesto(request):
         optimizaciones_seleccionadas_ids = [optimizacion.pk]
     
     if form.fields['optimizaciones'].queryset:
-        todas_optimizaciones = Optimizacion.objects.filter(usuario=request.user).order_by('-fecha')
-        total_optimizaciones = todas_optimizaciones.count()
-        
-        for opt in form.fields['optimizaciones'].queryset:
-            # Calcular número de lista
-            numero_lista = opt.pk
-            for idx, optimizacion_lista in enumerate(todas_optimizaciones, start=1):
-                if optimizacion_lista.id == opt.id:
-                    numero_lista = total_optimizaciones - idx + 1
-                    break
+        for opt in anotar_numero_lista(form.fields['optimizaciones'].queryset).prefetch_related('piezas_detalle'):
+            # Número de lista (calculado en la BD, igual que en historial)
+            numero_lista = opt.numero_lista
             
             # Extraer nombres de piezas
-            nombres_piezas = []
-            if opt.piezas:
-                for linea in opt.piezas.splitlines():
-                    if linea.strip():
-                        partes = linea.split(',')
-                        if len(partes) == 4:  # Formato con nombre: nombre,ancho,alto,cantidad
-                            nombre = partes[0].strip()
-                            cantidad = int(partes[3].strip())
-                            nombres_piezas.append(f"{nombre} (x{cantidad})")
-                        elif len(partes) == 3:  # Formato sin nombre: ancho,alto,cantidad
-                            cantidad = int(partes[2].strip())
-                            nombres_piezas.append(f"Pieza (x{cantidad})")
+            nombres_piezas = [
+                f"{pieza.nombre} (x{pieza.cantidad})" for pieza in opt.piezas_detalle.all()
+            ]
             
             optimizaciones_info.append({
                 'optimizacion': opt,
@@ -172,7 +156,7 @@ def generar_pdf_presupuesto(request, pk):
     Genera el PDF del presupuesto.
     """
     try:
-        presupuesto = Presupuesto.objects.prefetch_related('optimizaciones').select_related('cliente').get(
+        presupuesto = Presupuesto.objects.select_related('cliente').get(
             pk=pk,
             usuario=request.user
         )
@@ -180,12 +164,14 @@ def generar_pdf_presupuesto(request, pk):
         messages.error(request, "Presupuesto no encontrado.")
         return redirect('cutless:lista_presupuestos')
     
-    # Generar PDF usando la función de utils
-    pdf_path = construir_pdf_presupuesto(presupuesto)
+    # Reutiliza el PDF ya generado si el presupuesto no cambió desde entonces
+    pdf_path = obtener_pdf_presupuesto(presupuesto)
     
     if pdf_path:
-        presupuesto.pdf = pdf_path
-        presupuesto.save()
+        if presupuesto.pdf != pdf_path:
+            presupuesto.pdf = pdf_path
+            # Sin tocar fecha_actualizacion (auto_now), que forma parte de la clave del PDF
+            presupuesto.save(update_fields=['pdf'])
         return FileResponse(open(pdf_path, 'rb'), content_type='application/pdf', filename=f'presupuesto_{presupuesto.numero}.pdf')
     else:
         messages.error(request, "Error al generar el PDF del presupuesto.")
@@ -205,22 +191,13 @@ def detalle_presupuesto(request, pk):
         return redirect('cutless:lista_presupuestos')
     
     # Calcular información adicional para el template
-    # Obtener todas las optimizaciones del usuario ordenadas por fecha descendente (igual que en historial)
-    todas_optimizaciones = Optimizacion.objects.filter(usuario=request.user).order_by('-fecha')
-    total_optimizaciones = todas_optimizaciones.count()
-    
     optimizaciones_con_costos = []
-    for opt in presupuesto.optimizaciones.all():
+    for opt in anotar_numero_lista(presupuesto.optimizaciones.all()):
         num_tableros = opt.num_tableros or 0
         costo_tableros = presupuesto.precio_tablero * Decimal(str(num_tableros))
         
-        # Calcular el número de lista (basado en orden por fecha descendente)
-        numero_lista = opt.pk  # Por defecto usar el ID
-        for idx, optimizacion in enumerate(todas_optimizaciones, start=1):
-            if optimizacion.id == opt.id:
-                # Para orden descendente: numero = total - idx + 1
-                numero_lista = total_optimizaciones - idx + 1
-                break
+        # Número de lista (calculado en la BD, igual que en historial)
+        numero_lista = opt.numero_lista
         
         optimizaciones_con_costos.append({
             'optimizacion': opt,
@@ -288,30 +265,14 @@ def editar_presupuesto(request, pk):
     optimizaciones_seleccionadas_ids = list(presupuesto.optimizaciones.values_list('pk', flat=True))
     
     if form.fields['optimizaciones'].queryset:
-        todas_optimizaciones = Optimizacion.objects.filter(usuario=request.user).order_by('-fecha')
-        total_optimizaciones = todas_optimizaciones.count()
-        
-        for opt in form.fields['optimizaciones'].queryset:
-            # Calcular número de lista
-            numero_lista = opt.pk
-            for idx, optimizacion_lista in enumerate(todas_optimizaciones, start=1):
-                if optimizacion_lista.id == opt.id:
-                    numero_lista = total_optimizaciones - idx + 1
-                    break
+        for opt in anotar_numero_lista(form.fields['optimizaciones'].queryset).prefetch_related('piezas_detalle'):
+            # Número de lista (calculado en la BD, igual que en historial)
+            numero_lista = opt.numero_lista
             
             # Extraer nombres de piezas
-            nombres_piezas = []
-            if opt.piezas:
-                for linea in opt.piezas.splitlines():
-                    if linea.strip():
-                        partes = linea.split(',')
-                        if len(partes) == 4:  # Formato con nombre: nombre,ancho,alto,cantidad
-                            nombre = partes[0].strip()
-                            cantidad = int(partes[3].strip())
-                            nombres_piezas.append(f"{nombre} (x{cantidad})")
-                        elif len(partes) == 3:  # Formato sin nombre: ancho,alto,cantidad
-                            cantidad = int(partes[2].strip())
-                            nombres_piezas.append(f"Pieza (x{cantidad})")
+            nombres_piezas = [
+                f"{pieza.nombre} (x{pieza.cantidad})" for pieza in opt.piezas_detalle.all()
+            ]
             
             optimizaciones_info.append({
                 'optimizacion': opt,
@@ -12,6 +12,11 @@ def handler404(request, exception):
     return render(request, 'cutless/404.html', status=404)
 
 
+def es_administrador(usuario):
+    """Superusuario o perfil con rol de administrador."""
+    return usuario.is_superuser or getattr(getattr(usuario, 'perfil', None), 'rol', None) == 'admin'
+
+
 def requiere_permiso(permiso_nombre):
     """Decorador para verificar si el usuario tiene un permiso específico en su perfil."""
     def decorator(view_func):
@@ -20,7 +25,7 @@ def requiere_permiso(permiso_nombre):
             if not request.user.is_authenticated:
                 return redirect('usuarios:login')
 
-            if request.user.is_superuser:
+            if es_administrador(request.user):
                 return view_func(request, *args, **kwargs)
 
             try:
@@ -28,9 +33,6 @@ def requiere_permiso(permiso_nombre):
             except AttributeError:
                 return redirect('usuarios:login')
 
-            if getattr(perfil, 'rol', None) == 'admin':
-                return view_func(request, *args, **kwargs)
-
             if not getattr(perfil, permiso_nombre, False):
                 messages.error(request, "❌ No tienes permiso para acceder a esta funcionalidad.")
                 return redirect('cutless:index')
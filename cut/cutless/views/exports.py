@@ -1,85 +1,99 @@
+import tempfile
 from decimal import Decimal
 
 from django.contrib import messages
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import require_safe
 
-from ..models import Optimizacion
+from ..exports import COLUMNAS_EXPORTACION, generar_csv, generar_parquet, parquet_disponible
+from ..fechas import fecha_parametro, limites_dia
+from ..models import Optimizacion, TableroOptimizacion
 from ..services import (
+    asegurar_resultado_optimizacion,
     calcular_numero_lista,
     convertir_info_desperdicio_unidad,
+    imagenes_plan_corte,
     nombre_descarga_excel,
+    obtener_artefacto,
     obtener_resultado_optimizacion,
+    respuesta_imagen_plan_corte,
+    respuesta_imagen_tablero,
     respuesta_png_tablero,
     respuesta_pdf_optimizacion,
+    urls_plan_corte,
+    urls_tableros,
 )
 from ..utils import (
-    convertir_a_cm,
-    convertir_desde_cm,
     generar_excel,
-    generar_grafico,
     obtener_simbolo_area,
     obtener_simbolo_unidad,
-    parsear_piezas_desde_texto,
 )
+from .common import es_administrador
 
 
 def descargar_excel(request, pk):
     """
     Descarga un archivo Excel con la información detallada de la optimización.
+    Se sirve desde la caché de artefactos mientras la optimización no cambie.
     """
     optimizacion = get_object_or_404(Optimizacion, pk=pk, usuario=request.user)
     ordenar_por = request.GET.get('ordenar_por', 'fecha_desc')
     numero_lista = calcular_numero_lista(request.user, optimizacion.id, ordenar_por)
+    asegurar_resultado_optimizacion(optimizacion, numero_lista=numero_lista)
 
-    unidad_opt = getattr(optimizacion, 'unidad_medida', 'cm') or 'cm'
-    piezas_parseadas = parsear_piezas_desde_texto(optimizacion.piezas, unidad_opt)
-    piezas_con_nombre = [
-        {
-            'nombre': p['nombre'],
-            'ancho': p['ancho'],
-            'alto': p['alto'],
-            'cantidad': p['cantidad'],
-        }
-        for p in piezas_parseadas
-    ]
-
-    _, _, info_desperdicio = obtener_resultado_optimizacion(
-        optimizacion,
-        numero_lista=numero_lista,
-        persistir_si_falta=True,
-    )
+    def generar(destino):
+        unidad_opt = getattr(optimizacion, 'unidad_medida', 'cm') or 'cm'
+        piezas_con_nombre = [
+            {
+                'nombre': p.nombre,
+                'ancho': p.ancho,
+                'alto': p.alto,
+                'cantidad': p.cantidad,
+            }
+            for p in optimizacion.piezas_detalle.all()
+        ]
 
-    info_desperdicio_convertida = convertir_info_desperdicio_unidad(
-        info_desperdicio, unidad_opt, optimizacion,
-    )
+        _, _, info_desperdicio = obtener_resultado_optimizacion(
+            optimizacion,
+            numero_lista=numero_lista,
+            persistir_si_falta=True,
+        )
+
+        info_desperdicio_convertida = convertir_info_desperdicio_unidad(
+            info_desperdicio, unidad_opt, optimizacion,
+        )
 
-    excel_buffer = generar_excel(optimizacion, info_desperdicio_convertida, piezas_con_nombre, numero_lista)
+        excel_buffer = generar_excel(optimizacion, info_desperdicio_convertida, piezas_con_nombre, numero_lista)
+        destino.write(excel_buffer.getvalue())
 
-    from django.http import HttpResponse
-    response = HttpResponse(
-        excel_buffer.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    ruta = obtener_artefacto(optimizacion, 'excel', 'xlsx', generar, numero_lista)
+    return FileResponse(
+        open(ruta, 'rb'),
+        as_attachment=True,
+        filename=nombre_descarga_excel(numero_lista, optimizacion),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
     )
-    response['Content-Disposition'] = f'attachment; filename="{nombre_descarga_excel(numero_lista, optimizacion)}"'
-    return response
 
 
 def api_tableros_optimizacion(request, pk):
     """
-    API que retorna todas las imágenes de tableros de una optimización en base64.
+    API que retorna las URLs de las imágenes de tableros de una optimización.
     """
     from django.http import JsonResponse
 
     optimizacion = get_object_or_404(Optimizacion, pk=pk, usuario=request.user)
-    imagenes_base64, _, _ = obtener_resultado_optimizacion(
+    tableros, _, _ = obtener_resultado_optimizacion(
         optimizacion,
         persistir_si_falta=True,
     )
+    imagenes = urls_tableros(tableros)
 
     return JsonResponse({
         'success': True,
-        'imagenes': imagenes_base64,
-        'total': len(imagenes_base64)
+        'imagenes': imagenes,
+        'total': len(imagenes)
     })
 
 def descargar_pdf(request, pk):
@@ -98,60 +112,25 @@ def imprimir_plan_corte(request, pk):
     # Recuperar datos de la optimización guardada
     unidad = getattr(optimizacion, 'unidad_medida', 'cm') or 'cm'
     
-    # Parsear piezas
+    # Piezas guardadas (tabla normalizada, dimensiones en cm)
+    piezas_guardadas = list(optimizacion.piezas_detalle.all())
     piezas_con_nombre = []
-    for linea in optimizacion.piezas.splitlines():
-        if linea.strip():
-            partes = linea.split(',')
-            if len(partes) == 4:
-                ancho = float(partes[1].strip())
-                alto = float(partes[2].strip())
-                cantidad = int(partes[3].strip())
-                area_unitaria = ancho * alto
-                area_total = area_unitaria * cantidad
-                piezas_con_nombre.append({
-                    'nombre': partes[0].strip(),
-                    'ancho': ancho,
-                    'alto': alto,
-                    'cantidad': cantidad,
-                    'area_unitaria': area_unitaria,
-                    'area_total': area_total
-                })
-    
-    # Regenerar la optimización para obtener todas las imágenes y detalles
-    piezas_para_optimizar = []
-    nombres_piezas = []
-    for pieza in piezas_con_nombre:
-        ancho_val = pieza['ancho']
-        alto_val = pieza['alto']
-        cantidad = pieza['cantidad']
-        nombre = pieza['nombre']
-        
-        # Convertir a cm si es necesario
-        ancho_cm = convertir_a_cm(ancho_val, unidad)
-        alto_cm = convertir_a_cm(alto_val, unidad)
-        
-        # Agregar como tupla de 3 elementos (ancho, alto, cantidad)
-        piezas_para_optimizar.append((ancho_cm, alto_cm, cantidad))
-        nombres_piezas.append(nombre)
-    
-    # Obtener parámetros de la optimización
-    margen_corte = getattr(optimizacion, 'margen_corte', 0.3) or 0.3
-    permitir_rotacion = getattr(optimizacion, 'permitir_rotacion', True)
-    
-    # Regenerar gráfico en modo plan de corte (blanco y negro, solo medidas)
-    imagenes_base64, aprovechamiento, info_desperdicio = generar_grafico(
-        piezas_para_optimizar,
-        optimizacion.ancho_tablero,
-        optimizacion.alto_tablero,
-        unidad='cm',
-        permitir_rotacion=permitir_rotacion,
-        margen_corte=margen_corte,
-        nombres_piezas=nombres_piezas if nombres_piezas else None,
-        modo_plan_corte=True  # Modo blanco y negro para plan de corte
-    )
+    for pieza in piezas_guardadas:
+        area_unitaria = pieza.ancho * pieza.alto
+        piezas_con_nombre.append({
+            'nombre': pieza.nombre,
+            'ancho': pieza.ancho,
+            'alto': pieza.alto,
+            'cantidad': pieza.cantidad,
+            'area_unitaria': area_unitaria,
+            'area_total': area_unitaria * pieza.cantidad
+        })
     
-    num_tableros = len(imagenes_base64)
+    # Datos del resultado persistido; el plan de corte (blanco y negro, solo medidas) se
+    # dibuja una sola vez en la caché de artefactos y la página enlaza sus imágenes
+    tableros, _, info_desperdicio = obtener_resultado_optimizacion(optimizacion, persistir_si_falta=True)
+    num_tableros = len(imagenes_plan_corte(optimizacion, len(tableros)))
+    urls_imagenes = urls_plan_corte(optimizacion, num_tableros)
     
     simbolo_area = obtener_simbolo_area(unidad)
     simbolo_unidad = obtener_simbolo_unidad(unidad)
@@ -162,7 +141,7 @@ def imprimir_plan_corte(request, pk):
     
     # Combinar imágenes con información de tableros
     tableros_con_imagenes = []
-    for idx, (img, info) in enumerate(zip(imagenes_base64, info_tableros_convertida), start=1):
+    for idx, (img, info) in enumerate(zip(urls_imagenes, info_tableros_convertida), start=1):
         tableros_con_imagenes.append({
             'numero': info['numero'],
             'imagen': img,
@@ -179,18 +158,11 @@ def imprimir_plan_corte(request, pk):
         costo_material = Decimal(str(num_tableros)) * precio_tablero
     
     # Calcular número de lista
-    todas_optimizaciones = Optimizacion.objects.filter(usuario=request.user).order_by('-fecha')
-    total_optimizaciones = todas_optimizaciones.count()
-    
-    numero_lista = optimizacion.pk
-    for idx, opt in enumerate(todas_optimizaciones, start=1):
-        if opt.id == optimizacion.id:
-            numero_lista = total_optimizaciones - idx + 1
-            break
+    numero_lista = calcular_numero_lista(request.user, optimizacion.id)
     
     return render(request, "cutless/imprimir_plan_corte.html", {
         "optimizacion": optimizacion,
-        "imagenes": imagenes_base64,
+        "imagenes": urls_imagenes,
         "num_tableros": num_tableros,
         "piezas_con_nombre": piezas_con_nombre,
         "info_desperdicio": info_desperdicio_mostrar,
@@ -223,3 +195,80 @@ def descargar_png(request, pk, tablero_num=None):
         return redirect('cutless:historial')
     return respuesta
 
+
+@require_safe
+def imagen_tablero(request, pk, tamano='media'):
+    """
+    Sirve la imagen persistida de un tablero (miniatura, media o impresión) para mostrarla en páginas.
+    Soporta GET condicional (ETag / Last-Modified) para que el navegador la cachee.
+    """
+    tablero = get_object_or_404(
+        TableroOptimizacion.objects.select_related('optimizacion'),
+        pk=pk,
+        optimizacion__usuario=request.user,
+    )
+    respuesta = respuesta_imagen_tablero(request, tablero, tamano=tamano)
+    if respuesta is None:
+        raise Http404("La imagen del tablero no está disponible.")
+    return respuesta
+
+
+@require_safe
+def imagen_plan_corte(request, pk, numero):
+    """
+    Sirve la imagen del plan de corte (modo impresión) de un tablero desde la caché de
+    artefactos, con ETag para que el navegador la cachee.
+    """
+    optimizacion = get_object_or_404(Optimizacion.objects.select_related('material'), pk=pk, usuario=request.user)
+    respuesta = respuesta_imagen_plan_corte(request, optimizacion, numero)
+    if respuesta is None:
+        raise Http404("El tablero no existe.")
+    return respuesta
+
+
+def exportar_datos(request):
+    """
+    Exporta en columnas (CSV en streaming o Parquet) las optimizaciones, sus tableros o
+    sus piezas, para análisis externo.
+
+    Parámetros GET: tabla (optimizaciones | tableros | piezas), formato (csv | parquet),
+    desde / hasta (AAAA-MM-DD, inclusive), proyecto (id) y, solo administradores, usuario
+    (nombre de usuario; sin él se exportan todos los usuarios).
+    """
+    tabla = request.GET.get('tabla', 'optimizaciones')
+    formato = request.GET.get('formato', 'csv')
+    if tabla not in COLUMNAS_EXPORTACION or formato not in ('csv', 'parquet'):
+        messages.error(request, "Tabla o formato de exportación no válido.")
+        return redirect('cutless:estadisticas')
+    if formato == 'parquet' and not parquet_disponible():
+        messages.error(request, "La exportación Parquet requiere instalar pyarrow en el servidor.")
+        return redirect('cutless:estadisticas')
+
+    # Cada usuario exporta solo lo suyo; los administradores pueden elegir usuario o exportar todo
+    optimizaciones = Optimizacion.objects.all()
+    nombre_usuario = request.GET.get('usuario', '').strip()
+    if not es_administrador(request.user):
+        optimizaciones = optimizaciones.filter(usuario=request.user)
+    elif nombre_usuario:
+        optimizaciones = optimizaciones.filter(usuario__username=nombre_usuario)
+
+    desde = fecha_parametro(request.GET.get('desde'))
+    hasta = fecha_parametro(request.GET.get('hasta'))
+    if desde:
+        optimizaciones = optimizaciones.filter(fecha__gte=limites_dia(desde)[0])
+    if hasta:
+        optimizaciones = optimizaciones.filter(fecha__lt=limites_dia(hasta)[1])
+    proyecto = request.GET.get('proyecto', '')
+    if proyecto.isdigit():
+        optimizaciones = optimizaciones.filter(proyecto_id=int(proyecto))
+
+    nombre_archivo = f"{tabla}_{timezone.localdate().strftime('%Y%m%d')}.{formato}"
+    if formato == 'parquet':
+        archivo = generar_parquet(tabla, optimizaciones, tempfile.TemporaryFile())
+        return FileResponse(
+            archivo, as_attachment=True, filename=nombre_archivo, content_type='application/vnd.apache.parquet',
+        )
+
+    response = StreamingHttpResponse(generar_csv(tabla, optimizaciones), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return response
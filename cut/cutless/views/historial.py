@@ -1,7 +1,8 @@
 from django.contrib import messages
 from django.shortcuts import render, redirect, get_object_or_404
 
-from ..models import Optimizacion
+from ..models import Optimizacion, PiezaOptimizacion
+from ..services import anotar_numero_lista, calcular_numero_lista, marcar_optimizaciones_eliminadas
 from ..utils import convertir_desde_cm
 
 
@@ -12,9 +13,8 @@ def borrar_seleccion(request):
             messages.warning(request, "No se seleccionó ninguna optimización para borrar.")
             return redirect('cutless:historial')
 
-        optimizaciones = Optimizacion.objects.filter(id__in=seleccion, usuario=request.user)
-        count = optimizaciones.count()
-        optimizaciones.delete()
+        # Se ocultan al instante; filas y archivos los purga purgar_optimizaciones
+        count = marcar_optimizaciones_eliminadas(request.user, seleccion)
 
         if count > 0:
             messages.success(request, f"Se eliminaron {count} optimizaciones seleccionadas del historial.")
@@ -28,9 +28,7 @@ def borrar_seleccion(request):
 
 def borrar_historial(request):
     if request.method == "POST":
-        optimizaciones = Optimizacion.objects.filter(usuario=request.user)
-        count = optimizaciones.count()
-        optimizaciones.delete()
+        count = marcar_optimizaciones_eliminadas(request.user)
         messages.success(request, f"Se eliminaron {count} optimizaciones del historial.")
         return redirect('cutless:historial')
     else:
@@ -56,16 +54,8 @@ def historial(request):
     else:
         todas_optimizaciones = todas_optimizaciones.order_by('-fecha')
     
-    # Determinar si el ordenamiento es descendente o ascendente
-    es_descendente = ordenar_por in ['fecha_desc', 'aprovechamiento_desc']
-    
-    # Crear diccionario de ID -> número absoluto
-    numeros_absolutos = {}
-    for idx, opt in enumerate(todas_optimizaciones, start=1):
-        if es_descendente:
-            numeros_absolutos[opt.id] = total_absoluto - idx + 1
-        else:
-            numeros_absolutos[opt.id] = idx
+    # Número absoluto en el historial (calculado en la BD, independiente de los filtros)
+    todas_optimizaciones = anotar_numero_lista(todas_optimizaciones, ordenar_por)
     
     # Ahora aplicar filtros para mostrar
     optimizaciones = todas_optimizaciones
@@ -78,8 +68,8 @@ def historial(request):
     # Filtro por nombre de pieza
     nombre_pieza = request.GET.get('nombre_pieza', '').strip()
     if nombre_pieza:
-        # Buscar en el campo piezas que contiene el nombre
-        optimizaciones = optimizaciones.filter(piezas__icontains=nombre_pieza)
+        # Piezas cuyo nombre contiene el texto buscado (sobre el nombre normalizado)
+        optimizaciones = optimizaciones.filter(PiezaOptimizacion.existe_con_nombre(nombre_pieza))
     
     # Filtro por fecha
     fecha_desde = request.GET.get('fecha_desde', '').strip()
@@ -104,7 +94,7 @@ def historial(request):
     # PAGINACIÓN
     from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
     page = request.GET.get('page', 1)
-    paginator = Paginator(optimizaciones, 12)  # 12 optimizaciones por página
+    paginator = Paginator(optimizaciones.prefetch_related('piezas_detalle'), 12)  # 12 optimizaciones por página
     try:
         optimizaciones_page = paginator.page(page)
     except PageNotAnInteger:
@@ -114,31 +104,13 @@ def historial(request):
 
     optimizaciones_con_piezas = []
     for opt in optimizaciones_page:
-        numero_mostrado = numeros_absolutos.get(opt.id, 0)
-        piezas_procesadas = []
-        for linea in opt.piezas.splitlines():
-            if linea.strip():
-                partes = linea.split(',')
-                if len(partes) == 4:
-                    piezas_procesadas.append({
-                        'nombre': partes[0].strip(),
-                        'ancho': partes[1].strip(),
-                        'alto': partes[2].strip(),
-                        'cantidad': partes[3].strip()
-                    })
-                elif len(partes) == 3:
-                    piezas_procesadas.append({
-                        'nombre': 'Pieza',
-                        'ancho': partes[0].strip(),
-                        'alto': partes[1].strip(),
-                        'cantidad': partes[2].strip()
-                    })
+        numero_mostrado = opt.numero_lista
         unidad_opt = getattr(opt, 'unidad_medida', 'cm') or 'cm'
         ancho_mostrar = round(convertir_desde_cm(opt.ancho_tablero, unidad_opt), 2)
         alto_mostrar = round(convertir_desde_cm(opt.alto_tablero, unidad_opt), 2)
         optimizaciones_con_piezas.append({
             'optimizacion': opt,
-            'piezas': piezas_procesadas,
+            'piezas': opt.piezas_detalle.all(),
             'numero': numero_mostrado,
             'ancho_mostrar': ancho_mostrar,
             'alto_mostrar': alto_mostrar,
@@ -162,15 +134,7 @@ def borrar_optimizacion(request, pk):
     Elimina una optimización individual del usuario actual.
     """
     optimizacion = get_object_or_404(Optimizacion, pk=pk, usuario=request.user)
-    todas_optimizaciones = Optimizacion.objects.filter(usuario=request.user).order_by('-fecha')
-    total_absoluto = todas_optimizaciones.count()
-    numero_mostrado = None
-    for idx, opt in enumerate(todas_optimizaciones, start=1):
-        if opt.id == pk:
-            numero_mostrado = total_absoluto - idx + 1
-            break
-    if numero_mostrado is None:
-        numero_mostrado = pk
+    numero_mostrado = calcular_numero_lista(request.user, optimizacion.pk)
 
     if request.method == "POST":
         optimizacion.delete()
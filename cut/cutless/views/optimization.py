@@ -14,8 +14,10 @@ from ..services import (
     persistir_resultado_optimizacion,
     obtener_resultado_optimizacion,
     preparar_contexto_resultado,
+    urls_tableros,
 )
 from ..utils import (
+    RESOLUCIONES_TABLERO,
     convertir_a_cm,
     convertir_desde_cm,
     generar_grafico,
@@ -131,10 +133,11 @@ def editar_optimizacion(request, pk):
             nombres_piezas = [p['nombre'] for p in piezas_con_nombre]
             
             # Generar nuevas imágenes
-            imagenes_base64, aprovechamiento, info_desperdicio = generar_grafico(
+            imagenes_png, aprovechamiento, info_desperdicio = generar_grafico(
                 piezas, ancho, alto, unidad, 
                 permitir_rotacion=permitir_rotacion, 
                 margen_corte=margen_corte_cm,
+                resoluciones=RESOLUCIONES_TABLERO,
                 nombres_piezas=nombres_piezas
             )
 
@@ -153,10 +156,8 @@ def editar_optimizacion(request, pk):
             if warn_omitidas:
                 messages.warning(request, warn_omitidas)
             
-            imagen_principal = imagenes_base64[0] if imagenes_base64 else ""
-            
             # Obtener número de tableros
-            num_tableros = len(imagenes_base64)
+            num_tableros = len(imagenes_png)
             
             # Actualizar la optimización
             piezas_texto = "\n".join([
@@ -182,7 +183,7 @@ def editar_optimizacion(request, pk):
             numero_lista = calcular_numero_lista(request.user, optimizacion.id)
             persistir_resultado_optimizacion(
                 optimizacion,
-                imagenes_base64,
+                imagenes_png,
                 info_desperdicio,
                 aprovechamiento,
                 numero_lista=numero_lista,
@@ -190,10 +191,12 @@ def editar_optimizacion(request, pk):
 
             messages.success(request, f"✅ Optimización actualizada exitosamente. Aprovechamiento: {aprovechamiento:.2f}%")
 
+            tableros = list(optimizacion.tableros.all())
             contexto = preparar_contexto_resultado(
                 optimizacion,
-                imagenes_base64,
+                urls_tableros(tableros),
                 info_desperdicio,
+                miniaturas=urls_tableros(tableros, tamano='miniatura'),
             )
             contexto['numero_lista'] = numero_lista
 
@@ -404,10 +407,11 @@ def index(request):
             nombres_piezas = [p['nombre'] for p in piezas_con_nombre]
             
             # Generar TODAS las imágenes, aprovechamiento Y desperdicio
-            imagenes_base64, aprovechamiento, info_desperdicio = generar_grafico(
+            imagenes_png, aprovechamiento, info_desperdicio = generar_grafico(
                 piezas, ancho, alto, unidad, 
                 permitir_rotacion=permitir_rotacion, 
                 margen_corte=margen_corte_cm,
+                resoluciones=RESOLUCIONES_TABLERO,
                 nombres_piezas=nombres_piezas
             )
 
@@ -426,11 +430,8 @@ def index(request):
             if warn_omitidas:
                 messages.warning(request, warn_omitidas)
             
-            # Usar la primera imagen para vista previa
-            imagen_principal = imagenes_base64[0] if imagenes_base64 else ""
-            
             # Obtener número de tableros
-            num_tableros = len(imagenes_base64)
+            num_tableros = len(imagenes_png)
 
             # Guardar en BD (ahora con nombres y costos)
             piezas_texto = "\n".join([
@@ -458,16 +459,18 @@ def index(request):
             numero_lista = calcular_numero_lista(request.user, optimizacion.id)
             persistir_resultado_optimizacion(
                 optimizacion,
-                imagenes_base64,
+                imagenes_png,
                 info_desperdicio,
                 aprovechamiento,
                 numero_lista=numero_lista,
             )
 
+            tableros = list(optimizacion.tableros.all())
             contexto = preparar_contexto_resultado(
                 optimizacion,
-                imagenes_base64,
+                urls_tableros(tableros),
                 info_desperdicio,
+                miniaturas=urls_tableros(tableros, tamano='miniatura'),
             )
             contexto['numero_lista'] = numero_lista
             
@@ -580,15 +583,16 @@ def resultado_view(request, pk=None):
     if pk:
         optimizacion = get_object_or_404(Optimizacion, pk=pk, usuario=request.user)
         numero_lista = calcular_numero_lista(request.user, optimizacion.id)
-        imagenes_base64, _, info_desperdicio = obtener_resultado_optimizacion(
+        tableros, _, info_desperdicio = obtener_resultado_optimizacion(
             optimizacion,
             numero_lista=numero_lista,
             persistir_si_falta=True,
         )
         contexto = preparar_contexto_resultado(
             optimizacion,
-            imagenes_base64,
+            urls_tableros(tableros),
             info_desperdicio,
+            miniaturas=urls_tableros(tableros, tamano='miniatura'),
         )
         contexto['numero_lista'] = numero_lista
         return render(request, "cutless/resultado.html", contexto)
@@ -695,10 +699,11 @@ def resultado_view(request, pk=None):
         nombres_piezas = [p['nombre'] for p in piezas_con_nombre]
         
         # Generar TODAS las imágenes con info de desperdicio (piezas y tablero en cm)
-        imagenes_base64, aprovechamiento, info_desperdicio = generar_grafico(
+        imagenes_png, aprovechamiento, info_desperdicio = generar_grafico(
             piezas, ancho_cm, alto_cm, unidad_resultado,
             permitir_rotacion=permitir_rotacion,
             margen_corte=margen_corte_cm,
+            resoluciones=RESOLUCIONES_TABLERO,
             nombres_piezas=nombres_piezas
         )
 
@@ -713,9 +718,7 @@ def resultado_view(request, pk=None):
         if warn_omitidas:
             messages.warning(request, warn_omitidas)
 
-        imagen_principal = imagenes_base64[0] if imagenes_base64 else ""
-        
-        num_tableros = len(imagenes_base64)
+        num_tableros = len(imagenes_png)
 
         optimizacion = Optimizacion.objects.create(
             usuario=request.user,
@@ -735,7 +738,7 @@ def resultado_view(request, pk=None):
         numero_lista = calcular_numero_lista(request.user, optimizacion.id)
         persistir_resultado_optimizacion(
             optimizacion,
-            imagenes_base64,
+            imagenes_png,
             info_desperdicio,
             aprovechamiento,
             numero_lista=numero_lista,
@@ -749,10 +752,12 @@ def resultado_view(request, pk=None):
             {'optimizacion_id': optimizacion.id, 'aprovechamiento': aprovechamiento}
         )
 
+        tableros = list(optimizacion.tableros.all())
         contexto = preparar_contexto_resultado(
             optimizacion,
-            imagenes_base64,
+            urls_tableros(tableros),
             info_desperdicio,
+            miniaturas=urls_tableros(tableros, tamano='miniatura'),
         )
         contexto['numero_lista'] = numero_lista
         return render(request, "cutless/resultado.html", contexto)
@@ -766,43 +771,8 @@ def duplicar_optimizacion(request, pk):
     # Obtener el ordenamiento actual desde los parámetros GET (si existe)
     ordenar_por = request.GET.get('ordenar_por', 'fecha_desc')
     
-    # Calcular el número de visualización igual que en historial
-    todas_optimizaciones = Optimizacion.objects.filter(usuario=request.user)
-    
-    # Aplicar filtros si existen (para mantener consistencia)
-    solo_favoritos = request.GET.get('solo_favoritos', '').strip()
-    if solo_favoritos == 'true':
-        todas_optimizaciones = todas_optimizaciones.filter(favorito=True)
-    
-    nombre_pieza = request.GET.get('nombre_pieza', '').strip()
-    if nombre_pieza:
-        todas_optimizaciones = todas_optimizaciones.filter(piezas__icontains=nombre_pieza)
-    
-    # Aplicar el mismo ordenamiento que se usa en historial
-    if ordenar_por == 'fecha_desc':
-        todas_optimizaciones = todas_optimizaciones.order_by('-fecha')
-    elif ordenar_por == 'fecha_asc':
-        todas_optimizaciones = todas_optimizaciones.order_by('fecha')
-    elif ordenar_por == 'aprovechamiento_desc':
-        todas_optimizaciones = todas_optimizaciones.order_by('-aprovechamiento_total')
-    elif ordenar_por == 'aprovechamiento_asc':
-        todas_optimizaciones = todas_optimizaciones.order_by('aprovechamiento_total')
-    else:
-        todas_optimizaciones = todas_optimizaciones.order_by('-fecha')
-    
-    total_optimizaciones = todas_optimizaciones.count()
-    es_descendente = ordenar_por in ['fecha_desc', 'aprovechamiento_desc']
-    
-    # Encontrar la posición de esta optimización en la lista
-    numero_mostrado = optimizacion.id  # Por defecto usar el ID real
-    for idx, opt in enumerate(todas_optimizaciones, start=1):
-        if opt.id == optimizacion.id:
-            # Calcular número de lista según el ordenamiento (igual que en historial)
-            if es_descendente:
-                numero_mostrado = total_optimizaciones - idx + 1
-            else:
-                numero_mostrado = idx
-            break
+    # Número de visualización igual que en historial
+    numero_mostrado = calcular_numero_lista(request.user, optimizacion.id, ordenar_por)
     
     # Parsear las piezas guardadas
     piezas_data = []
@@ -4,7 +4,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 
 from ..forms import ProyectoForm
 from ..models import Proyecto, Optimizacion
-from ..services import enviar_notificacion
+from ..services import anotar_numero_lista, enviar_notificacion, marcar_optimizaciones_eliminadas
 
 
 def crear_proyecto(request):
@@ -52,30 +52,14 @@ def crear_proyecto(request):
     optimizaciones_seleccionadas_ids = []
     
     if form.fields['optimizaciones'].queryset:
-        todas_optimizaciones = Optimizacion.objects.filter(usuario=request.user).order_by('-fecha')
-        total_optimizaciones = todas_optimizaciones.count()
-        
-        for opt in form.fields['optimizaciones'].queryset:
-            # Calcular número de lista
-            numero_lista = opt.pk
-            for idx, optimizacion_lista in enumerate(todas_optimizaciones, start=1):
-                if optimizacion_lista.id == opt.id:
-                    numero_lista = total_optimizaciones - idx + 1
-                    break
+        for opt in anotar_numero_lista(form.fields['optimizaciones'].queryset).prefetch_related('piezas_detalle'):
+            # Número de lista (calculado en la BD, igual que en historial)
+            numero_lista = opt.numero_lista
             
             # Extraer nombres de piezas
-            nombres_piezas = []
-            if opt.piezas:
-                for linea in opt.piezas.splitlines():
-                    if linea.strip():
-                        partes = linea.split(',')
-                        if len(partes) == 4:  # Formato con nombre: nombre,ancho,alto,cantidad
-                            nombre = partes[0].strip()
-                            cantidad = int(partes[3].strip())
-                            nombres_piezas.append(f"{nombre} (x{cantidad})")
-                        elif len(partes) == 3:  # Formato sin nombre: ancho,alto,cantidad
-                            cantidad = int(partes[2].strip())
-                            nombres_piezas.append(f"Pieza (x{cantidad})")
+            nombres_piezas = [
+                f"{pieza.nombre} (x{pieza.cantidad})" for pieza in opt.piezas_detalle.all()
+            ]
             
             optimizaciones_info.append({
                 'optimizacion': opt,
@@ -106,8 +90,10 @@ def eliminar_proyecto(request, pk):
         accion = request.POST.get('accion', 'mover')
         
         if accion == 'eliminar':
-            # Eliminar todas las optimizaciones del proyecto
-            proyecto.optimizacion_set.all().delete()
+            # Eliminar todas las optimizaciones del proyecto (se ocultan y las borra la purga)
+            marcar_optimizaciones_eliminadas(
+                request.user, list(proyecto.optimizacion_set.values_list('pk', flat=True)),
+            )
         # Si es 'mover', las optimizaciones simplemente perderán la referencia al proyecto (SET_NULL)
         
         nombre = proyecto.nombre
@@ -258,30 +244,14 @@ def editar_proyecto(request, pk):
     optimizaciones_seleccionadas_ids = list(proyecto.optimizacion_set.values_list('pk', flat=True))
     
     if form.fields['optimizaciones'].queryset:
-        todas_optimizaciones = Optimizacion.objects.filter(usuario=request.user).order_by('-fecha')
-        total_optimizaciones = todas_optimizaciones.count()
-        
-        for opt in form.fields['optimizaciones'].queryset:
-            # Calcular número de lista
-            numero_lista = opt.pk
-            for idx, optimizacion_lista in enumerate(todas_optimizaciones, start=1):
-                if optimizacion_lista.id == opt.id:
-                    numero_lista = total_optimizaciones - idx + 1
-                    break
+        for opt in anotar_numero_lista(form.fields['optimizaciones'].queryset).prefetch_related('piezas_detalle'):
+            # Número de lista (calculado en la BD, igual que en historial)
+            numero_lista = opt.numero_lista
             
             # Extraer nombres de piezas
-            nombres_piezas = []
-            if opt.piezas:
-                for linea in opt.piezas.splitlines():
-                    if linea.strip():
-                        partes = linea.split(',')
-                        if len(partes) == 4:  # Formato con nombre: nombre,ancho,alto,cantidad
-                            nombre = partes[0].strip()
-                            cantidad = int(partes[3].strip())
-                            nombres_piezas.append(f"{nombre} (x{cantidad})")
-                        elif len(partes) == 3:  # Formato sin nombre: ancho,alto,cantidad
-                            cantidad = int(partes[2].strip())
-                            nombres_piezas.append(f"Pieza (x{cantidad})")
+            nombres_piezas = [
+                f"{pieza.nombre} (x{pieza.cantidad})" for pieza in opt.piezas_detalle.all()
+            ]
             
             optimizaciones_info.append({
                 'optimizacion': opt,
@@ -0,0 +1,81 @@
+"""
+Configuración de la base de datos a partir de variables de entorno.
+
+Por defecto SQLite ajustado para varias peticiones concurrentes: WAL (lectores y un
+escritor a la vez sin bloquearse), synchronous=NORMAL (seguro con WAL), espera ante
+bloqueos en lugar de fallar con "database is locked", transacciones IMMEDIATE (toman el
+bloqueo de escritura al empezar, así la espera sí se aplica) y conexiones persistentes.
+
+Contrapartida de IMMEDIATE: todo ``transaction.atomic()`` toma el bloqueo de escritura,
+también los que solo leen, así que esos bloques se serializan con las escrituras. Con
+pocas transacciones de solo lectura es preferible a un "database is locked" a mitad de
+una transacción; si molesta, CUTLESS_DB_TRANSACTION_MODE=DEFERRED.
+
+journal_mode=WAL queda grabado en el archivo de la base de datos, así que no se aplica al
+``db.sqlite3`` versionado en el repositorio (el NAME por defecto) salvo que se pida con
+CUTLESS_DB_JOURNAL_MODE; en una base de datos propia (CUTLESS_DB_NAME) es el valor por defecto.
+
+Variables (todas opcionales):
+    CUTLESS_DB_ENGINE             motor de Django (por defecto django.db.backends.sqlite3)
+    CUTLESS_DB_NAME               ruta del archivo SQLite o nombre de la base de datos
+    CUTLESS_DB_USER / _PASSWORD / _HOST / _PORT   para motores con servidor
+    CUTLESS_DB_CONN_MAX_AGE       segundos que se reutiliza una conexión (0 = cerrar por petición)
+    CUTLESS_DB_TIMEOUT            segundos de espera ante un bloqueo (SQLite)
+    CUTLESS_DB_JOURNAL_MODE       WAL, DELETE, ... (SQLite; ver arriba el valor por defecto)
+    CUTLESS_DB_SYNCHRONOUS        NORMAL, FULL, ... (SQLite)
+    CUTLESS_DB_CACHE_SIZE         PRAGMA cache_size (negativo = KiB) (SQLite)
+    CUTLESS_DB_MMAP_SIZE          PRAGMA mmap_size en bytes (SQLite)
+    CUTLESS_DB_TRANSACTION_MODE   DEFERRED, IMMEDIATE o EXCLUSIVE (SQLite)
+"""
+import os
+
+SQLITE = 'django.db.backends.sqlite3'
+
+
+def _entero(entorno, nombre, por_defecto):
+    valor = entorno.get(nombre, '').strip()
+    return int(valor) if valor else por_defecto
+
+
+def pragmas_sqlite(entorno=None, journal_mode='WAL'):
+    """
+    Sentencias PRAGMA que se ejecutan al abrir cada conexión SQLite. ``journal_mode`` es
+    el valor por defecto si no lo fija el entorno (None = no se toca).
+    """
+    entorno = os.environ if entorno is None else entorno
+    timeout_ms = int(float(entorno.get('CUTLESS_DB_TIMEOUT') or 20) * 1000)
+    journal_mode = entorno.get('CUTLESS_DB_JOURNAL_MODE') or journal_mode
+    pragmas = [f"PRAGMA journal_mode={journal_mode}"] if journal_mode else []
+    return pragmas + [
+        f"PRAGMA synchronous={entorno.get('CUTLESS_DB_SYNCHRONOUS') or 'NORMAL'}",
+        f"PRAGMA busy_timeout={timeout_ms}",
+        f"PRAGMA cache_size={_entero(entorno, 'CUTLESS_DB_CACHE_SIZE', -20000)}",
+        f"PRAGMA mmap_size={_entero(entorno, 'CUTLESS_DB_MMAP_SIZE', 128 * 1024 * 1024)}",
+    ]
+
+
+def configuracion_base_datos(base_dir, entorno=None):
+    """Diccionario ``DATABASES['default']`` según el entorno."""
+    entorno = os.environ if entorno is None else entorno
+    motor = entorno.get('CUTLESS_DB_ENGINE') or SQLITE
+    configuracion = {
+        'ENGINE': motor,
+        'NAME': entorno.get('CUTLESS_DB_NAME') or base_dir / 'db.sqlite3',
+        'CONN_MAX_AGE': _entero(entorno, 'CUTLESS_DB_CONN_MAX_AGE', 60),
+        # Comprueba la conexión reutilizada antes de cada petición
+        'CONN_HEALTH_CHECKS': True,
+    }
+    if motor == SQLITE:
+        configuracion['OPTIONS'] = {
+            'timeout': float(entorno.get('CUTLESS_DB_TIMEOUT') or 20),
+            'transaction_mode': (entorno.get('CUTLESS_DB_TRANSACTION_MODE') or 'IMMEDIATE').upper(),
+            # Sin CUTLESS_DB_NAME es el db.sqlite3 versionado: no se le graba WAL
+            'init_command': ';'.join(pragmas_sqlite(
+                entorno, journal_mode='WAL' if entorno.get('CUTLESS_DB_NAME') else None,
+            )),
+        }
+    else:
+        for clave in ('USER', 'PASSWORD', 'HOST', 'PORT'):
+            if entorno.get(f'CUTLESS_DB_{clave}'):
+                configuracion[clave] = entorno[f'CUTLESS_DB_{clave}']
+    return configuracion
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .database import configuracion_base_datos
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -50,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cutless.middleware.ProfilingMiddleware',  # Solo con CUTLESS_PROFILING=1
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -85,11 +89,12 @@ WSGI_APPLICATION = 'cutless_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite con espera ante bloqueos, transacciones IMMEDIATE (también las de solo lectura
+# toman el bloqueo de escritura) y conexiones persistentes; WAL solo con CUTLESS_DB_NAME,
+# no sobre el db.sqlite3 versionado. Se ajusta con variables de entorno CUTLESS_DB_*
+# (ver cutless_project/database.py)
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': configuracion_base_datos(BASE_DIR),
 }
 
 
@@ -160,6 +165,27 @@ SESSION_COOKIE_HTTPONLY = True
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'   # o str(BASE_DIR / 'media') según tu configuración
+# Tamaño máximo de la caché de PDF / Excel descargables (MEDIA_ROOT/artefactos)
+CUTLESS_ARTEFACTOS_MAX_BYTES = 512 * 1024 * 1024
+
+# Perfilado de peticiones (cabecera Server-Timing + línea de log en "cutless.profiling").
+# CUTLESS_PROFILING_MUESTREO: fracción de peticiones ejecutadas con cProfile (0 = ninguna);
+# se guardan en CUTLESS_PROFILING_DIRECTORIO las que duran más de CUTLESS_PROFILING_UMBRAL_MS.
+CUTLESS_PROFILING = os.environ.get('CUTLESS_PROFILING', '').lower() in ('1', 'true', 'si', 'sí')
+CUTLESS_PROFILING_MUESTREO = float(os.environ.get('CUTLESS_PROFILING_MUESTREO') or 0)
+CUTLESS_PROFILING_UMBRAL_MS = float(os.environ.get('CUTLESS_PROFILING_UMBRAL_MS') or 500)
+CUTLESS_PROFILING_DIRECTORIO = os.environ.get('CUTLESS_PROFILING_DIRECTORIO') or BASE_DIR / 'perfiles'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'cutless.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
 
 # Configuración de Email (para recuperación de contraseña)
 # En desarrollo, los emails se mostrarán en la consola
@@ -12,6 +12,9 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.urls import reverse
+from cutless.models import Optimizacion
+from cutless.services import borrar_artefactos
+
 from .forms import RegistroForm, PerfilForm, UsuarioEdicionForm, PermisosUsuarioForm, CambiarPasswordForm
 from .models import PerfilUsuario
 
@@ -79,7 +82,10 @@ def eliminar_usuario(request, pk):
         messages.error(request, 'No puedes eliminar tu propia cuenta desde aquí.')
         return redirect('usuarios:admin_dashboard')
 
+    # Las filas se borran en cascada (borrado rápido); los artefactos en disco, en un recorrido
+    optimizaciones = list(Optimizacion.todas.filter(usuario=usuario).values_list('pk', flat=True))
     usuario.delete()
+    borrar_artefactos(optimizaciones)
     messages.success(request, f"Usuario {usuario.username} eliminado.")
     return redirect('usuarios:admin_dashboard')
 